@@ -0,0 +1,211 @@
+"""Benchmark loading elk.bzl under buck2 on synthetic lock files.
+
+Usage:
+    python bench/elk_bzl.py
+    python bench/elk_bzl.py --lock uv --packages 1000,5000 --platforms 4 \\
+        --wheels 1:0.6,12:0.3,48:0.1 --multi-version 0.05 -o bench_output.json
+    python bench/elk_bzl.py --profile time-flame   # also write starlark profiles
+
+For every (lock kind, package count) case this writes a buck package under
+``bench/out/`` containing a synthetic uv.lock or poetry.lock, one tags file
+per platform and a BUCK file calling ``elk_packages``. It then restarts the
+buck2 daemon, times ``buck2 targets`` on the package, and records load time,
+the daemon's peak RSS and the number of targets created. Results are written
+as JSON so they can be compared across commits.
+
+Requires ``buck2`` on PATH, run from the elk repository root.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from synthetic import (  # noqa: E402
+    iter_sizes,
+    parse_distribution,
+    platform_tags,
+    poetry_lock_text,
+    synthetic_lock,
+    uv_lock_text,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+OUT = ROOT / "bench" / "out"
+
+PLATFORMS = [
+    "linux-x86_64",
+    "macos-arm64",
+    "linux-aarch64",
+    "macos-x86_64",
+    "windows-x86_64",
+]
+
+_BUCK = """\
+load("@elk//:elk.bzl", "elk_packages", "{adapter}")
+load(":{lock}", lock = "value")
+{tag_loads}
+
+elk_packages(
+    packages = {adapter}(lock),
+    platform_tags = {{
+{tag_entries}
+    }},
+)
+"""
+
+
+def write_case(
+    dest: Path,
+    kind: str,
+    count: int,
+    wheels: dict[int, float],
+    multi: float,
+    platforms: int,
+) -> None:
+    if dest.exists():
+        shutil.rmtree(dest)
+    dest.mkdir(parents=True)
+    packages = synthetic_lock(count, wheels, multi)
+    if kind == "uv":
+        lock, adapter = "uv.lock.toml", "uv_packages"
+        (dest / lock).write_text(uv_lock_text(packages))
+    else:
+        lock, adapter = "poetry.lock.toml", "poetry_packages"
+        (dest / lock).write_text(poetry_lock_text(packages))
+
+    loads, entries = [], []
+    for plat in PLATFORMS[:platforms]:
+        var = plat.replace("-", "_") + "_tags"
+        with open(dest / f"{plat}.tags.json", "w") as f:
+            json.dump(platform_tags(plat), f, indent=4)
+            f.write("\n")
+        loads.append(f'load(":{plat}.tags.json", {var} = "value")')
+        entries.append(f'        "{plat}": {var},')
+    (dest / "BUCK").write_text(
+        _BUCK.format(
+            adapter=adapter,
+            lock=lock,
+            tag_loads="\n".join(loads),
+            tag_entries="\n".join(entries),
+        )
+    )
+
+
+def buck2(*args: str, **kwargs) -> subprocess.CompletedProcess:
+    return subprocess.run(["buck2", *args], cwd=ROOT, text=True, **kwargs)
+
+
+def daemon_peak_rss_kb() -> int | None:
+    """VmHWM of the buck2 daemon, from ``buck2 status`` and /proc (Linux only)."""
+    status = buck2("status", capture_output=True)
+    try:
+        pid = json.loads(status.stdout)["process_info"]["pid"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def run_case(pattern: str, profile: str | None, profile_out: Path) -> dict:
+    # A fresh daemon, so nothing from earlier cases is cached or resident.
+    buck2("kill", capture_output=True)
+    buck2("server", capture_output=True, check=True)
+
+    start = time.perf_counter()
+    targets = buck2("targets", pattern, capture_output=True, check=True)
+    load_s = time.perf_counter() - start
+
+    result = {
+        "load_s": round(load_s, 4),
+        "peak_rss_kb": daemon_peak_rss_kb(),
+        "targets": len(targets.stdout.split()),
+    }
+
+    if profile is not None:
+        out = profile_out.with_suffix(f".{profile}")
+        p = buck2(
+            "profile",
+            "loading",
+            "--mode",
+            profile,
+            "--output",
+            str(out),
+            pattern,
+            capture_output=True,
+        )
+        result["profile"] = str(out.relative_to(ROOT)) if p.returncode == 0 else None
+        if p.returncode != 0:
+            print(p.stderr, file=sys.stderr)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--lock", default="uv,poetry", help="comma-separated: uv, poetry"
+    )
+    parser.add_argument("--packages", default="100,1000", help="comma-separated sizes")
+    parser.add_argument(
+        "--wheels",
+        default="1:0.6,12:0.3,48:0.1",
+        help="wheels-per-package distribution, count:weight,...",
+    )
+    parser.add_argument(
+        "--multi-version",
+        type=float,
+        default=0.05,
+        help="fraction of packages locked at two versions",
+    )
+    parser.add_argument(
+        "--platforms", type=int, default=1, choices=range(1, len(PLATFORMS) + 1)
+    )
+    parser.add_argument(
+        "--profile", help="also write a `buck2 profile loading` profile in this mode"
+    )
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    opts = parser.parse_args()
+
+    wheels = parse_distribution(opts.wheels)
+    results = []
+    for kind in opts.lock.split(","):
+        for count in iter_sizes(opts.packages):
+            name = f"{kind}-{count}"
+            dest = OUT / name
+            write_case(dest, kind, count, wheels, opts.multi_version, opts.platforms)
+            pattern = "//" + str(dest.relative_to(ROOT)) + ":"
+            result = {
+                "lock": kind,
+                "packages": count,
+                "wheels": opts.wheels,
+                "multi_version": opts.multi_version,
+                "platforms": opts.platforms,
+                **run_case(pattern, opts.profile, dest / "profile"),
+            }
+            results.append(result)
+            print(json.dumps(result), file=sys.stderr)
+
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark ``poetry elk`` wall time on a large synthetic lock.
+
+Usage:
+    python bench/poetry_elk.py --packages 800 --platforms 4
+    python bench/poetry_elk.py --packages 100,800 --poetry .venv/bin/poetry
+    python bench/poetry_elk.py --latency 0.05 --concurrency 16
+
+Each run generates a poetry project (pyproject.toml, poetry.lock, elk.toml)
+whose packages live on a local stand-in index, runs ``poetry elk`` against
+it and reports the median wall time as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from synthetic import (  # noqa: E402
+    IndexServer,
+    iter_sizes,
+    synthetic_packages,
+    write_poetry_project,
+)
+
+
+def run_once(poetry: str, project: Path, extra_args: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [poetry, "elk", *extra_args],
+        cwd=project,
+        # use the current environment rather than timing virtualenv creation
+        env={**os.environ, "POETRY_VIRTUALENVS_CREATE": "false"},
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packages", default="800", help="comma-separated sizes")
+    parser.add_argument("--wheels-per-package", type=int, default=12)
+    parser.add_argument("--platforms", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--concurrency", type=int, help="[resolve] concurrency in elk.toml"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="enable the link cache (cold on the first repeat, warm after)",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to each index request"
+    )
+    parser.add_argument("--poetry", default="poetry", help="poetry executable")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("args", nargs="*", help="extra arguments for `poetry elk`")
+    opts = parser.parse_args()
+
+    results = []
+    for count in iter_sizes(opts.packages):
+        packages = synthetic_packages(count, opts.wheels_per_package)
+        with IndexServer(packages, delay=opts.latency) as index:
+            with tempfile.TemporaryDirectory() as tmp:
+                project = Path(tmp)
+                write_poetry_project(
+                    project,
+                    packages,
+                    index.url,
+                    opts.platforms,
+                    opts.concurrency,
+                    opts.cache,
+                )
+                times = [
+                    run_once(opts.poetry, project, opts.args)
+                    for _ in range(opts.repeat)
+                ]
+                output_bytes = (project / "BUCK").stat().st_size
+        results.append(
+            {
+                "packages": count,
+                "wheels_per_package": opts.wheels_per_package,
+                "platforms": opts.platforms,
+                "concurrency": opts.concurrency,
+                "cache": opts.cache,
+                "median_s": round(statistics.median(times), 4),
+                "times_s": [round(t, 4) for t in times],
+                "index_requests": index.requests,
+                "output_bytes": output_bytes,
+            }
+        )
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""Synthetic lock files and a stand-in package index for benchmarks.
+
+Nothing here talks to the network: wheel hashes and sizes are derived from
+filenames, and the index only serves PEP 503 "simple" pages pointing at those
+hashes, which is all ``poetry elk`` needs to choose links. The uv.lock and
+tags generators produce inputs for loading elk.bzl under buck2.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+# (interpreter, abi) pairs, best first, for cp312-targeted platforms.
+_PYTHONS = [
+    ("cp312", "cp312"),
+    ("cp311", "cp311"),
+    ("cp313", "cp313"),
+    ("cp310", "abi3"),
+    ("cp310", "cp310"),
+    ("cp39", "cp39"),
+    ("cp38", "cp38"),
+    ("cp314", "cp314"),
+]
+
+_PLATFORM_TAGS = [
+    "manylinux_2_28_x86_64",
+    "manylinux_2_28_aarch64",
+    "macosx_11_0_arm64",
+    "macosx_10_9_x86_64",
+    "musllinux_1_1_x86_64",
+    "win_amd64",
+]
+
+ELK_PLATFORMS = {
+    "linux-x86_64": {"platform": "linux", "arch": "x86_64", "glibc_version": [2, 38]},
+    "macos-arm64": {"platform": "darwin", "arch": "arm64", "macos_version": [13, 0]},
+    "linux-aarch64": {"platform": "linux", "arch": "aarch64", "glibc_version": [2, 38]},
+    "macos-x86_64": {"platform": "darwin", "arch": "x86_64", "macos_version": [13, 0]},
+}
+
+# Python version split used for packages locked at two versions.
+_FORK_MARKERS = ["python_full_version < '3.13'", "python_full_version >= '3.13'"]
+
+
+@dataclass
+class SyntheticDep:
+    name: str
+    # set when the dependency is on one of several locked versions
+    version: str | None = None
+    marker: str | None = None
+
+
+@dataclass
+class SyntheticPackage:
+    name: str
+    version: str
+    files: list[str]
+    deps: list[SyntheticDep] = field(default_factory=list)
+    resolution_markers: list[str] = field(default_factory=list)
+
+    def hash(self, filename: str) -> str:
+        return "sha256:" + hashlib.sha256(filename.encode()).hexdigest()
+
+    def size(self, filename: str) -> int:
+        # deterministic, roughly log-uniform between 10 kB and 100 MB
+        h = int(hashlib.sha256(filename.encode()).hexdigest()[:8], 16)
+        return int(10_000 * 10 ** (4 * h / 0xFFFFFFFF))
+
+
+def wheel_filenames(name: str, version: str, count: int) -> list[str]:
+    """``count`` wheel filenames for a package; a single wheel is universal."""
+    if count <= 1:
+        return [f"{name}-{version}-py3-none-any.whl"]
+    files = []
+    for plat in _PLATFORM_TAGS:
+        for interp, abi in _PYTHONS:
+            files.append(f"{name}-{version}-{interp}-{abi}-{plat}.whl")
+    # Platform-major order puts cp312 first for every platform, so even small
+    # counts cover the configured platforms.
+    files.sort(key=lambda f: _PYTHONS.index(tuple(f.split("-")[2:4])))
+    files = files[: count - 1]
+    files.append(f"{name}-{version}-py3-none-any.whl")
+    return files
+
+
+def synthetic_packages(count: int, wheels_per_package: int) -> list[SyntheticPackage]:
+    """A deterministic package set where each package depends on a few later ones."""
+    packages = []
+    for i in range(count):
+        name = f"pkg{i:05d}"
+        # Every tenth package is pure python, the rest carry platform wheels.
+        wheels = 1 if i % 10 == 0 else wheels_per_package
+        deps = [SyntheticDep(f"pkg{j:05d}") for j in (i + 1, i + 7) if j < count]
+        packages.append(
+            SyntheticPackage(
+                name=name,
+                version="1.0.0",
+                files=wheel_filenames(name, "1.0.0", wheels),
+                deps=deps,
+            )
+        )
+    return packages
+
+
+def parse_distribution(spec: str) -> dict[int, float]:
+    """Parse ``"1:0.6,12:0.3,48:0.1"`` into ``{wheel count: weight}``."""
+    dist = {}
+    for part in spec.split(","):
+        if part.strip():
+            count, _, weight = part.partition(":")
+            dist[int(count)] = float(weight or 1)
+    return dist
+
+
+def synthetic_lock(
+    count: int,
+    wheels: dict[int, float],
+    multi_version_fraction: float = 0.0,
+    seed: int = 0,
+) -> list[SyntheticPackage]:
+    """A reproducible random lock of ``count`` package names.
+
+    Each name gets a wheel count drawn from the ``wheels`` distribution. A
+    ``multi_version_fraction`` of names is locked at two versions split by
+    python version, and their dependents depend on both with markers, the
+    way uv writes forks.
+    """
+    rng = random.Random(seed)
+    counts, weights = zip(*sorted(wheels.items()))
+    forked = {i for i in range(count) if rng.random() < multi_version_fraction}
+
+    def deps_of(i: int) -> list[SyntheticDep]:
+        deps = []
+        for j in sorted({i + 1 + rng.randrange(10) for _ in range(3)}):
+            if j >= count:
+                continue
+            name = f"pkg{j:05d}"
+            if j in forked:
+                for version, marker in zip(("1.0.0", "2.0.0"), _FORK_MARKERS):
+                    deps.append(SyntheticDep(name, version, marker))
+            else:
+                deps.append(SyntheticDep(name))
+        return deps
+
+    packages = []
+    for i in range(count):
+        name = f"pkg{i:05d}"
+        n = rng.choices(counts, weights)[0]
+        if i in forked:
+            for version, marker in zip(("1.0.0", "2.0.0"), _FORK_MARKERS):
+                packages.append(
+                    SyntheticPackage(
+                        name=name,
+                        version=version,
+                        files=wheel_filenames(name, version, n),
+                        deps=deps_of(i),
+                        resolution_markers=[marker],
+                    )
+                )
+        else:
+            packages.append(
+                SyntheticPackage(
+                    name=name,
+                    version="1.0.0",
+                    files=wheel_filenames(name, "1.0.0", n),
+                    deps=deps_of(i),
+                )
+            )
+    return packages
+
+
+def root_deps(packages: list[SyntheticPackage], every: int = 10) -> list[SyntheticDep]:
+    """Deps for a root project on every ``every``-th package name."""
+    by_name: dict[str, list[SyntheticPackage]] = {}
+    for pkg in packages:
+        by_name.setdefault(pkg.name, []).append(pkg)
+    deps = []
+    for name in sorted(by_name)[::every]:
+        versions = by_name[name]
+        if len(versions) == 1:
+            deps.append(SyntheticDep(name))
+        else:
+            for pkg in versions:
+                marker = pkg.resolution_markers[0] if pkg.resolution_markers else None
+                deps.append(SyntheticDep(name, pkg.version, marker))
+    return deps
+
+
+def _toml_str(s: str) -> str:
+    return json.dumps(s)
+
+
+def poetry_lock_text(
+    packages: list[SyntheticPackage], index_url: str | None = None
+) -> str:
+    """poetry.lock contents; packages come from PyPI unless ``index_url`` is set."""
+    lock = []
+    for pkg in packages:
+        lock += [
+            "[[package]]",
+            f"name = {_toml_str(pkg.name)}",
+            f"version = {_toml_str(pkg.version)}",
+            'description = ""',
+            "optional = false",
+            'python-versions = ">=3.8"',
+            "files = [",
+        ]
+        for f in pkg.files:
+            lock.append(
+                f"    {{file = {_toml_str(f)}, hash = {_toml_str(pkg.hash(f))}}},"
+            )
+        lock.append("]")
+        lock.append("")
+        if pkg.deps:
+            lock.append("[package.dependencies]")
+            by_name: dict[str, list[SyntheticDep]] = {}
+            for dep in pkg.deps:
+                by_name.setdefault(dep.name, []).append(dep)
+            for name, deps in by_name.items():
+                if len(deps) == 1 and deps[0].version is None:
+                    lock.append(f'{name} = ">=1.0"')
+                else:
+                    entries = ", ".join(
+                        f"{{version = {_toml_str('==' + d.version)},"
+                        f" markers = {_toml_str(d.marker or '')}}}"
+                        for d in deps
+                    )
+                    lock.append(f"{name} = [{entries}]")
+            lock.append("")
+        if index_url is not None:
+            lock += [
+                "[package.source]",
+                'type = "legacy"',
+                f"url = {_toml_str(index_url)}",
+                'reference = "bench"',
+                "",
+            ]
+    lock += [
+        "[metadata]",
+        'lock-version = "2.0"',
+        'python-versions = "^3.11"',
+        'content-hash = "0000000000000000000000000000000000000000000000000000000000000000"',
+        "",
+    ]
+    return "\n".join(lock)
+
+
+def _uv_dep(dep: SyntheticDep) -> str:
+    fields = [f"name = {_toml_str(dep.name)}"]
+    if dep.version is not None:
+        fields.append(f"version = {_toml_str(dep.version)}")
+        fields.append('source = { registry = "https://pypi.org/simple" }')
+    if dep.marker is not None:
+        fields.append(f"marker = {_toml_str(dep.marker)}")
+    return "{ " + ", ".join(fields) + " }"
+
+
+def uv_lock_text(
+    packages: list[SyntheticPackage], root: str = "bench-root", every: int = 10
+) -> str:
+    """uv.lock contents, with a virtual root project depending on every
+    ``every``-th package name."""
+    lock = [
+        "version = 1",
+        'requires-python = ">=3.12"',
+        "resolution-markers = [",
+        *(f"    {_toml_str(m)}," for m in _FORK_MARKERS),
+        "]",
+        "",
+        "[[package]]",
+        f"name = {_toml_str(root)}",
+        'version = "0.1.0"',
+        'source = { virtual = "." }',
+        "dependencies = [",
+        *(f"    {_uv_dep(d)}," for d in root_deps(packages, every)),
+        "]",
+        "",
+    ]
+    for pkg in packages:
+        lock += [
+            "[[package]]",
+            f"name = {_toml_str(pkg.name)}",
+            f"version = {_toml_str(pkg.version)}",
+            'source = { registry = "https://pypi.org/simple" }',
+        ]
+        if pkg.resolution_markers:
+            lock.append("resolution-markers = [")
+            lock += [f"    {_toml_str(m)}," for m in pkg.resolution_markers]
+            lock.append("]")
+        if pkg.deps:
+            lock.append("dependencies = [")
+            lock += [f"    {_uv_dep(d)}," for d in pkg.deps]
+            lock.append("]")
+        lock.append("wheels = [")
+        for f in pkg.files:
+            url = f"https://files.pythonhosted.org/packages/00/00/{f}"
+            lock.append(
+                f"    {{ url = {_toml_str(url)}, hash = {_toml_str(pkg.hash(f))},"
+                f" size = {pkg.size(f)} }},"
+            )
+        lock.append("]")
+        lock.append("")
+    return "\n".join(lock)
+
+
+def platform_tags(platform: str) -> list[str]:
+    """A sys_tags()-like priority list for a cp312 interpreter on ``platform``.
+
+    ``platform`` is one of ``linux-x86_64``, ``linux-aarch64``, ``macos-arm64``,
+    ``macos-x86_64`` or ``windows-x86_64``.
+    """
+    os_name, arch = platform.split("-")
+    if os_name == "linux":
+        plats = [f"manylinux_2_{m}_{arch}" for m in range(38, 16, -1)]
+        plats.append(f"manylinux2014_{arch}")
+        plats.append(f"linux_{arch}")
+    elif os_name == "macos":
+        mac_arch = "arm64" if arch == "arm64" else "x86_64"
+        plats = []
+        for major in range(14, 10, -1):
+            for binary in (mac_arch, "universal2"):
+                plats.append(f"macosx_{major}_0_{binary}")
+        if mac_arch == "x86_64":
+            for minor in range(16, 8, -1):
+                for binary in ("x86_64", "intel", "universal2"):
+                    plats.append(f"macosx_10_{minor}_{binary}")
+    elif os_name == "windows":
+        plats = ["win_amd64"]
+    else:
+        raise ValueError(f"unknown platform {platform}")
+
+    tags = []
+    for abi in ("cp312", "abi3", "none"):
+        tags += [f"cp312-{abi}-{p}" for p in plats]
+    for minor in range(11, 1, -1):
+        tags += [f"cp3{minor}-abi3-{p}" for p in plats]
+    for interp in ("py312", "py3", "py311", "py310"):
+        tags += [f"{interp}-none-{p}" for p in plats]
+    tags += ["cp312-none-any", "py312-none-any", "py3-none-any"]
+    tags += [f"py3{minor}-none-any" for minor in range(11, -1, -1)]
+    return tags
+
+
+def write_poetry_project(
+    dest: Path,
+    packages: list[SyntheticPackage],
+    index_url: str,
+    platforms: int = 2,
+    concurrency: int | None = None,
+    cache: bool = False,
+) -> None:
+    """Write pyproject.toml, poetry.lock and elk.toml for ``packages`` into ``dest``.
+
+    With ``cache``, the link cache lives in ``dest/.elk-cache`` so it starts
+    cold; otherwise it is disabled.
+    """
+    dest.mkdir(parents=True, exist_ok=True)
+
+    pyproject = [
+        "[tool.poetry]",
+        'name = "bench-root"',
+        'version = "0.1.0"',
+        'description = ""',
+        'authors = ["bench <bench@example.com>"]',
+        "package-mode = false",
+        "",
+        "[tool.poetry.dependencies]",
+        'python = "^3.11"',
+    ]
+    for pkg in packages:
+        pyproject.append(
+            f'{pkg.name} = {{version = "{pkg.version}", source = "bench"}}'
+        )
+    pyproject += [
+        "",
+        "[[tool.poetry.source]]",
+        'name = "bench"',
+        f"url = {_toml_str(index_url)}",
+        'priority = "primary"',
+        "",
+    ]
+    (dest / "pyproject.toml").write_text("\n".join(pyproject))
+    (dest / "poetry.lock").write_text(poetry_lock_text(packages, index_url))
+
+    elk = [
+        "[python]",
+        "version = [3, 12]",
+        'interpreter = "cp312"',
+        "",
+    ]
+    if concurrency is not None:
+        elk += ["[resolve]", f"concurrency = {concurrency}", ""]
+    if cache:
+        elk += ["[cache]", 'directory = ".elk-cache"', ""]
+    else:
+        elk += ["[cache]", "enabled = false", ""]
+    for name, config in list(ELK_PLATFORMS.items())[:platforms]:
+        elk.append(f"[platform.{name}]")
+        for k, v in config.items():
+            elk.append(f"{k} = {json.dumps(v)}")
+        elk.append('abi = ["cp312", "abi3", "none"]')
+        elk.append("")
+    (dest / "elk.toml").write_text("\n".join(elk))
+
+
+class IndexServer:
+    """A PEP 503 simple index on localhost serving ``packages``' links.
+
+    Use as a context manager; ``url`` is the ``/simple/`` base to put in a
+    poetry source. ``delay`` adds per-request latency to mimic a remote index.
+    Pass a fixed ``port`` to make generated URLs comparable between runs.
+    """
+
+    def __init__(
+        self, packages: list[SyntheticPackage], delay: float = 0.0, port: int = 0
+    ) -> None:
+        by_name: dict[str, list[SyntheticPackage]] = {}
+        for pkg in packages:
+            by_name.setdefault(pkg.name, []).append(pkg)
+        pages = {name: _simple_page(pkgs) for name, pkgs in by_name.items()}
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                # ThreadingHTTPServer runs each request on its own thread
+                with server._lock:
+                    server.requests += 1
+                if delay:
+                    time.sleep(delay)
+                parts = [p for p in self.path.split("/") if p]
+                page = pages.get(parts[1]) if len(parts) == 2 else None
+                if parts[:1] != ["simple"] or page is None:
+                    self.send_error(404)
+                    return
+                body = page.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/simple/"
+
+    def __enter__(self) -> "IndexServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _simple_page(packages: list[SyntheticPackage]) -> str:
+    links = "\n".join(
+        f'<a href="../../files/{f}#{pkg.hash(f).replace(":", "=")}">{f}</a><br/>'
+        for pkg in packages
+        for f in pkg.files
+    )
+    return f"<!DOCTYPE html>\n<html><body>\n{links}\n</body></html>\n"
+
+
+def iter_sizes(spec: str) -> Iterator[int]:
+    """Parse ``"100,1000,5000"`` into ints."""
+    for part in spec.split(","):
+        if part.strip():
+            yield int(part)
@@ -0,0 +1,128 @@
+"""Benchmark the poetry dependency walker on synthetic locked repositories.
+
+Usage:
+    python bench/walker.py                      # 100, 1000 and 5000 packages
+    python bench/walker.py --packages 1000 --fork-every 3
+
+Every ``--fork-every``-th package is locked twice, split by python version,
+and a share of requirements carry python-version markers, so the walker has
+plenty of regions and markers to intersect. Needs poetry importable, e.g.
+run it with the interpreter poetry is installed into.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from poetry.core.packages.dependency import Dependency
+from poetry.core.packages.package import Package
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from synthetic import iter_sizes  # noqa: E402
+
+from poetry_plugin_elk.walker import get_project_dependencies  # noqa: E402
+
+_FORKS = [
+    ("1.0.0", ">=3.8,<3.10"),
+    ("2.0.0", ">=3.10,<3.12"),
+    ("3.0.0", ">=3.12"),
+]
+
+_MARKERS = [
+    "",
+    'python_version >= "3.9"',
+    'python_version < "3.12"',
+    'sys_platform == "linux"',
+]
+
+
+def locked_repository(
+    count: int, fork_every: int
+) -> tuple[list[Package], list[Dependency]]:
+    """Synthetic locked packages and the root project's requirements."""
+    packages = []
+    for i in range(count):
+        name = f"pkg{i:05d}"
+        forks = _FORKS if fork_every and i % fork_every == 0 else [("1.0.0", ">=3.8")]
+        for version, python in forks:
+            package = Package(name, version)
+            package.python_versions = python
+            for n, j in enumerate((i + 1, i + 7, i + 13)):
+                if j >= count:
+                    continue
+                dep = Dependency(f"pkg{j:05d}", ">=1.0")
+                marker = _MARKERS[(i + n) % len(_MARKERS)]
+                if marker:
+                    dep.marker = dep.marker.intersect(
+                        Dependency.create_from_pep_508(f"x; {marker}").marker
+                    )
+                package.add_dependency(dep)
+            packages.append(package)
+
+    # roots are never forked packages, which need region markers to pick from
+    roots = [
+        Dependency(f"pkg{i:05d}", ">=1.0")
+        for i in range(1, count, 10)
+        if not (fork_every and i % fork_every == 0)
+    ]
+    for root in roots:
+        root.marker = Dependency.create_from_pep_508(
+            'x; python_version >= "3.8"'
+        ).marker
+    return packages, roots
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--packages", default="100,1000,5000", help="comma-separated sizes"
+    )
+    parser.add_argument("--fork-every", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    opts = parser.parse_args()
+
+    results = []
+    for count in iter_sizes(opts.packages):
+        packages, roots = locked_repository(count, opts.fork_every)
+        times = []
+        for _ in range(opts.repeat):
+            start = time.perf_counter()
+            walked = list(
+                get_project_dependencies(
+                    project_requires=roots,
+                    locked_packages=packages,
+                    root_package_name="bench-root",
+                )
+            )
+            times.append(time.perf_counter() - start)
+        results.append(
+            {
+                "packages": count,
+                "locked": len(packages),
+                "walked": len(walked),
+                "fork_every": opts.fork_every,
+                "median_s": round(statistics.median(times), 4),
+                "times_s": [round(t, 4) for t in times],
+            }
+        )
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+    else:
+        json.dump(results, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
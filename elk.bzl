@@ -35,6 +35,8 @@ WheelFile = record(
     file = str,
     hash = str,
     url = field(str | None, None),
+    # bytes, when the lock records it (uv.lock does, poetry.lock doesn't)
+    size = field(int | None, None),
 )
 
 Package = record(
@@ -42,6 +44,50 @@ Package = record(
     version = str,
     files = list[WheelFile],
     deps = list[str],
+    # Name of the package's alias target. Defaults to the normalised name,
+    # versioned (``{name}-{version}``) when the package list holds several
+    # versions of it.
+    alias = field(str | None, None),
+    # Source distribution, built into a wheel for platforms without one when
+    # ``elk_packages(build_sdists = True)``.
+    sdist = field(WheelFile | None, None),
+    # dep name -> PEP 508 marker, for deps that only apply on some platforms
+    dep_markers = field(dict[str, str], {}),
+    # uv fork markers of one of several versions; the versions share a
+    # ``{name}`` alias that picks the one whose markers match per platform
+    resolution_markers = field(list[str], []),
+)
+
+# What ``elk_packages(report, max_wheel_bytes, max_closure_bytes)`` asks for.
+SizeCheck = record(
+    report = bool,
+    max_wheel_bytes = int | None,
+    max_closure_bytes = int | None,
+)
+
+# One block of a factored tags file: every interpreter x abi x platform
+# combination, interpreters outermost, each axis mapped to its position.
+TagGroup = record(
+    interpreters = dict[str, int],
+    abis = dict[str, int],
+    platforms = dict[str, int],
+)
+
+# Everything the uv helpers need from a uv.lock, built once by ``lock_index``.
+LockIndex = record(
+    # [(lock entry, [versioned dep name, ...]), ...] in lock order
+    packages = list,
+    # normalised name -> lock entries with that name
+    by_name = dict[str, list[dict]],
+    # normalised name -> versioned dep names of the first entry with that name
+    deps = dict[str, list[str]],
+    # normalised name -> path of editable workspace members (except ".")
+    members = dict[str, str],
+    # normalised name -> True for non-workspace packages locked at several versions
+    multi_version = dict[str, bool],
+    # normalised name -> True for multi_version packages whose every version
+    # has ``resolution-markers``; deps name them unversioned
+    forked = dict[str, bool],
 )
 
 # ---------------------------------------------------------------------------
@@ -71,33 +117,122 @@ def _parse_wheel_filename(filename: str) -> [WheelInfo, None]:
         platform_tags = plat.split("."),
     )
 
-def _wheel_matches_tag(wheel: WheelInfo, tag_str: str) -> bool:
-    """True if a parsed wheel is compatible with a tag string."""
-    parts = tag_str.split("-", 2)
-    if len(parts) != 3:
-        return False
-    interp, abi, plat = parts
-    return (interp in wheel.python_tags and
-            abi in wheel.abi_tags and
-            plat in wheel.platform_tags)
+def _wheel_tags(wheel: WheelInfo) -> list[str]:
+    """Expand a wheel's compressed tag sets into every ``interp-abi-plat`` tag it supports."""
+    return [
+        "{}-{}-{}".format(interp, abi, plat)
+        for interp in wheel.python_tags
+        for abi in wheel.abi_tags
+        for plat in wheel.platform_tags
+    ]
+
+def _index_of(values: list[str]) -> dict[str, int]:
+    """Map each value to its first position."""
+    index = {}
+    for i, v in enumerate(values):
+        if v not in index:
+            index[v] = i
+    return index
+
+def _tag_groups(factored: dict) -> list[TagGroup]:
+    """Per-axis rank tables for a factored tags file (see ``save_tags``)."""
+    return [
+        TagGroup(
+            interpreters = _index_of(g["interpreters"]),
+            abis = _index_of(g["abis"]),
+            platforms = _index_of(g["platforms"]),
+        )
+        for g in factored["groups"]
+    ]
 
-def _choose_wheel(files: list[WheelFile], tags: list[str]) -> [WheelFile, None]:
-    """Pick the highest-priority wheel for a platform.
+def _tag_ranks(tags: list[str] | dict) -> dict[str, int] | list[TagGroup]:
+    """Precompute tag priorities for a platform. Build once per platform.
+
+    A flat tags list becomes ``{tag: rank}`` (0 = best). A factored tags
+    file becomes a list of ``TagGroup``, ranked without expanding it.
+    """
+    if type(tags) == "dict":
+        return _tag_groups(tags)
+
+    # keep the first occurrence if a tags file contains duplicates
+    return _index_of(tags)
+
+_UNIVERSAL_TAG = "py3-none-any"
+
+def _wheel_candidates(files: list[WheelFile]) -> list:
+    """Parse a package's wheels once into ``[(WheelFile, [tag, ...], WheelInfo), ...]``.
 
-    Iterates tags in priority order (best first), returns the first file
-    whose wheel filename matches.
+    Non-wheel files (sdists) are dropped.
     """
-    parsed = []
+    candidates = []
     for f in files:
         w = _parse_wheel_filename(f.file)
         if w != None:
-            parsed.append((f, w))
-    for tag in tags:
-        for f, w in parsed:
-            if _wheel_matches_tag(w, tag):
-                return f
+            candidates.append((f, _wheel_tags(w), w))
+    return candidates
+
+def _choose_grouped(candidates: list, groups: list[TagGroup]) -> [WheelFile, None]:
+    """``_choose_ranked`` for factored tags.
+
+    Groups are in priority order, so the first group any wheel matches holds
+    the best tag. Within it a tag's rank is its position in the cross
+    product, computed from the per-axis positions.
+    """
+    for g in groups:
+        abi_count = len(g.abis)
+        platform_count = len(g.platforms)
+        best = None
+        best_rank = None
+        for f, _tags, w in candidates:
+            for interp in w.python_tags:
+                i = g.interpreters.get(interp)
+                if i == None:
+                    continue
+                for abi in w.abi_tags:
+                    a = g.abis.get(abi)
+                    if a == None:
+                        continue
+                    base = (i * abi_count + a) * platform_count
+                    for plat in w.platform_tags:
+                        p = g.platforms.get(plat)
+                        if p != None and (best_rank == None or base + p < best_rank):
+                            best = f
+                            best_rank = base + p
+        if best != None:
+            return best
     return None
 
+def _choose_ranked(candidates: list, ranks: dict[str, int] | list[TagGroup]) -> [WheelFile, None]:
+    """Pick the wheel with the best-ranked tag, using precomputed tag ranks.
+
+    Ties go to the earlier file, matching the tags-major scan order of
+    ``_choose_wheel``.
+    """
+    if type(ranks) != "dict":
+        return _choose_grouped(candidates, ranks)
+    if len(candidates) == 1 and candidates[0][1] == [_UNIVERSAL_TAG]:
+        # Pure-python packages: no ranking needed, just membership.
+        return candidates[0][0] if _UNIVERSAL_TAG in ranks else None
+    best = None
+    best_rank = None
+    for f, wheel_tags, _w in candidates:
+        for tag in wheel_tags:
+            rank = ranks.get(tag)
+            if rank != None and (best_rank == None or rank < best_rank):
+                best = f
+                best_rank = rank
+    return best
+
+def _choose_wheel(files: list[WheelFile], tags: list[str] | dict) -> [WheelFile, None]:
+    """Pick the highest-priority wheel for a platform.
+
+    Returns the file matching the earliest tag in *tags* (best first, flat or
+    factored). When
+    choosing for many packages, build ``_tag_ranks`` once and call
+    ``_choose_ranked`` instead.
+    """
+    return _choose_ranked(_wheel_candidates(files), _tag_ranks(tags))
+
 # ---------------------------------------------------------------------------
 # URL construction
 # ---------------------------------------------------------------------------
@@ -119,12 +254,45 @@ def _pypi_url(filename: str) -> str:
         filename,
     )
 
+def _pypi_sdist_url(name: str, filename: str) -> str:
+    """Build a PyPI download URL for an sdist, via the ``packages/source`` redirect."""
+    return "https://files.pythonhosted.org/packages/source/{}/{}/{}".format(
+        name[0],
+        name,
+        filename,
+    )
+
+def _is_sdist(filename: str) -> bool:
+    return filename.endswith(".tar.gz") or filename.endswith(".zip")
+
 def _wheel_url(wf: WheelFile) -> str:
     """Return the download URL for a wheel file, constructing one if needed."""
     if wf.url != None:
         return wf.url
     return _pypi_url(wf.file)
 
+def _mirror_urls(mirrors: list[str], wf: WheelFile, sha256: str, name: str, origin: str) -> list[str]:
+    """Expand mirror URL templates for one wheel, in order, ahead of *origin*.
+
+    Templates may use ``{filename}``, ``{sha256}``, ``{name}`` (normalised
+    project name) and ``{path}`` (the origin URL without scheme and host).
+    """
+    if not mirrors:
+        return [origin]
+    path = origin.split("://", 1)[-1].split("/", 1)[-1]
+    urls = [
+        m.format(filename = wf.file, sha256 = sha256, name = name, path = path)
+        for m in mirrors
+    ]
+    urls.append(origin)
+    return urls
+
+def _check_mirrors(mirrors: list[str]):
+    """Fail on mirror templates ``http_file`` can't download from."""
+    for m in mirrors:
+        if not (m.startswith("http://") or m.startswith("https://")):
+            fail("mirror {} isn't an http:// or https:// URL template; downloads only go over HTTP. Serve a local wheelhouse with e.g. `python3 -m http.server --directory wheelhouse` and use http://localhost:8000/{{sha256}}/{{filename}}".format(repr(m)))
+
 # ---------------------------------------------------------------------------
 # Name helpers
 # ---------------------------------------------------------------------------
@@ -133,47 +301,557 @@ def _normalize(name: str) -> str:
     """PEP 503 normalize a package name (lowercase, collapse [-_.] to -)."""
     return name.lower().replace("_", "-").replace(".", "-")
 
+# ---------------------------------------------------------------------------
+# Root closure
+# ---------------------------------------------------------------------------
+
+def _package_closure(packages: list[Package], roots: list[str]) -> list[Package]:
+    """Return the packages reachable from *roots* over ``Package.deps``.
+
+    Roots are package names, or versioned target names (``{name}-{version}``)
+    of packages locked at several versions; a plain name matches every
+    version. Deps naming packages that are not in *packages* are ignored.
+    Packages keep their original order.
+    """
+    by_name = {}  # target name -> [index into packages]
+    for i, pkg in enumerate(packages):
+        n = _normalize(pkg.name)
+        by_name.setdefault(n, []).append(i)
+        by_name.setdefault("{}-{}".format(n, pkg.version), []).append(i)
+
+    frontier = []
+    for root in roots:
+        found = by_name.get(root, by_name.get(_normalize(root)))
+        if found == None:
+            fail("root '{}' is not a package in the lock file".format(root))
+        frontier.extend(found)
+
+    # Breadth-first, one level per iteration. Every level reaches at least one
+    # new package or ends the walk, so len(packages) + 1 levels is enough.
+    reached = {}
+    for _ in range(len(packages) + 1):
+        if not frontier:
+            break
+        next_frontier = []
+        for i in frontier:
+            if i in reached:
+                continue
+            reached[i] = True
+            for d in packages[i].deps:
+                next_frontier.extend(by_name.get(d, []))
+        frontier = next_frontier
+
+    return [pkg for i, pkg in enumerate(packages) if i in reached]
+
+# ---------------------------------------------------------------------------
+# Environment markers
+# ---------------------------------------------------------------------------
+
+# Longest first, so "===" isn't read as "==" and "<=" isn't read as "<".
+_MARKER_OPS = ["===", "==", "!=", "<=", ">=", "~=", "<", ">"]
+
+_MARKER_VERSION_VARS = ["python_version", "python_full_version", "implementation_version", "platform_release"]
+
+# Platform tag prefix -> (sys_platform, platform_system, os_name)
+_MARKER_SYSTEMS = [
+    ("manylinux", ("linux", "Linux", "posix")),
+    ("musllinux", ("linux", "Linux", "posix")),
+    ("linux", ("linux", "Linux", "posix")),
+    ("macosx", ("darwin", "Darwin", "posix")),
+    ("win", ("win32", "Windows", "nt")),
+]
+
+# Windows platform tag -> platform_machine
+_MARKER_WINDOWS_MACHINES = {"win32": "x86", "win_amd64": "AMD64", "win_arm64": "ARM64"}
+
+def _tag_blocks(tags: list[str] | dict) -> list:
+    """A tags file as ``[(interpreters, abis, platforms), ...]`` in priority order."""
+    if type(tags) == "dict":
+        return [(g["interpreters"], g["abis"], g["platforms"]) for g in tags["groups"]]
+    blocks = []
+    for tag in tags:
+        interp, abi, plat = tag.split("-")
+        blocks.append(([interp], [abi], [plat]))
+    return blocks
+
+def _interpreter_version(interp: str, abi: str) -> [tuple, None]:
+    """``(python_version, implementation)`` if *abi* is *interp*'s own ABI.
+
+    Only a tag like ``cp312-cp312`` (or ``cp312-cp312t``, ``pp310-pypy310_pp73``)
+    names the running interpreter. ``cp310-abi3`` and ``py3-none`` also match
+    older and newer pythons, so they say nothing about its version.
+    """
+    if len(interp) < 4 or not interp[2:].isdigit():
+        return None
+    version = "{}.{}".format(interp[2], interp[3:])
+    if interp.startswith("cp") and abi.startswith(interp):
+        return version, ("cpython", "CPython")
+    if interp.startswith("pp") and abi.startswith("pypy{}_".format(interp[2:])):
+        return version, ("pypy", "PyPy")
+    return None
+
+def marker_environment(tags: list[str] | dict) -> dict[str, str]:
+    """PEP 508 marker variables for a platform, read off its tags.
+
+    The python version and implementation come from the first tag naming the
+    interpreter's own ABI (``cp312-cp312-...``), which ``save_tags`` writes
+    first and ``prune_tags`` always keeps. ``sys_platform``,
+    ``platform_system``, ``os_name`` and ``platform_machine`` come from the
+    first platform tag that isn't ``any``. Variables the tags don't tell are
+    left out; ``elk_packages`` fails on a marker that needs one.
+    """
+    env = {}
+    for interps, abis, plats in _tag_blocks(tags):
+        if "python_version" not in env:
+            for interp in interps:
+                for abi in abis:
+                    found = _interpreter_version(interp, abi)
+                    if found != None and "python_version" not in env:
+                        env["python_version"] = found[0]
+                        env["implementation_name"] = found[1][0]
+                        env["platform_python_implementation"] = found[1][1]
+        if "sys_platform" not in env and plats[0] != "any":
+            plat = plats[0]
+            for prefix, system in _MARKER_SYSTEMS:
+                if plat.startswith(prefix):
+                    env["sys_platform"] = system[0]
+                    env["platform_system"] = system[1]
+                    env["os_name"] = system[2]
+                    machine = None
+                    if prefix == "win":
+                        machine = _MARKER_WINDOWS_MACHINES.get(plat)
+                    elif prefix == "macosx":
+                        # macosx_14_0_arm64
+                        machine = plat.split("_", 3)[-1]
+                    else:
+                        # manylinux_2_17_x86_64, manylinux2014_x86_64, linux_x86_64
+                        parts = plat.split("_")
+                        for i in range(1, len(parts)):
+                            if not parts[i].isdigit():
+                                machine = "_".join(parts[i:])
+                                break
+                    if machine:
+                        env["platform_machine"] = machine
+                    break
+        if "python_version" in env and "sys_platform" in env:
+            break
+    return env
+
+def _marker_unknowns(marker: str, env: dict[str, str]) -> list[str]:
+    """The variables *marker* uses that *env* doesn't have, besides ``extra``."""
+    unknown = []
+    for tok in _marker_tokens(marker):
+        if type(tok) == "tuple" and tok[0] == "var" and tok[1] != "extra" and tok[1] not in env and tok[1] not in unknown:
+            unknown.append(tok[1])
+    return unknown
+
+def _fail_undecided_marker(marker: str, env: dict[str, str], platform: str):
+    fail(("Cannot evaluate marker \"{}\" on {}: its tags don't tell {}. Set them with " +
+          "platform_markers = {{\"{}\": {{...}}}}, or use a tags file from save_tags " +
+          "or prune_tags, which starts with the interpreter's own tag.").format(
+        marker,
+        platform,
+        ", ".join(_marker_unknowns(marker, env)),
+        platform,
+    ))
+
+def _marker_tokens(marker: str) -> list:
+    """Split a marker into ``("str", s)``, ``("var", name)``, operators and parentheses."""
+    tokens = []
+    n = len(marker)
+    skip_to = 0
+    for i in range(n):
+        if i < skip_to:
+            continue
+        c = marker[i]
+        if c == " " or c == "\t":
+            continue
+        if c == "(" or c == ")":
+            tokens.append(c)
+            continue
+        if c == "'" or c == "\"":
+            end = marker.find(c, i + 1)
+            if end < 0:
+                fail("Unterminated string in marker: " + marker)
+            tokens.append(("str", marker[i + 1:end]))
+            skip_to = end + 1
+            continue
+        op = None
+        for candidate in _MARKER_OPS:
+            if marker[i:i + len(candidate)] == candidate:
+                op = candidate
+                break
+        if op != None:
+            tokens.append(op)
+            skip_to = i + len(op)
+            continue
+        end = n
+        for j in range(i, n):
+            if not (marker[j].isalnum() or marker[j] == "_" or marker[j] == "."):
+                end = j
+                break
+        if end == i:
+            fail("Unexpected {} in marker: {}".format(repr(c), marker))
+        word = marker[i:end]
+        if word in ("and", "or", "not", "in"):
+            tokens.append(word)
+        else:
+            tokens.append(("var", word))
+        skip_to = end
+    return tokens
+
+def _marker_version(v: str) -> list[int] | None:
+    parts = v.split(".")
+    for p in parts:
+        if not p.isdigit():
+            return None
+    return [int(p) for p in parts]
+
+def _marker_version_compare(left: str, op: str, right: str) -> [bool, None]:
+    if op in ("==", "!=") and right.endswith(".*"):
+        prefix = _marker_version(right[:-2])
+        lv = _marker_version(left)
+        if prefix == None or lv == None:
+            return None
+        matches = (lv + [0] * len(prefix))[:len(prefix)] == prefix
+        return matches if op == "==" else not matches
+    lv = _marker_version(left)
+    rv = _marker_version(right)
+    if lv == None or rv == None:
+        return None
+    width = max(len(lv), len(rv))
+    lp = lv + [0] * (width - len(lv))
+    rp = rv + [0] * (width - len(rv))
+    if op == "==":
+        return lp == rp
+    if op == "!=":
+        return lp != rp
+    if op == "<":
+        return lp < rp
+    if op == "<=":
+        return lp <= rp
+    if op == ">":
+        return lp > rp
+    if op == ">=":
+        return lp >= rp
+    if op == "~=":
+        if len(rv) < 2:
+            return None
+        prefix = rv[:-1]
+        return lp >= rp and (lv + [0] * len(prefix))[:len(prefix)] == prefix
+    return None
+
+def _marker_compare(left, op: str, right, env: dict[str, str]) -> [bool, None]:
+    """Evaluate one ``left op right`` comparison; None if it can't be decided."""
+    version = False
+    values = []
+    patch_unknown = False
+    for side in (left, right):
+        if side[0] == "var":
+            if side[1] == "extra":
+                # no extras are requested
+                values.append("")
+                continue
+            if side[1] in _MARKER_VERSION_VARS:
+                version = True
+            value = env.get(side[1])
+            if value == None and side[1] == "python_full_version" and "python_version" in env:
+                value = env["python_version"]
+                patch_unknown = True
+            values.append(value)
+        else:
+            values.append(side[1])
+    lhs, rhs = values
+    if lhs == None or rhs == None:
+        return None
+    if not patch_unknown:
+        return _marker_compare_values(lhs, op, rhs, version)
+
+    # Tags only give the minor version: decide the comparison if the first
+    # and a late patch release agree on it.
+    results = []
+    for patch in (".0", ".999"):
+        if left[0] == "var" and left[1] == "python_full_version":
+            results.append(_marker_compare_values(lhs + patch, op, rhs, version))
+        else:
+            results.append(_marker_compare_values(lhs, op, rhs + patch, version))
+    return results[0] if results[0] == results[1] else None
+
+def _marker_compare_values(lhs: str, op: str, rhs: str, version: bool) -> [bool, None]:
+    if op == "in":
+        return lhs in rhs
+    if op == "not in":
+        return lhs not in rhs
+    if version and op != "===":
+        return _marker_version_compare(lhs, op, rhs)
+    if op == "==" or op == "===":
+        return lhs == rhs
+    if op == "!=":
+        return lhs != rhs
+    return None
+
+def _marker_and(a, b):
+    if a == False or b == False:
+        return False
+    if a == None or b == None:
+        return None
+    return True
+
+def _marker_or(a, b):
+    if a == True or b == True:
+        return True
+    if a == None or b == None:
+        return None
+    return False
+
+def evaluate_marker(marker: str, env: dict[str, str]) -> [bool, None]:
+    """Evaluate a PEP 508 marker against *env* (see ``marker_environment``).
+
+    Returns None when the result depends on a variable *env* doesn't have.
+    ``extra`` is always the empty string.
+    """
+    tokens = _marker_tokens(marker)
+
+    # Comparisons become values; what's left is an infix expression of
+    # values, and/or and parentheses, evaluated with a shunting-yard pass
+    # since Starlark has no recursion.
+    items = []
+    skip_to = 0
+    for i in range(len(tokens)):
+        if i < skip_to:
+            continue
+        tok = tokens[i]
+        if tok in ("(", ")", "and", "or"):
+            items.append(tok)
+            continue
+        if type(tok) != "tuple" or i + 2 >= len(tokens):
+            fail("Cannot parse marker: " + marker)
+        op = tokens[i + 1]
+        right_at = i + 2
+        if op == "not" and tokens[i + 2] == "in":
+            op = "not in"
+            right_at = i + 3
+        if right_at >= len(tokens) or type(tokens[right_at]) != "tuple" or op not in _MARKER_OPS + ["in", "not in"]:
+            fail("Cannot parse marker: " + marker)
+        items.append(("value", _marker_compare(tok, op, tokens[right_at], env)))
+        skip_to = right_at + 1
+
+    precedence = {"and": 2, "or": 1}
+    output = []
+    stack = []
+    for item in items:
+        if type(item) == "tuple":
+            output.append(item)
+        elif item == "(":
+            stack.append(item)
+        elif item == ")":
+            for _ in range(len(stack)):
+                top = stack.pop()
+                if top == "(":
+                    break
+                output.append(top)
+        else:
+            for _ in range(len(stack)):
+                if stack[-1] != "(" and precedence[stack[-1]] >= precedence[item]:
+                    output.append(stack.pop())
+                else:
+                    break
+            stack.append(item)
+    for _ in range(len(stack)):
+        output.append(stack.pop())
+
+    values = []
+    for item in output:
+        if type(item) == "tuple":
+            values.append(item[1])
+        elif item == "(":
+            fail("Unbalanced parentheses in marker: " + marker)
+        else:
+            if len(values) < 2:
+                fail("Cannot parse marker: " + marker)
+            b = values.pop()
+            a = values.pop()
+            values.append(_marker_and(a, b) if item == "and" else _marker_or(a, b))
+    if len(values) != 1:
+        fail("Cannot parse marker: " + marker)
+    return values[0]
+
 # ---------------------------------------------------------------------------
 # Lock-file adapters
 # ---------------------------------------------------------------------------
 
-def poetry_packages(lock_data: dict) -> list[Package]:
-    """Adapt poetry.lock data (loaded as TOML) into the elk package list."""
+def _requirement_name(req: str) -> tuple:
+    """Split ``"name[extra,...] (>=1.0) ; marker"`` into the normalised name and its extras."""
+    end = len(req)
+    for c in " [(;<>=!~".elems():
+        i = req.find(c)
+        if i != -1 and i < end:
+            end = i
+    extras = []
+    if req[end:].startswith("["):
+        extras = [e.strip() for e in req[end + 1:req.find("]")].split(",") if e.strip()]
+    return _normalize(req[:end]), extras
+
+def _poetry_dep_specs(spec) -> list[dict]:
+    """A poetry.lock dependency constraint as a list of dicts (it may be a string or list)."""
+    if type(spec) == "string":
+        return [{"version": spec}]
+    if type(spec) == "dict":
+        return [spec]
+    return spec
+
+def _poetry_selection(lock_data: dict, roots: list[str] | None, groups: list[str] | None, extras: list[str]) -> dict[int, list[str]]:
+    """Package index -> dep names to follow, for the packages *groups* and *extras* select.
+
+    Starts from *roots*, or else from the non-optional packages in *groups*
+    (``groups`` in Poetry 2 locks, ``category`` before Poetry 1.5), plus the
+    packages the lock's ``[extras]`` list for *extras*. Optional deps are only
+    followed when the dependent asks for the extra that needs them. *groups*
+    None means ``main``, or every non-optional package in Poetry 1.5 to 1.8
+    locks, which don't say which group a package is in.
+    """
+    packages = lock_data["package"]
+    by_name = {}
+    for i, pkg in enumerate(packages):
+        by_name[_normalize(pkg["name"])] = i
+
+    frontier = []
+    if roots != None:
+        for root in roots:
+            if _normalize(root) not in by_name:
+                fail("root '{}' is not a package in the lock file".format(root))
+            frontier.append((by_name[_normalize(root)], ""))
+    else:
+        for i, pkg in enumerate(packages):
+            if pkg.get("optional", False):
+                continue
+            pkg_groups = pkg.get("groups", [pkg["category"]] if "category" in pkg else None)
+            if pkg_groups == None:
+                if groups != None:
+                    fail(("poetry.lock doesn't record the groups of '{}'; Poetry 1.5 to 1.8 " +
+                          "leave them out. Relock with Poetry 2 to select groups, or use roots.").format(pkg["name"]))
+                frontier.append((i, ""))
+            elif [g for g in pkg_groups if g in (groups if groups != None else ["main"])]:
+                frontier.append((i, ""))
+    lock_extras = lock_data.get("extras", {})
+    for extra in extras:
+        if extra not in lock_extras:
+            fail("extra '{}' is not in the lock file's [extras]".format(extra))
+        for req in lock_extras[extra]:
+            name, req_extras = _requirement_name(req)
+            if name in by_name:
+                frontier.append((by_name[name], ""))
+                for x in req_extras:
+                    frontier.append((by_name[name], x))
+
+    # (package index, "" for its required deps or the name of an extra).
+    # Every item is reached at most once, which bounds the walk.
+    bound = len(packages) + 1
+    for pkg in packages:
+        bound += len(pkg.get("extras", {}))
+    reached = {}
+    selected = {}
+    for _ in range(bound):
+        if not frontier:
+            break
+        next_frontier = []
+        for item in frontier:
+            if item in reached:
+                continue
+            reached[item] = True
+            i, extra = item
+            pkg = packages[i]
+            names = selected.setdefault(i, [])
+            if extra == "":
+                for dep_name, spec in pkg.get("dependencies", {}).items():
+                    specs = _poetry_dep_specs(spec)
+                    if [d for d in specs if not d.get("optional", False)]:
+                        name = _normalize(dep_name)
+                        if name not in names:
+                            names.append(name)
+                        if name in by_name:
+                            next_frontier.append((by_name[name], ""))
+                            for d in specs:
+                                for x in d.get("extras", []):
+                                    next_frontier.append((by_name[name], x))
+            else:
+                for req in pkg.get("extras", {}).get(extra, []):
+                    name, req_extras = _requirement_name(req)
+                    if name not in by_name:
+                        continue
+                    if name != _normalize(pkg["name"]) and name not in names:
+                        names.append(name)
+                    next_frontier.append((by_name[name], ""))
+                    for x in req_extras:
+                        next_frontier.append((by_name[name], x))
+        frontier = next_frontier
+    return selected
+
+def poetry_packages(lock_data: dict, roots: list[str] | None = None, groups: list[str] | None = None, extras: list[str] | None = None) -> list[Package]:
+    """Adapt poetry.lock data (loaded as TOML) into the elk package list.
+
+    Args:
+        lock_data: Parsed poetry.lock TOML data.
+        roots: If given, only return these packages and their transitive deps.
+        groups: Only return the packages of these dependency groups (e.g.
+                ``["main"]``), their deps and those of *extras*. Needs a
+                lock that records groups: Poetry 2 locks do, and those
+                before Poetry 1.5 record a main/dev ``category``. Locks
+                from Poetry 1.5 to 1.8 record neither, and fail.
+        extras: Also return the packages the project's extras need (the
+                lock's ``[extras]``); without *groups*, on top of ``main``
+                (every non-optional package if the lock has no groups).
+                Selecting groups or extras leaves out optional deps that no
+                package asks for.
+    """
+    selection = None
+    if groups != None or extras != None:
+        selection = _poetry_selection(lock_data, roots, groups, extras or [])
+
     result = []
-    for pkg in lock_data["package"]:
-        deps = []
-        for dep_name in pkg.get("dependencies", {}).keys():
-            deps.append(_normalize(dep_name))
+    for i, pkg in enumerate(lock_data["package"]):
+        if selection != None:
+            if i not in selection:
+                continue
+            deps = selection[i]
+        else:
+            deps = []
+            for dep_name in pkg.get("dependencies", {}).keys():
+                deps.append(_normalize(dep_name))
 
         files = []
+        sdist = None
         for f in pkg.get("files", []):
             files.append(WheelFile(
                 file = f["file"],
                 hash = f["hash"],
             ))
+            if sdist == None and _is_sdist(f["file"]):
+                sdist = WheelFile(
+                    file = f["file"],
+                    hash = f["hash"],
+                    url = _pypi_sdist_url(pkg["name"], f["file"]),
+                )
 
         result.append(Package(
             name = pkg["name"],
             version = pkg["version"],
             files = files,
             deps = deps,
+            sdist = sdist,
         ))
+    if roots != None and selection == None:
+        return _package_closure(result, roots)
     return result
 
 def _url_filename(url: str) -> str:
     """Extract the filename from a URL."""
     return url.rsplit("/", 1)[-1]
 
-def _multi_version_set(lock_data: dict) -> dict:
-    """Return {normalized_name: True} for packages that appear with multiple versions."""
-    counts = {}
-    for pkg in lock_data["package"]:
-        source = pkg.get("source", {})
-        if type(source) == "dict" and (source.get("virtual") != None or source.get("editable") != None):
-            continue
-        n = _normalize(pkg["name"])
-        counts[n] = counts.get(n, 0) + 1
-    return {n: True for n, c in counts.items() if c > 1}
+def _is_workspace_package(pkg: dict) -> bool:
+    """True for the root project (virtual source) and workspace members (editable)."""
+    source = pkg.get("source", {})
+    return type(source) == "dict" and (source.get("virtual") != None or source.get("editable") != None)
 
 def _versioned_dep_name(dep: dict, multi_version: dict) -> str:
     """Return the target name for a dep entry, versioned when the dep has multiple versions."""
@@ -183,26 +861,199 @@ def _versioned_dep_name(dep: dict, multi_version: dict) -> str:
         return "{}-{}".format(name, version)
     return name
 
-def uv_packages(lock_data: dict) -> list[Package]:
-    """Adapt uv.lock data (loaded as TOML) into the elk package list.
+def _dep_target_name(dep: dict, multi_version: dict, forked: dict) -> str:
+    """Return the target a dep entry points at: the shared alias of a forked package."""
+    name = _normalize(dep["name"])
+    if forked.get(name):
+        return name
+    return _versioned_dep_name(dep, multi_version)
+
+def lock_index(lock_data: dict) -> LockIndex:
+    """Index uv.lock data (loaded as TOML) for the uv helpers.
+
+    ``uv_packages``, ``uv_deps``, ``uv_workspace_aliases`` and
+    ``create_workspace_member_macro`` accept either raw lock data or a
+    ``LockIndex``. Raw lock data is indexed on every call, so when several
+    calls share one lock, build the index once in a ``.bzl`` file and pass
+    that around instead::
+
+        load(":uv.lock.toml", lock = "value")
+        index = lock_index(lock)
+    """
+    by_name = {}
+    members = {}
+    counts = {}
+    for pkg in lock_data["package"]:
+        n = _normalize(pkg["name"])
+        by_name.setdefault(n, []).append(pkg)
+        if _is_workspace_package(pkg):
+            path = pkg["source"].get("editable")
+            if path != None and path != ".":
+                members[n] = path
+        else:
+            counts[n] = counts.get(n, 0) + 1
+    multi_version = {n: True for n, c in counts.items() if c > 1}
+    forked = {}
+    for n in multi_version:
+        if all([entry.get("resolution-markers") for entry in by_name[n]]):
+            forked[n] = True
+
+    packages = []
+    deps = {}
+    for pkg in lock_data["package"]:
+        pkg_deps = []
+        for dep in pkg.get("dependencies", []):
+            # a forked dep is listed once per version; both map to its alias
+            d = _dep_target_name(dep, multi_version, forked)
+            if d not in pkg_deps:
+                pkg_deps.append(d)
+        packages.append((pkg, pkg_deps))
+        n = _normalize(pkg["name"])
+        if n not in deps:
+            deps[n] = pkg_deps
+
+    return LockIndex(
+        packages = packages,
+        by_name = by_name,
+        deps = deps,
+        members = members,
+        multi_version = multi_version,
+        forked = forked,
+    )
+
+def _as_lock_index(lock: dict | LockIndex) -> LockIndex:
+    if type(lock) == "dict":
+        return lock_index(lock)
+    return lock
+
+def _uv_selection(index: LockIndex, roots: list[str] | None, groups: list[str], extras: list[str]) -> dict[int, list[dict]]:
+    """Lock entry index -> dep entries to follow, for the packages *groups* and *extras* select.
+
+    Starts from *roots*, or else from the root project and workspace members.
+    Those follow their ``dependencies``, the ``dev-dependencies`` of *groups*
+    and the ``optional-dependencies`` of *extras*; every other package
+    follows its ``dependencies`` and the optional ones of the extras its
+    dependents ask for (``extra = [...]``).
+    """
+    entries = [pkg for pkg, _ in index.packages]
+    by_name = {}  # normalised name -> [lock entry index]
+    for i, pkg in enumerate(entries):
+        by_name.setdefault(_normalize(pkg["name"]), []).append(i)
+
+    def resolve(dep):
+        found = by_name.get(_normalize(dep["name"]), [])
+        if len(found) > 1 and dep.get("version") != None:
+            return [i for i in found if entries[i].get("version") == dep["version"]]
+        return found
+
+    if roots == None:
+        starts = [i for i, pkg in enumerate(entries) if _is_workspace_package(pkg)]
+    else:
+        starts = []
+        for root in roots:
+            if _normalize(root) not in by_name:
+                fail("root '{}' is not a package in the lock file".format(root))
+            starts.extend(by_name[_normalize(root)])
+
+    # (lock entry index, "" for its dependencies, "group:" + a group or an extra)
+    frontier = []
+    found = {}
+    for i in starts:
+        frontier.append((i, ""))
+        if _is_workspace_package(entries[i]):
+            for g in groups:
+                if g in entries[i].get("dev-dependencies", {}):
+                    frontier.append((i, "group:" + g))
+                    found["group:" + g] = True
+            for x in extras:
+                if x in entries[i].get("optional-dependencies", {}):
+                    frontier.append((i, x))
+                    found[x] = True
+    for g in groups:
+        if "group:" + g not in found:
+            fail("dependency group '{}' is not in the lock file".format(g))
+    for x in extras:
+        if x not in found:
+            fail("extra '{}' is not in the lock file".format(x))
+
+    # Every item is reached at most once, which bounds the walk.
+    bound = len(entries) + 1
+    for pkg in entries:
+        bound += len(pkg.get("optional-dependencies", {})) + len(pkg.get("dev-dependencies", {}))
+    reached = {}
+    selected = {}
+    for _ in range(bound):
+        if not frontier:
+            break
+        next_frontier = []
+        for item in frontier:
+            if item in reached:
+                continue
+            reached[item] = True
+            i, part = item
+            pkg = entries[i]
+            if part == "":
+                dep_entries = pkg.get("dependencies", [])
+            elif part.startswith("group:"):
+                dep_entries = pkg.get("dev-dependencies", {}).get(part[len("group:"):], [])
+            else:
+                dep_entries = pkg.get("optional-dependencies", {}).get(part, [])
+            selected.setdefault(i, []).extend(dep_entries)
+            for dep in dep_entries:
+                for j in resolve(dep):
+                    next_frontier.append((j, ""))
+                    for x in dep.get("extra", []):
+                        next_frontier.append((j, x))
+        frontier = next_frontier
+    return selected
+
+def uv_packages(lock_data: dict | LockIndex, roots: list[str] | None = None, groups: list[str] | None = None, extras: list[str] | None = None) -> list[Package]:
+    """Adapt uv.lock data (loaded as TOML, or a ``lock_index``) into the elk package list.
 
     uv.lock includes full blake2b URLs, which are passed through directly.
 
     When the lock file contains multiple versions of the same package (e.g. for
     different Python version markers), each version gets its own targets named
-    ``{name}-{version}`` instead of the plain ``{name}``. Dep references use the
-    same versioned names so the graph remains consistent.
+    ``{name}-{version}`` instead of the plain ``{name}``. If uv forked the
+    resolution, every version carries ``resolution-markers``: ``elk_packages``
+    then adds a ``{name}`` alias selecting the version whose markers match each
+    platform, and deps point at it. Otherwise deps use the versioned names.
+
+    Args:
+        lock_data: Parsed uv.lock TOML data, or a ``lock_index``.
+        roots: If given, only return these packages and their transitive deps.
+               The root project and workspace members may be named here too;
+               they stand for their dependencies.
+        groups: Only return what the root project and workspace members (or
+                *roots*) need with these dependency groups, e.g. ``["dev"]``.
+                ``[]`` selects their dependencies alone.
+        extras: As *groups*, for the project's optional dependencies. When
+                either is given, packages also depend on the optional deps
+                of the extras they are asked for.
     """
-    multi_version = _multi_version_set(lock_data)
+    index = _as_lock_index(lock_data)
+
+    selection = None
+    if groups != None or extras != None:
+        selection = _uv_selection(index, roots, groups or [], extras or [])
 
     result = []
-    for pkg in lock_data["package"]:
+    for i, entry in enumerate(index.packages):
+        pkg, deps = entry
         # Skip the root project (virtual source) and workspace members (editable)
-        source = pkg.get("source", {})
-        if type(source) == "dict" and (source.get("virtual") != None or source.get("editable") != None):
+        if _is_workspace_package(pkg):
             continue
 
-        deps = [_versioned_dep_name(dep, multi_version) for dep in pkg.get("dependencies", [])]
+        dep_entries = pkg.get("dependencies", [])
+        if selection != None:
+            if i not in selection:
+                continue
+            dep_entries = selection[i]
+            deps = []
+            for dep in dep_entries:
+                d = _dep_target_name(dep, index.multi_version, index.forked)
+                if d not in deps:
+                    deps.append(d)
 
         files = []
         for w in pkg.get("wheels", []):
@@ -210,17 +1061,59 @@ def uv_packages(lock_data: dict) -> list[Package]:
                 file = _url_filename(w["url"]),
                 hash = w["hash"],
                 url = w["url"],
+                size = w.get("size"),
             ))
 
+        # A dep listed more than once (e.g. per python version) applies
+        # wherever any of its markers does; with no marker, everywhere.
+        dep_markers = {}
+        unconditional = {}
+        for dep in dep_entries:
+            dep_name = _dep_target_name(dep, index.multi_version, index.forked)
+            marker = dep.get("marker")
+            if marker == None:
+                unconditional[dep_name] = True
+            elif dep_name in dep_markers:
+                dep_markers[dep_name] = "({}) or ({})".format(dep_markers[dep_name], marker)
+            else:
+                dep_markers[dep_name] = marker
+        dep_markers = {d: m for d, m in dep_markers.items() if d not in unconditional}
+
+        sdist = pkg.get("sdist")
+        if sdist != None and sdist.get("url") != None and sdist.get("hash") != None:
+            sdist = WheelFile(
+                file = _url_filename(sdist["url"]),
+                hash = sdist["hash"],
+                url = sdist["url"],
+                size = sdist.get("size"),
+            )
+        else:
+            sdist = None
+
         result.append(Package(
             name = pkg["name"],
             version = pkg["version"],
             files = files,
             deps = deps,
+            # fixed here so that it survives pruning to roots
+            alias = _versioned_dep_name(pkg, index.multi_version),
+            sdist = sdist,
+            dep_markers = dep_markers,
+            resolution_markers = pkg.get("resolution-markers", []) if index.forked.get(_normalize(pkg["name"])) else [],
         ))
+
+    if roots != None and selection == None:
+        expanded = []
+        for root in roots:
+            entries = index.by_name.get(_normalize(root), [])
+            if entries and _is_workspace_package(entries[0]):
+                expanded.extend(index.deps[_normalize(root)])
+            else:
+                expanded.append(root)
+        return _package_closure(result, expanded)
     return result
 
-def uv_workspace_aliases(lock_data: dict, visibility: list[str] = ["PUBLIC"]):
+def uv_workspace_aliases(lock_data: dict | LockIndex, visibility: list[str] = ["PUBLIC"]):
     """Create alias targets for uv workspace members in a flat namespace.
 
     Reads editable packages from uv.lock (skipping ``editable = "."``) and for
@@ -236,17 +1129,10 @@ def uv_workspace_aliases(lock_data: dict, visibility: list[str] = ["PUBLIC"]):
     with name matching the normalised package name.
 
     Args:
-        lock_data: Parsed uv.lock TOML data.
+        lock_data: Parsed uv.lock TOML data, or a ``lock_index``.
         visibility: Visibility for the alias targets.
     """
-    members = {}
-    for pkg in lock_data["package"]:
-        source = pkg.get("source", {})
-        if type(source) == "dict":
-            path = source.get("editable")
-            if path != None and path != ".":
-                members[_normalize(pkg["name"])] = path
-    _elk_workspace_aliases(members, visibility)
+    _elk_workspace_aliases(_as_lock_index(lock_data).members, visibility)
 
 def _module_name(name: str) -> str:
     """Derive the Python module name from a package name (hyphens/dots → underscores)."""
@@ -254,7 +1140,7 @@ def _module_name(name: str) -> str:
 
 def create_workspace_member_macro(
         *,
-        lock_data: dict,
+        lock_data: dict | LockIndex,
         root: str,
         src_root: str = "src",
         version: str | None = None):
@@ -278,7 +1164,7 @@ def create_workspace_member_macro(
         )
 
     Args:
-        lock_data: Parsed uv.lock TOML data.
+        lock_data: Parsed uv.lock TOML data, or a ``lock_index``.
         root: The Buck2 target path of the workspace root BUCK package,
               e.g. ``"//example/uv_workspace"``.
         src_root: Source root directory. Defaults to ``"src"`` (uv_build / hatchling
@@ -293,20 +1179,16 @@ def create_workspace_member_macro(
     """
 
     # Single pass: build {normalized_name: [dep_label, ...]} for all packages.
-    multi_version = _multi_version_set(lock_data)
     all_deps = {}
-    for pkg in lock_data["package"]:
-        all_deps[_normalize(pkg["name"])] = [
-            "{}:{}".format(root, _versioned_dep_name(dep, multi_version))
-            for dep in pkg.get("dependencies", [])
-        ]
+    for pkg, deps in _as_lock_index(lock_data).packages:
+        all_deps[_normalize(pkg["name"])] = ["{}:{}".format(root, d) for d in deps]
 
     def workspace_member(*, name, **kwargs):
         _uv_workspace_member(name = name, deps = all_deps, root = root, src_root = src_root, version = version, **kwargs)
 
     return workspace_member
 
-def uv_deps(lock_data: dict, name: str) -> list[str]:
+def uv_deps(lock_data: dict | LockIndex, name: str) -> list[str]:
     """Return the resolved dependency labels for a package in the lock file.
 
     Looks up the package by normalised name and returns a list of target labels
@@ -314,17 +1196,97 @@ def uv_deps(lock_data: dict, name: str) -> list[str]:
     ``python_library`` or ``python_binary`` ``deps``.
 
     Args:
-        lock_data: Parsed uv.lock TOML data.
+        lock_data: Parsed uv.lock TOML data, or a ``lock_index``.
         name: Normalised package name to look up.
     """
-    multi_version = _multi_version_set(lock_data)
-    for pkg in lock_data["package"]:
-        if _normalize(pkg["name"]) == _normalize(name):
-            return [
-                ":{}".format(_versioned_dep_name(dep, multi_version))
-                for dep in pkg.get("dependencies", [])
-            ]
-    return []
+    return [":{}".format(d) for d in _as_lock_index(lock_data).deps.get(_normalize(name), [])]
+
+def _elk_dist_info_impl(ctx: AnalysisContext) -> list[Provider]:
+    outputs = {f: ctx.actions.write(f, content) for f, content in ctx.attrs.files.items()}
+    return [DefaultInfo(
+        default_output = outputs["METADATA"],
+        sub_targets = {f: [DefaultInfo(default_output = out)] for f, out in outputs.items()},
+    )]
+
+# Writes dist-info files from strings at analysis time, without running a
+# process. Each file is a sub-target, e.g. ``:name[METADATA]``.
+elk_dist_info = rule(
+    impl = _elk_dist_info_impl,
+    attrs = {
+        # file name -> content; must include METADATA
+        "files": attrs.dict(attrs.string(), attrs.string()),
+    },
+)
+
+def _elk_write_file_impl(ctx: AnalysisContext) -> list[Provider]:
+    return [DefaultInfo(default_output = ctx.actions.write(ctx.attrs.out, ctx.attrs.content))]
+
+# Writes a file from a string at analysis time, e.g. the size reports.
+elk_write_file = rule(
+    impl = _elk_write_file_impl,
+    attrs = {
+        "out": attrs.string(),
+        "content": attrs.string(),
+    },
+)
+
+def _requires_dist(req: str, extra: str) -> str:
+    """A Requires-Dist value for *req*, needed only with *extra*."""
+    if ";" in req:
+        req, marker = req.split(";", 1)
+        return '{}; ({}) and extra == "{}"'.format(req.strip(), marker.strip(), extra)
+    return '{}; extra == "{}"'.format(req.strip(), extra)
+
+def _dist_info_files(name: str, version: str, project: dict, paths: list[str], dist_info: str) -> dict[str, str]:
+    """dist-info file name -> content for a workspace member.
+
+    Args:
+        name: The normalised package name, used when *project* has none.
+        version: The member's version.
+        project: The ``[project]`` table of its pyproject.toml, or ``{}``.
+        paths: Paths of its sources in the library.
+        dist_info: The dist-info directory, for RECORD.
+    """
+    metadata = [
+        "Metadata-Version: 2.1",
+        "Name: " + project.get("name", name),
+        "Version: " + version,
+    ]
+    if type(project.get("description")) == "string":
+        metadata.append("Summary: " + project["description"])
+    if type(project.get("requires-python")) == "string":
+        metadata.append("Requires-Python: " + project["requires-python"])
+    for req in project.get("dependencies", []):
+        metadata.append("Requires-Dist: " + req)
+    for extra, reqs in project.get("optional-dependencies", {}).items():
+        metadata.append("Provides-Extra: " + extra)
+        for req in reqs:
+            metadata.append("Requires-Dist: " + _requires_dist(req, extra))
+    files = {"METADATA": "\n".join(metadata) + "\n"}
+
+    groups = []
+    for table, group in [("scripts", "console_scripts"), ("gui-scripts", "gui_scripts")]:
+        if project.get(table):
+            groups.append((group, project[table]))
+    for group, entries in project.get("entry-points", {}).items():
+        groups.append((group, entries))
+    if groups:
+        sections = []
+        for group, entries in groups:
+            lines = ["[{}]".format(group)] + ["{} = {}".format(k, v) for k, v in entries.items()]
+            sections.append("\n".join(lines) + "\n")
+        files["entry_points.txt"] = "\n".join(sections)
+
+    top_level = {}
+    for path in paths:
+        top = path.split("/", 1)[0]
+        top_level[top.removesuffix(".py")] = True
+    files["top_level.txt"] = "".join([t + "\n" for t in sorted(top_level.keys())])
+
+    # No hashes: the files are not installed, so there is nothing to verify.
+    record = sorted(paths) + ["{}/{}".format(dist_info, f) for f in files.keys()] + [dist_info + "/RECORD"]
+    files["RECORD"] = "".join([p + ",,\n" for p in record])
+    return files
 
 def _uv_workspace_member(*, name: str, deps: dict, root: str, src_root: str, version: str | None = None, module: str | None = None, pyproject: dict | None = None, **kwargs):
     """Create a python_library for a uv workspace member.
@@ -339,10 +1301,14 @@ def _uv_workspace_member(*, name: str, deps: dict, root: str, src_root: str, ver
     name with hyphens/dots replaced by underscores; override it when the module
     directory name differs from the package name.
 
-    A minimal ``*.dist-info/METADATA`` is generated so that
-    ``importlib.metadata.version()`` works at runtime. The version is resolved
-    in priority order: per-member ``pyproject`` static version > workspace-wide
-    ``version`` fallback. If neither is available, no dist-info is created.
+    A ``*.dist-info`` is generated so that ``importlib.metadata`` works at
+    runtime: ``METADATA`` (with the ``pyproject`` dependencies and extras),
+    ``entry_points.txt`` (``[project.scripts]``, ``gui-scripts`` and
+    ``entry-points``), ``top_level.txt`` and ``RECORD``. The files are
+    written by ``elk_dist_info`` without spawning a process. The version is
+    resolved in priority order: per-member ``pyproject`` static version >
+    workspace-wide ``version`` fallback. If neither is available, no
+    dist-info is created.
 
     Args:
         name: The normalised package name.
@@ -372,16 +1338,18 @@ def _uv_workspace_member(*, name: str, deps: dict, root: str, src_root: str, ver
     if effective_version == None and version != None:
         effective_version = version
 
-    # Generate dist-info/METADATA so importlib.metadata.version() works.
+    # Generate the dist-info so importlib.metadata works.
     if effective_version != None:
-        dist_name = _module_name(name)
-        metadata_target = name + "-dist-info-metadata"
-        native.genrule(
-            name = metadata_target,
-            out = "METADATA",
-            cmd = "printf 'Metadata-Version: 2.1\\nName: {}\\nVersion: {}\\n' > $OUT".format(name, effective_version),
+        dist_info = "{}-{}.dist-info".format(_module_name(name), effective_version)
+        project = pyproject.get("project", {}) if pyproject != None else {}
+        dist_info_target = name + "-dist-info"
+        files = _dist_info_files(name, effective_version, project, srcs.keys(), dist_info)
+        elk_dist_info(
+            name = dist_info_target,
+            files = files,
         )
-        srcs["{}-{}.dist-info/METADATA".format(dist_name, effective_version)] = ":" + metadata_target
+        for f in files:
+            srcs["{}/{}".format(dist_info, f)] = ":{}[{}]".format(dist_info_target, f)
 
     native.python_library(
         name = name,
@@ -395,7 +1363,7 @@ def _uv_workspace_member(*, name: str, deps: dict, root: str, src_root: str, ver
 # Target creation
 # ---------------------------------------------------------------------------
 
-def _apply_platform(platforms, platform_dict: dict, default: str):
+def _apply_platform(platforms, platform_dict: dict, default: str | list[str]):
     # no idea how to annotate platforms as possibly being a select
     return selects.apply(
         platforms,
@@ -424,7 +1392,39 @@ def _elk_workspace_aliases(members: dict[str, str], visibility: list[str]):
             visibility = visibility,
         )
 
-def elk_packages(packages: list[Package], platform_tags: dict[str, list[str]], platforms = None, visibility: list[str] = ["PUBLIC"], downloader = native.http_file):
+def _tags_interpreter(tags: list[str] | dict) -> str:
+    """The interpreter of a platform's best tag, e.g. ``cp312``."""
+    if type(tags) == "dict":
+        return tags["groups"][0]["interpreters"][0] if tags["groups"] else ""
+    return tags[0].split("-")[0] if tags else ""
+
+def elk_sdist_wheel(name: str, src: str, sha256: str, platform: str, python: str = "", build_wheel: str = "elk//tools:build_wheel", **kwargs):
+    """Build a wheel from an unpacked sdist (e.g. an ``http_archive``).
+
+    The build goes through ``build_wheel``'s local cache, keyed by the sdist's
+    sha256, *platform* and *python*, so each sdist is only built once per
+    platform even when buck2's caches are cold. The wheel is built by the
+    interpreter running ``build_wheel``, so it is only right for *platform*
+    when the build runs there (or the package is pure Python).
+
+    Args:
+        name: Target name; the output is a wheel file of the same name.
+        src: The unpacked sdist.
+        sha256: The sdist's sha256, used as the cache key.
+        platform: Platform name, part of the cache key.
+        python: Interpreter tag, part of the cache key.
+        build_wheel: The ``build_wheel`` tool.
+        **kwargs: Passed through to genrule (e.g. visibility).
+    """
+    key = "-".join([k for k in [sha256, platform, python] if k])
+    native.genrule(
+        name = name,
+        out = name,
+        cmd = "$(exe {}) --key {} --out $OUT $(location {})".format(build_wheel, key, src),
+        **kwargs
+    )
+
+def elk_packages(packages: list[Package], platform_tags: dict[str, list[str] | dict], platforms = None, visibility: list[str] = ["PUBLIC"], downloader = native.http_file, roots: list[str] | None = None, mirrors: list[str] = [], build_sdists: bool = False, build_wheel: str = "elk//tools:build_wheel", platform_markers: dict[str, dict[str, str]] = {}, report: bool = False, max_wheel_bytes: int | None = None, max_closure_bytes: int | None = None):
     """Create Buck2 targets for every package in *packages*.
 
     For each package the macro creates:
@@ -435,18 +1435,43 @@ def elk_packages(packages: list[Package], platform_tags: dict[str, list[str]], p
     Args:
         packages: Use ``poetry_packages()`` or ``uv_packages()`` to build this
                   from a lock file.
-        platform_tags: ``{"linux-x86_64": ["cp312-cp312-manylinux...", ...], ...}``
+        platform_tags: ``{"linux-x86_64": tags, ...}`` where *tags* is a
+                       tags file written by ``save_tags``: either the
+                       factored ``{"groups": [...]}`` form or a flat list
+                       ``["cp312-cp312-manylinux...", ...]``.
         platforms: Custom platform select dict. Falls back to
                    ``get_reindeer_platforms()`` from the prelude.
         visibility: visibility list for the alias targets.
         downloader: http_file compatible downloading rule.
+        roots: Only create targets for these packages and their transitive
+               deps, e.g. ``["numpy", "requests"]``. Everything else in the
+               lock is skipped.
+        mirrors: http(s) URL templates tried in order before the upstream
+                 URL, e.g. ``["http://wheels.internal/{filename}"]``. See
+                 ``_mirror_urls`` for the placeholders.
+        build_sdists: For platforms where a package has no matching wheel,
+                      build one from its sdist with ``elk_sdist_wheel``
+                      instead of leaving the package out.
+        build_wheel: The ``build_wheel`` tool passed to ``elk_sdist_wheel``.
+        platform_markers: Marker variables per platform, overriding what
+                          ``marker_environment`` reads off the tags, e.g.
+                          ``{"linux-x86_64": {"python_full_version": "3.12.4"}}``.
+                          Deps with markers (from ``uv_packages``) are
+                          selected per platform by evaluating them, and
+                          loading fails on a marker these and the tags
+                          can't decide.
+        report: Also create an ``elk_report_{platform}`` target per platform,
+                a JSON file listing each chosen wheel, its size and the bytes
+                its package's closure downloads.
+        max_wheel_bytes: Fail building a package on a platform where its
+                         chosen wheel is larger.
+        max_closure_bytes: Fail building a package on a platform where it
+                           and its transitive deps download more.
+                           Sizes come from the lock; uv.lock records them,
+                           poetry.lock doesn't, and a wheel without a size
+                           is over any budget. ``elk_budget_{platform}``
+                           checks every package at once.
     """
-    if platforms == None:
-        platforms = get_reindeer_platforms()
-
-    # sentinel for platforms that don't match any wheel
-    native.filegroup(name = "_elk_null", srcs = [])
-
     # Detect packages that appear with multiple versions so we can use
     # versioned alias names (e.g. :huggingface-hub-1.3.4) and avoid conflicts.
     version_counts = {}
@@ -456,36 +1481,190 @@ def elk_packages(packages: list[Package], platform_tags: dict[str, list[str]], p
     multi_version = {n: True for n, c in version_counts.items() if c > 1}
 
     def _alias_name(pkg):
+        if pkg.alias != None:
+            return pkg.alias
         n = _normalize(pkg.name)
         if multi_version.get(n):
             return "{}-{}".format(n, pkg.version)
         return n
 
-    # Build known set: only packages that have a matching wheel for at least one
-    # configured platform. Packages with no matching wheels (sdist-only, or
-    # platform-exclusive packages like pywin32) are excluded so that deps on
-    # them are silently dropped rather than referencing non-existent targets.
-    known = {}
-    for pkg in packages:
-        for tags in platform_tags.values():
-            if _choose_wheel(pkg.files, tags) != None:
-                known[_alias_name(pkg)] = True
-                break
+    # Prune after counting versions, so alias names match the full lock.
+    if roots != None:
+        packages = _package_closure(packages, roots)
 
+    # Rank tables are built once per platform; each package's wheels are
+    # parsed once and the choice is shared between the known pass and
+    # target creation.
+    platform_ranks = {plat_name: _tag_ranks(tags) for plat_name, tags in platform_tags.items()}
+    chosen_by_pkg = []
     for pkg in packages:
-        pkg_deps = [":{}".format(d) for d in pkg.deps if d in known]
-
-        # --- choose wheels per platform ---
+        candidates = _wheel_candidates(pkg.files)
         platform_chosen = {}  # platform_name -> WheelFile
-        all_chosen = {}  # filename -> WheelFile (dedup)
+        if candidates:
+            for plat_name, ranks in platform_ranks.items():
+                chosen = _choose_ranked(candidates, ranks)
+                if chosen != None:
+                    platform_chosen[plat_name] = chosen
+        chosen_by_pkg.append(platform_chosen)
+
+    # Platforms each package has to be built from its sdist for.
+    sdist_by_pkg = []
+    for pkg, platform_chosen in zip(packages, chosen_by_pkg):
+        missing = []
+        if build_sdists and pkg.sdist != None:
+            missing = [p for p in platform_tags if p not in platform_chosen]
+        sdist_by_pkg.append(missing)
+
+    sdist_python = {}
+    if build_sdists:
+        sdist_python = {p: _tags_interpreter(tags) for p, tags in platform_tags.items()}
+
+    marker_envs = {}
+    for p, tags in platform_tags.items():
+        env = marker_environment(tags)
+        env.update(platform_markers.get(p, {}))
+        marker_envs[p] = env
+
+    size_check = None
+    if report or max_wheel_bytes != None or max_closure_bytes != None:
+        size_check = SizeCheck(report = report, max_wheel_bytes = max_wheel_bytes, max_closure_bytes = max_closure_bytes)
+
+    _elk_targets(packages, chosen_by_pkg, sdist_by_pkg, _alias_name, platforms, visibility, downloader, mirrors, sdist_python, build_wheel, marker_envs, size_check)
+
+def elk_packages_from_digest(digest: dict, platforms = None, visibility: list[str] = ["PUBLIC"], downloader = native.http_file, roots: list[str] | None = None, mirrors: list[str] = [], platform_markers: dict[str, dict[str, str]] = {}, report: bool = False, max_wheel_bytes: int | None = None, max_closure_bytes: int | None = None, lock: str | None = None, lock_digest: str = "elk//tools:lock_digest"):
+    """Create the targets ``elk_packages`` would, from a ``lock_digest`` digest.
+
+    The digest (written by ``elk//tools:lock_digest``) already holds each
+    package's target name, deps and chosen wheel per platform, so nothing is
+    parsed or matched at load time. Check it against the lock in CI with
+    ``lock_digest --check``, or pass *lock* and build ``:elk_digest_check``.
 
-        for plat_name, tags in platform_tags.items():
-            chosen = _choose_wheel(pkg.files, tags)
-            if chosen != None:
-                platform_chosen[plat_name] = chosen
-                all_chosen[chosen.file] = chosen
+    Args:
+        digest: The digest JSON, e.g. ``load(":elk.digest.json", digest = "value")``.
+        platforms: As for ``elk_packages``.
+        visibility: As for ``elk_packages``.
+        downloader: As for ``elk_packages``.
+        roots: As for ``elk_packages``.
+        mirrors: As for ``elk_packages``.
+        platform_markers: As for ``elk_packages``, over the digest's
+                          ``environments``.
+        report: As for ``elk_packages``.
+        max_wheel_bytes: As for ``elk_packages``.
+        max_closure_bytes: As for ``elk_packages``.
+        lock: The lock the digest was made from, e.g. ``"uv.lock"``. Creates
+              ``elk_digest_check``, which fails to build if the lock's sha256
+              is no longer the one the digest recorded.
+        lock_digest: The ``lock_digest`` tool ``elk_digest_check`` runs.
+    """
+    if digest.get("format") != 1:
+        fail("Unsupported digest format {}; regenerate it with elk//tools:lock_digest".format(digest.get("format")))
+
+    packages = []
+    chosen_by_alias = {}
+    for entry in digest["packages"]:
+        files = [WheelFile(file = f["file"], hash = f["hash"], url = f["url"], size = f.get("size")) for f in entry["files"]]
+        packages.append(Package(
+            name = entry["name"],
+            version = entry["version"],
+            files = files,
+            deps = entry["deps"],
+            alias = entry["alias"],
+            dep_markers = entry.get("dep_markers", {}),
+            resolution_markers = entry.get("resolution_markers", []),
+        ))
+        chosen_by_alias[entry["alias"]] = {pn: files[i] for pn, i in entry["platforms"].items()}
+
+    if roots != None:
+        packages = _package_closure(packages, roots)
+    chosen_by_pkg = [chosen_by_alias[pkg.alias] for pkg in packages]
+
+    marker_envs = {}
+    for p, env in digest.get("environments", {}).items():
+        marker_envs[p] = dict(env)
+        marker_envs[p].update(platform_markers.get(p, {}))
+
+    size_check = None
+    if report or max_wheel_bytes != None or max_closure_bytes != None:
+        size_check = SizeCheck(report = report, max_wheel_bytes = max_wheel_bytes, max_closure_bytes = max_closure_bytes)
 
-        if len(all_chosen) == 0:
+    _elk_targets(packages, chosen_by_pkg, [[] for _ in packages], lambda pkg: pkg.alias, platforms, visibility, downloader, mirrors, {}, "", marker_envs, size_check)
+
+    if lock != None:
+        native.genrule(
+            name = "elk_digest_check",
+            srcs = [lock],
+            out = "elk_digest_check.txt",
+            cmd = "$(exe {}) --verify-lock {} $SRCS && echo up to date > $OUT".format(lock_digest, digest["lock_sha256"]),
+            visibility = visibility,
+        )
+
+def _elk_targets(packages: list[Package], chosen_by_pkg: list, sdist_by_pkg: list, alias_name, platforms, visibility: list[str], downloader, mirrors: list[str], sdist_python: dict[str, str], build_wheel: str, marker_envs: dict[str, dict[str, str]], size_check: SizeCheck | None = None):
+    """Create the download, library and alias targets for chosen wheels.
+
+    Args:
+        chosen_by_pkg: ``{platform name: WheelFile}`` per package.
+        sdist_by_pkg: Platform names to build each package's sdist for.
+        alias_name: Package -> alias target name.
+        sdist_python: Platform name -> interpreter, for sdist build cache keys.
+        marker_envs: Platform name -> marker variables, for deps with markers.
+        size_check: Report and budgets for download sizes, if any.
+    """
+    _check_mirrors(mirrors)
+    if platforms == None:
+        platforms = get_reindeer_platforms()
+
+    # sentinel for platforms that don't match any wheel
+    native.filegroup(name = "_elk_null", srcs = [])
+
+    # Build known set: only packages that have a matching wheel (or an sdist
+    # to build one from) for at least one configured platform. Packages with
+    # no matching wheels (sdist-only, or platform-exclusive packages like
+    # pywin32) are excluded so that deps on them are silently dropped rather
+    # than referencing non-existent targets.
+    known = {}
+    forks = {}  # normalised name -> [Package, ...] sharing a fork alias
+    for pkg, platform_chosen, sdist_platforms in zip(packages, chosen_by_pkg, sdist_by_pkg):
+        if platform_chosen or sdist_platforms:
+            known[alias_name(pkg)] = True
+            if pkg.resolution_markers:
+                forks.setdefault(_normalize(pkg.name), []).append(pkg)
+                known[_normalize(pkg.name)] = True
+
+    # marker -> platform name -> applies; many deps share a marker
+    marker_results = {}
+
+    # platform name -> target name -> (file, bytes or None, [dep target names]),
+    # for size_check
+    graph = {}
+
+    # (alias name, {platform name: actual}, actual on every platform or None)
+    aliases = []
+
+    for pkg, platform_chosen, sdist_platforms in zip(packages, chosen_by_pkg, sdist_by_pkg):
+        pkg_deps = [":{}".format(d) for d in pkg.deps if d in known and d not in pkg.dep_markers]
+        marked = [d for d in pkg.deps if d in known and d in pkg.dep_markers]
+        per_platform = {}
+        if marked:
+            # Deps with markers are selected per platform. Platforms without
+            # marker variables (not in platform_tags) keep all of them.
+            for pn, env in marker_envs.items():
+                per_platform[pn] = []
+                for d in marked:
+                    marker = pkg.dep_markers[d]
+                    results = marker_results.setdefault(marker, {})
+                    if pn not in results:
+                        results[pn] = evaluate_marker(marker, env)
+                        if results[pn] == None:
+                            _fail_undecided_marker(marker, env, pn)
+                    if results[pn]:
+                        per_platform[pn].append(":" + d)
+            pkg_deps = pkg_deps + _apply_platform(platforms, per_platform, [":" + d for d in marked])
+
+        all_chosen = {}  # filename -> WheelFile (dedup)
+        for chosen in platform_chosen.values():
+            all_chosen[chosen.file] = chosen
+
+        if len(all_chosen) == 0 and not sdist_platforms:
             continue
 
         # --- create remote_file + prebuilt_python_library ---
@@ -498,7 +1677,7 @@ def elk_packages(packages: list[Package], platform_tags: dict[str, list[str]], p
 
             downloader(
                 name = filename,
-                urls = [_wheel_url(wf)],
+                urls = _mirror_urls(mirrors, wf, sha, _normalize(pkg.name), _wheel_url(wf)),
                 sha256 = sha,
             )
             bname = filename + "-built"
@@ -509,17 +1688,262 @@ def elk_packages(packages: list[Package], platform_tags: dict[str, list[str]], p
             )
             built[filename] = ":" + bname
 
-        # --- alias ---
-        if len(all_chosen) == 1:
-            actual = built[all_chosen.keys()[0]]
+        # --- sdist builds for platforms without a wheel ---
+        sdist_built = {}  # platform name -> target label string
+        if sdist_platforms:
+            sdist = pkg.sdist
+            sha = sdist.hash
+            if sha.startswith("sha256:"):
+                sha = sha[7:]
+            native.http_archive(
+                name = sdist.file,
+                urls = _mirror_urls(mirrors, sdist, sha, _normalize(pkg.name), _wheel_url(sdist)),
+                sha256 = sha,
+            )
+            for pn in sdist_platforms:
+                wname = "{}-{}.whl".format(sdist.file, pn)
+                elk_sdist_wheel(
+                    name = wname,
+                    src = ":" + sdist.file,
+                    sha256 = sha,
+                    platform = pn,
+                    python = sdist_python[pn],
+                    build_wheel = build_wheel,
+                )
+                native.prebuilt_python_library(
+                    name = wname + "-built",
+                    binary_src = ":" + wname,
+                    deps = pkg_deps,
+                )
+                sdist_built[pn] = ":" + wname + "-built"
+
+        # --- alias, created once budgets are checked ---
+        actual_map = dict(sdist_built)
+        for pn, ch in platform_chosen.items():
+            actual_map[pn] = built[ch.file]
+        single = None
+        if len(all_chosen) == 1 and not sdist_built:
+            single = built[all_chosen.keys()[0]]
+        aliases.append((alias_name(pkg), actual_map, single))
+
+        if size_check != None:
+            unmarked = [d for d in pkg.deps if d in known and d not in pkg.dep_markers]
+            for pn in list(platform_chosen.keys()) + sdist_platforms:
+                if marked and pn in per_platform:
+                    deps = unmarked + [d[1:] for d in per_platform[pn]]
+                else:
+                    deps = unmarked + marked
+                if pn in platform_chosen:
+                    node = (platform_chosen[pn].file, platform_chosen[pn].size, deps)
+                else:
+                    # built here; the sdist's size stands in for the wheel's
+                    node = (pkg.sdist.file, pkg.sdist.size, deps)
+                graph.setdefault(pn, {})[alias_name(pkg)] = node
+
+    # --- fork aliases: one version per platform ---
+    for name, versions in forks.items():
+        actual_map = {}
+        for pn, env in marker_envs.items():
+            # the version whose markers match; uv's forks don't overlap
+            undecided = None
+            for pkg in versions:
+                result = False
+                for marker in pkg.resolution_markers:
+                    decided = evaluate_marker(marker, env)
+                    if decided == None and undecided == None:
+                        undecided = marker
+                    result = _marker_or(result, decided)
+                if result == True:
+                    actual_map[pn] = ":" + alias_name(pkg)
+                    break
+            if pn not in actual_map and undecided != None:
+                _fail_undecided_marker(undecided, env, pn)
+        native.alias(
+            name = name,
+            actual = _apply_platform(platforms, actual_map, ":_elk_null"),
+            visibility = visibility,
+        )
+        if size_check != None:
+            for pn, actual in actual_map.items():
+                graph.setdefault(pn, {})[name] = (None, 0, [actual[1:]])
+
+    # target name -> platform names where it's over a budget
+    over_budget = {}
+    if size_check != None:
+        over_budget = _elk_size_check(graph, size_check, visibility)
+
+    for name, actual_map, single in aliases:
+        if name in over_budget:
+            # building it there fails, with the reason
+            actual_map = dict(actual_map)
+            for pn in over_budget[name]:
+                actual_map[pn] = ":{}-over-budget".format(name)
+            actual = _apply_platform(platforms, actual_map, ":_elk_null")
+        elif single != None:
+            actual = single
         else:
-            actual_map = {}
-            for pn, ch in platform_chosen.items():
-                actual_map[pn] = built[ch.file]
             actual = _apply_platform(platforms, actual_map, ":_elk_null")
-
         native.alias(
-            name = _alias_name(pkg),
+            name = name,
             actual = actual,
             visibility = visibility,
         )
+
+def _closures(nodes: dict) -> dict[str, dict[str, bool]]:
+    """Target name -> every target it reaches over *nodes*' deps, itself included.
+
+    Targets are done in depth-first post-order, so in an acyclic graph each
+    one's deps are already done and their closures are merged rather than
+    walked again. Cycles fall back to walking.
+    """
+    # Each step of a depth-first walk follows an edge or finishes a target.
+    bound = len(nodes) + 1
+    for node in nodes.values():
+        bound += len(node[2])
+    order = []
+    visited = {}
+    for root in nodes:
+        if root in visited:
+            continue
+        visited[root] = True
+        stack = [(root, 0)]
+        for _ in range(bound):
+            if not stack:
+                break
+            n, i = stack[-1]
+            deps = nodes[n][2]
+            if i < len(deps):
+                stack[-1] = (n, i + 1)
+                d = deps[i]
+                if d in nodes and d not in visited:
+                    visited[d] = True
+                    stack.append((d, 0))
+            else:
+                stack.pop()
+                order.append(n)
+
+    closures = {}
+    for name in order:
+        reached = {name: True}
+        frontier = list(nodes[name][2])
+
+        # Each level reaches a new target or ends the walk.
+        for _ in range(len(nodes) + 1):
+            if not frontier:
+                break
+            next_frontier = []
+            for n in frontier:
+                if n in reached or n not in nodes:
+                    continue
+                if n in closures:
+                    reached.update(closures[n])
+                    continue
+                reached[n] = True
+                next_frontier.extend(nodes[n][2])
+            frontier = next_frontier
+        closures[name] = reached
+    return closures
+
+def _elk_budget_impl(ctx: AnalysisContext) -> list[Provider]:
+    if ctx.attrs.over:
+        fail("Download budget exceeded:\n  " + "\n  ".join(ctx.attrs.over))
+    return [DefaultInfo(default_output = ctx.actions.write(ctx.label.name + ".txt", "within budget\n"))]
+
+# Fails when built (analysed) if *over* lists anything, so only builds that
+# need an over-budget package, or the check itself, fail.
+elk_budget = rule(
+    impl = _elk_budget_impl,
+    attrs = {
+        "over": attrs.list(attrs.string(), default = []),
+    },
+)
+
+def _elk_size_check(graph: dict, size_check: SizeCheck, visibility: list[str]) -> dict[str, list[str]]:
+    """Check download budgets and write per-platform size reports.
+
+    Creates an ``elk_budget_{platform}`` check per platform when there are
+    budgets, and an ``{alias}-over-budget`` target, which fails when built,
+    for each package over one. A budget counts a wheel without a size as
+    over it, since it can't be checked.
+
+    Args:
+        graph: Platform name -> target name -> (file or None for fork aliases,
+               bytes or None if unknown, [dep target names]).
+
+    Returns:
+        Target name -> platform names where the package is over a budget.
+    """
+    max_wheel = size_check.max_wheel_bytes
+    max_closure = size_check.max_closure_bytes
+    problems_by_name = {}  # target name -> [reason]
+    over_platforms = {}  # target name -> [platform name]
+    for pn, nodes in graph.items():
+        closures = _closures(nodes)
+        rows = []
+        total = 0
+        unknown = 0
+        over = []
+        for name, node in nodes.items():
+            file, size, _ = node
+            if file == None:
+                continue
+            if size == None:
+                unknown += 1
+            else:
+                total += size
+
+            closure = 0
+            closure_unknown = 0
+            for n in closures[name]:
+                if nodes[n][0] == None:
+                    continue
+                if nodes[n][1] == None:
+                    closure_unknown += 1
+                else:
+                    closure += nodes[n][1]
+
+            problems = []
+            if max_wheel != None and size == None:
+                problems.append("{} on {}: {} has no size in the lock to check against max_wheel_bytes".format(name, pn, file))
+            elif max_wheel != None and size > max_wheel:
+                problems.append("{} on {}: {} is {} bytes, over max_wheel_bytes = {}".format(name, pn, file, size, max_wheel))
+            if max_closure != None and closure_unknown:
+                problems.append("{} on {}: {} wheels in its closure have no size in the lock to check against max_closure_bytes".format(name, pn, closure_unknown))
+            elif max_closure != None and closure > max_closure:
+                problems.append("{} on {}: its closure downloads {} bytes, over max_closure_bytes = {}".format(name, pn, closure, max_closure))
+            if problems:
+                over.extend(problems)
+                problems_by_name.setdefault(name, []).extend(problems)
+                over_platforms.setdefault(name, []).append(pn)
+            rows.append({"name": name, "file": file, "bytes": size, "closure_bytes": closure, "closure_unknown_sizes": closure_unknown})
+
+        if size_check.report:
+            rows = sorted(rows, key = lambda r: (-r["closure_bytes"], r["name"]))
+            lines = ["{"]
+            lines.append('    "platform": {},'.format(json.encode(pn)))
+            lines.append('    "total_bytes": {},'.format(total))
+            lines.append('    "unknown_sizes": {},'.format(unknown))
+            lines.append('    "packages": [')
+            for i, r in enumerate(rows):
+                lines.append("        " + json.encode(r) + ("," if i + 1 < len(rows) else ""))
+            lines.append("    ]")
+            lines.append("}")
+            elk_write_file(
+                name = "elk_report_" + pn,
+                out = "elk_report_{}.json".format(pn),
+                content = "\n".join(lines) + "\n",
+                visibility = visibility,
+            )
+        if max_wheel != None or max_closure != None:
+            elk_budget(
+                name = "elk_budget_" + pn,
+                over = over,
+                visibility = visibility,
+            )
+
+    for name, problems in problems_by_name.items():
+        elk_budget(
+            name = name + "-over-budget",
+            over = problems,
+        )
+    return over_platforms
@@ -0,0 +1,20 @@
+"""
+To run: `buck2 run :main`
+
+Fails unless elk picked the cowsay version uv locked for this python, and left
+out click's windows-only colorama.
+"""
+
+import importlib.util
+import sys
+
+import click
+import cowsay
+
+want = "6.1" if sys.version_info >= (3, 12) else "6.0"
+assert cowsay.__version__ == want, "cowsay {} on python {}".format(
+    cowsay.__version__, sys.version
+)
+assert (importlib.util.find_spec("colorama") is not None) == (sys.platform == "win32")
+
+click.echo(cowsay.get_output_string("cow", "cowsay " + cowsay.__version__))
@@ -1,3 +1,15 @@
+from importlib.metadata import distribution
+
 from app_cli import run
 
+# elk writes the dist-info at analysis time; METADATA must be byte for byte
+# what the printf genrule it replaced wrote
+dist = distribution("app-cli")
+assert (
+    dist.read_text("METADATA")
+    == "Metadata-Version: 2.1\nName: app-cli\nVersion: 0.1.0\n"
+)
+assert dist.read_text("top_level.txt") == "app_cli\n"
+assert "app_cli/__init__.py" in [str(f) for f in dist.files]
+
 run()
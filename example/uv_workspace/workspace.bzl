@@ -1,8 +1,11 @@
-load("@elk//:elk.bzl", "create_workspace_member_macro")
+load("@elk//:elk.bzl", "create_workspace_member_macro", "lock_index")
 load(":uv.lock.toml", lock = "value")
 
+# Index the lock once; every BUCK file that loads this module shares it.
+index = lock_index(lock)
+
 workspace_member = create_workspace_member_macro(
-    lock_data = lock,
+    lock_data = index,
     root = "//example/uv_workspace",
     version = "0.1.0",
 )
@@ -1,45 +1,99 @@
-from io import TextIOWrapper
+from io import StringIO, TextIOWrapper
+import hashlib
 import json
-from typing import Any, NamedTuple, Optional
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, Callable, NamedTuple, Optional, TextIO
 
 from cleo.io.io import IO
 from poetry.core.packages.package import Package
 from poetry.installation.executor import Link
 
 
-def tobuck(i: int, x: Any) -> str:
-    def ltobuck(i: int, x: list[Any]) -> str:
-        s = "["
-        indent0 = "\n" + (" " * (4 * i))
+def writebuck(write: Callable[[str], Any], i: int, x: Any) -> None:
+    """
+    Serialize x as a Starlark value at indent level i, passing each piece to
+    write() as it is produced rather than building up one big string.
+    """
+    if hasattr(x, "toJSON"):
+        write(x.toJSON(i))
+    elif type(x) is list:
+        if not x:
+            write("[]")
+            return
         indent1 = "\n" + (" " * (4 * (i + 1)))
+        write("[")
         for y in x:
-            s += indent1
-            s += tobuck(i + 1, y)
-            s += ","
-        s += indent0 + "]" if x else "]"
-        return s
-
-    def dtobuck(i: int, x: dict[Any, Any]) -> str:
-        s = "{"
-        indent0 = "\n" + (" " * (4 * i))
+            write(indent1)
+            writebuck(write, i + 1, y)
+            write(",")
+        write("\n" + (" " * (4 * i)) + "]")
+    elif type(x) is dict:
+        if not x:
+            write("{}")
+            return
         indent1 = "\n" + (" " * (4 * (i + 1)))
+        write("{")
         for k, v in x.items():
-            s += indent1
-            s += json.dumps(k)
-            s += ": "
-            s += tobuck(i + 1, v)
-            s += ","
-        s += indent0 + "}" if x else "}"
-        return s
+            write(indent1)
+            write(json.dumps(k))
+            write(": ")
+            writebuck(write, i + 1, v)
+            write(",")
+        write("\n" + (" " * (4 * i)) + "}")
+    else:
+        write(json.dumps(x, indent=4).replace("\n", "\n    ").replace('"\n', '",\n'))
 
-    if hasattr(x, "toJSON"):
-        return x.toJSON(i)
-    elif type(x) is list:
-        return ltobuck(i, x)
-    elif type(x) is dict:
-        return dtobuck(i, x)
 
-    return json.dumps(x, indent=4).replace("\n", "\n    ").replace('"\n', '",\n')
+def tobuck(i: int, x: Any) -> str:
+    out = StringIO()
+    writebuck(out.write, i, x)
+    return out.getvalue()
+
+
+def write_if_changed(path: Path, write: Callable[[TextIO], None]) -> bool:
+    """
+    Stream write()'s output to a temporary file next to path, then move it
+    into place only if it differs from what is already there, so an
+    unchanged file keeps its mtime. Returns True if path was replaced.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as out:
+            write(out)
+        if _same_contents(path, Path(tmp)):
+            os.unlink(tmp)
+            return False
+        try:
+            mode = path.stat().st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _same_contents(a: Path, b: Path) -> bool:
+    try:
+        if a.stat().st_size != b.stat().st_size:
+            return False
+    except FileNotFoundError:
+        return False
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        while True:
+            ca = fa.read(1 << 16)
+            if ca != fb.read(1 << 16):
+                return False
+            if not ca:
+                return True
 
 
 class TargetName(NamedTuple):
@@ -52,6 +106,40 @@ class TargetName(NamedTuple):
         return f'":{self.name}"'
 
 
+class Label(NamedTuple):
+    """A target in another package, e.g. a dep in another shard."""
+
+    package: str
+    name: str
+
+    def __str__(self) -> str:
+        return f"{self.package}:{self.name}"
+
+    def toJSON(self, _: int):
+        return f'"{self.package}:{self.name}"'
+
+
+def shard_of(name: str, shards: int, shard_by: str) -> str:
+    """
+    The subpackage a package's targets go to when sharding: its initial, or
+    a stable hash of its name modulo ``shards`` (zero-padded so shards sort).
+    """
+    if shard_by == "initial":
+        return name[0]
+    digest = hashlib.sha256(name.encode()).hexdigest()
+    return str(int(digest[:8], 16) % shards).zfill(len(str(shards - 1)))
+
+
+def find_package(directory: Path) -> Optional[str]:
+    """The label of the buck2 package at directory, from the nearest cell root."""
+    directory = directory.resolve()
+    for root in (directory, *directory.parents):
+        if (root / ".buckconfig").exists():
+            path = directory.relative_to(root).as_posix()
+            return "//" + ("" if path == "." else path)
+    return None
+
+
 class Target:
     rule: str
     name: str
@@ -68,13 +156,18 @@ class Target:
     def _asdict(self) -> dict[str, Any]:
         return {k: getattr(self, k) for k in self._fields if hasattr(self, k)}
 
-    def __str__(self) -> str:
-        s = f"{self.rule}(\n"
+    def write(self, write: Callable[[str], Any]) -> None:
+        write(f"{self.rule}(\n")
         for k, v in self._asdict().items():
-            v = tobuck(1, v)
-            s += f"    {k} = {v},\n"
-        s += ")"
-        return s
+            write(f"    {k} = ")
+            writebuck(write, 1, v)
+            write(",\n")
+        write(")")
+
+    def __str__(self) -> str:
+        out = StringIO()
+        self.write(out.write)
+        return out.getvalue()
 
     def target_name(self) -> TargetName:
         return TargetName(name=self.name)
@@ -141,14 +234,14 @@ class WheelBuild(Target):
 
     package: Package
     binary_src: TargetName
-    deps: list[TargetName]
+    deps: list[TargetName | Label]
 
     def __init__(
         self,
         rule: str,
         package: Package,
         binary_src: TargetName,
-        deps: list[TargetName],
+        deps: list[TargetName | Label],
         **kwargs,
     ):
         self.name = binary_src.name + "-built"
@@ -163,21 +256,42 @@ class WheelBuild(Target):
 
 
 class SourceBuild(Target):
+    """
+    A wheel built from an unpacked sdist for one platform, by elk.bzl's
+    elk_sdist_wheel (which caches it by sdist hash, platform and python)
+
+        elk_sdist_wheel(
+            name = "foo-1.0.tar.gz-linux-x86_64.whl",
+            src = ":foo-1.0.tar.gz",
+            sha256 = "...",
+            platform = "linux-x86_64",
+            python = "cp312",
+        )
+    """
+
     package: Package
-    deps: list[TargetName]
+    src: TargetName
+    sha256: str
+    platform: str
+    python: str
 
     def __init__(
-        self, package: Package, source: TargetName, deps: list[TargetName], **kwargs
+        self,
+        rule: str,
+        package: Package,
+        source: TargetName,
+        sha256: str,
+        platform: str,
+        python: str,
+        **kwargs,
     ):
-        self.name = source.name + "-built"
-        self.srcs = [source]
+        self.name = f"{source.name}-{platform}.whl"
         self.package = package
-        self.deps = deps
-        super().__init__(
-            "python_library",
-            ["srcs", "deps", "exclude_deps_from_merged_linking"],
-            **kwargs,
-        )
+        self.src = source
+        self.sha256 = sha256
+        self.platform = platform
+        self.python = python
+        super().__init__(rule, ["src", "sha256", "platform", "python"], **kwargs)
 
 
 class Alias(Target):
@@ -232,8 +346,9 @@ class BUCK:
         # raise Exception(f"duplicate target name {name}")
         self.targets[name] = target
 
-    def dump(self, file: TextIOWrapper | IO):
-        for target in self.targets.values():
-            file.write(str(target))
+    def dump(self, file: TextIOWrapper | IO | TextIO):
+        """Write every target, sorted by name."""
+        for name in sorted(self.targets):
+            self.targets[name].write(file.write)
             file.write("\n")
             file.write("\n")
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, Optional
+
+from poetry.installation.executor import Link
+from poetry.poetry import Poetry
+
+from poetry_plugin_elk.config import ElkConfig
+from poetry_plugin_elk.links import LinkKey
+
+
+def cache_directory(poetry: Poetry, config: ElkConfig) -> Path:
+    """
+    ``[cache] directory`` from elk.toml, relative to the project, or else
+    ``elk/links`` under poetry's cache-dir.
+    """
+    if config.cache.directory is not None:
+        return poetry.pyproject_path.parent / Path(config.cache.directory)
+    return Path(poetry.config.get("cache-dir")).expanduser() / "elk" / "links"
+
+
+def _link_to_json(link: Link) -> dict:
+    return {
+        "url": link.url,
+        "requires_python": link.requires_python,
+        "hashes": link._hashes,
+        "metadata": link._metadata,
+        "yanked": link._yanked,
+    }
+
+
+def _link_from_json(data: dict) -> Link:
+    return Link(
+        data["url"],
+        requires_python=data["requires_python"],
+        hashes=data["hashes"],
+        metadata=data["metadata"],
+        yanked=data["yanked"],
+    )
+
+
+class LinkCache:
+    """
+    On-disk cache of the links for locked (name, version, source url) triples.
+
+    A locked release never changes its files, so entries never go stale; they
+    are only evicted (least recently used first) once the cache grows past
+    ``max_bytes``. Each entry is a JSON file named by the sha256 of its key.
+    """
+
+    directory: Path
+    max_bytes: int
+    hits: int
+    misses: int
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: list) -> Path:
+        digest = hashlib.sha256(json.dumps(key).encode()).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def get(self, link_key: LinkKey) -> Optional[list[Link]]:
+        key = list(link_key)
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if data.get("key") != key:
+            self.misses += 1
+            return None
+        # mtime doubles as the LRU clock
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return [_link_from_json(link) for link in data["links"]]
+
+    def put(self, link_key: LinkKey, links: list[Link]) -> None:
+        key = list(link_key)
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"key": key, "links": [_link_to_json(link) for link in links]}
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _entries(self) -> Iterable[Path]:
+        if not self.directory.exists():
+            return []
+        return self.directory.glob("*/*.json")
+
+    def evict(self) -> int:
+        """Remove least recently used entries until under max_bytes."""
+        entries = []
+        total = 0
+        for path in self._entries():
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path.name, path, st.st_size))
+            total += st.st_size
+        removed = 0
+        for _, _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self, names: Optional[Iterable[str]] = None) -> int:
+        """Remove every entry, or only those for the given package names."""
+        names = set(names) if names is not None else None
+        removed = 0
+        for path in list(self._entries()):
+            if names is not None:
+                try:
+                    with open(path) as f:
+                        key = json.load(f).get("key")
+                except (OSError, ValueError):
+                    key = None
+                if key is not None and key[0] not in names:
+                    continue
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
@@ -0,0 +1,118 @@
+import re
+from typing import Any, NamedTuple, Optional
+
+from packaging.tags import Tag
+from poetry.core.packages.package import Package
+from poetry.installation.executor import Link
+from poetry.utils.env import Env
+from poetry.utils.wheel import Wheel
+
+from poetry_plugin_elk.links import PrefetchedChooser
+
+# Chooser.choose_for skips these outright
+_UNSUPPORTED_EXTS = {".egg", ".exe", ".msi", ".rpm", ".srpm"}
+
+
+class PlatformTags(NamedTuple):
+    name: str
+    env: Env
+    # tag -> position of its first occurrence in env.supported_tags
+    ranks: dict[Tag, int]
+
+    @classmethod
+    def of(cls, name: str, env: Env) -> "PlatformTags":
+        ranks: dict[Tag, int] = {}
+        for i, tag in enumerate(env.supported_tags):
+            ranks.setdefault(tag, i)
+        return cls(name, env, ranks)
+
+
+class _Candidate(NamedTuple):
+    link: Link
+    # None for sdists
+    tags: Optional[frozenset[Tag]]
+    # the platform-independent part of Chooser._sort_key, or the error it
+    # would raise
+    key: tuple[Any, ...] | ValueError
+
+
+class MultiPlatformChooser:
+    """
+    Chooses a link for a package on every platform in one pass.
+
+    Chooser.choose_for, run once per platform, fetches and filters a
+    package's links, parses each wheel filename and searches the platform's
+    tag list for every wheel tag. Here the links are fetched and parsed once
+    and each wheel is scored against every platform's tag rank table, so the
+    work grows with links rather than links x platforms. For each platform
+    the result is the link choose_for would return, or None where it would
+    raise.
+    """
+
+    def __init__(self, chooser: PrefetchedChooser, platforms: list[PlatformTags]):
+        self._chooser = chooser
+        self.platforms = platforms
+
+    def _candidates(self, package: Package) -> list[_Candidate]:
+        allow_binary = self._chooser._no_binary_policy.allows(package.name)
+        candidates = []
+        for link in self._chooser._get_links(package):
+            if link.ext in _UNSUPPORTED_EXTS:
+                continue
+            tags = None
+            build_tag: tuple[Any, ...] = ()
+            key: tuple[Any, ...] | ValueError
+            if link.is_wheel:
+                if not allow_binary:
+                    continue
+                wheel = Wheel(link.filename)
+                tags = frozenset(wheel.tags)
+                if wheel.build_tag is not None:
+                    match = re.match(r"^(\d+)(.*)$", wheel.build_tag)
+                    if not match:
+                        key = ValueError(
+                            f"Unable to parse build tag: {wheel.build_tag}"
+                        )
+                        candidates.append(_Candidate(link, tags, key))
+                        continue
+                    build_tag = (int(match.group(1)), match.group(2))
+            key = (
+                int(self._chooser._is_link_hash_allowed_for_package(link, package)),
+                int(not link.yanked),
+                0,
+                package.version,
+                build_tag,
+            )
+            candidates.append(_Candidate(link, tags, key))
+        return candidates
+
+    def choose(self, package: Package) -> dict[str, Optional[Link]]:
+        """Platform name -> the chosen link, or None if there is none."""
+        try:
+            candidates = self._candidates(package)
+        except Exception:
+            return {plat.name: None for plat in self.platforms}
+
+        chosen: dict[str, Optional[Link]] = {}
+        for plat in self.platforms:
+            best: Optional[Link] = None
+            best_key: Optional[tuple[Any, ...]] = None
+            for link, tags, key in candidates:
+                if tags is None:
+                    pri = -len(plat.env.supported_tags)
+                else:
+                    ranks = [plat.ranks[t] for t in tags if t in plat.ranks]
+                    if not ranks:
+                        # not supported on this platform
+                        continue
+                    pri = -min(ranks)
+                if isinstance(key, ValueError):
+                    # choose_for fails sorting a supported link it can't key
+                    best = None
+                    break
+                full = (*key, pri)
+                # strictly greater, so ties keep the first link like max()
+                if best_key is None or full > best_key:
+                    best, best_key = link, full
+            chosen[plat.name] = best
+        return chosen
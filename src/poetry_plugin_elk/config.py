@@ -1,4 +1,4 @@
-from typing import Iterable, NamedTuple
+from typing import Iterable, NamedTuple, Optional
 from packaging.tags import MacVersion, PythonVersion
 
 import tomllib
@@ -38,13 +38,42 @@ class BuckConfig(NamedTuple):
     alias: str = "alias"
     prebuilt_python_library: str = "prebuilt_python_library"
     python_library: str = "python_library"
+    # builds a wheel from an unpacked sdist; see elk_sdist_wheel in elk.bzl
+    sdist_wheel: str = "elk_sdist_wheel"
     generated_file_header: str = ""
+    # split the targets across this many subpackages under shard_directory,
+    # leaving only aliases in file_name; 0 writes everything to file_name
+    shards: int = 0
+    # "hash" of the package name, or its "initial" (one shard per letter)
+    shard_by: str = "hash"
+    shard_directory: str = "elk"
+    # label of the package holding file_name, e.g. "//third-party/python";
+    # found from the nearest .buckconfig when unset
+    package: Optional[str] = None
+
+
+class ResolveConfig(NamedTuple):
+    # maximum number of packages whose links are fetched from the pool at
+    # once; 1 keeps the original one-at-a-time behaviour
+    concurrency: int = 1
+    # build wheels from sdists for platforms that have no matching wheel,
+    # rather than failing
+    build_sdists: bool = False
+
+
+class CacheConfig(NamedTuple):
+    enabled: bool = True
+    # relative to the project; defaults to elk/links under poetry's cache-dir
+    directory: Optional[str] = None
+    max_bytes: int = 64 * 1024 * 1024
 
 
 class ElkConfig(NamedTuple):
     python: PythonConfig
     platforms: list[Platform]
     buck: BuckConfig
+    resolve: ResolveConfig = ResolveConfig()
+    cache: CacheConfig = CacheConfig()
 
 
 def parse_toml(file) -> ElkConfig:
@@ -52,6 +81,10 @@ def parse_toml(file) -> ElkConfig:
     platforms = []
 
     buck = BuckConfig(**data.get("buck", {}))
+    if buck.shard_by not in ("hash", "initial"):
+        raise ValueError(f"Unsupported shard_by: {buck.shard_by}")
+    resolve = ResolveConfig(**data.get("resolve", {}))
+    cache = CacheConfig(**data.get("cache", {}))
 
     python = PythonConfig(
         version=tuple(data["python"]["version"]),
@@ -82,4 +115,6 @@ def parse_toml(file) -> ElkConfig:
 
         platforms.append(Platform(name=name, python=python, platform=platform))
 
-    return ElkConfig(python=python, platforms=platforms, buck=buck)
+    return ElkConfig(
+        python=python, platforms=platforms, buck=buck, resolve=resolve, cache=cache
+    )
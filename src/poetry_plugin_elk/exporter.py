@@ -1,18 +1,26 @@
 from pathlib import Path
-from typing import Collection, Iterable, Optional
+from typing import Collection, Iterable, Optional, TextIO
 from cleo.io.io import IO
 from packaging.utils import NormalizedName
 from poetry.core.packages.dependency_group import MAIN_GROUP
-from poetry.installation.executor import Chooser, Executor
+from poetry.core.packages.package import Package
+from poetry.installation.executor import Executor
 from poetry.poetry import Poetry
 from poetry.utils.wheel import Wheel
 
 
-from poetry_plugin_elk.walker import get_project_dependency_packages
+from poetry_plugin_elk.walker import MarkerCache, get_project_dependency_packages
 
 from poetry_plugin_elk import buck
+from poetry_plugin_elk.cache import LinkCache, cache_directory
+from poetry_plugin_elk.chooser import MultiPlatformChooser, PlatformTags
 from poetry_plugin_elk.config import ElkConfig
 from poetry_plugin_elk.envs import to_env
+from poetry_plugin_elk.links import LinkTable, PrefetchedChooser
+from poetry_plugin_elk import manifest
+from poetry_plugin_elk.profiling import NullProfile, Profile
+
+_SHOWN_TAGS = 20
 
 
 class Exporter:
@@ -29,28 +37,61 @@ class Exporter:
         self._extras: Collection[NormalizedName] = ()
         self._groups: Iterable[str] = [MAIN_GROUP]
         self._executor: Executor = executor
+        if config.buck.shards and config.buck.package is None:
+            # shards refer to each other by absolute label
+            package = buck.find_package(poetry.pyproject_path.parent)
+            if package is None:
+                raise ValueError(
+                    "Could not find a .buckconfig above the project; set package"
+                    " under [buck] in elk.toml to shard the output."
+                )
+            config = config._replace(buck=config.buck._replace(package=package))
         self._config: ElkConfig = config
+        self._profile: Profile = NullProfile()
 
     def with_extras(self, extras: Collection[NormalizedName]) -> "Exporter":
         self._extras = extras
         return self
 
-    def run(self, output_path: Path) -> int:
-        with_extras = True
-        allow_editable = False
-
-        BUCK = buck.BUCK()
+    def with_profile(self, profile: Profile) -> "Exporter":
+        self._profile = profile
+        return self
 
-        root = self._poetry.package.with_dependency_groups(
+    def _root(self) -> Package:
+        return self._poetry.package.with_dependency_groups(
             list(self._groups), only=True
         )
-        for dependency_package in get_project_dependency_packages(
-            self._poetry.locker,
-            project_requires=root.all_requires,
-            root_package_name=root.name,
-            project_python_marker=root.python_marker,
-            extras=self._extras,
-        ):
+
+    def _lock_fingerprint(self) -> str:
+        root = self._root()
+        return manifest.lock_fingerprint(
+            self._poetry.locker.lock,
+            [str(root.python_marker)] + [dep.to_pep_508() for dep in root.all_requires],
+            self._extras,
+        )
+
+    def _locked_packages(self) -> dict[str, list[Package]]:
+        """The locked packages to export, grouped by name in walk order."""
+        with_extras = True
+        allow_editable = False
+
+        root = self._root()
+        by_name: dict[str, list[Package]] = {}
+        markers = MarkerCache()
+        with self._profile.phase("walk"):
+            walked = list(
+                get_project_dependency_packages(
+                    self._poetry.locker,
+                    project_requires=root.all_requires,
+                    root_package_name=root.name,
+                    project_python_marker=root.python_marker,
+                    extras=self._extras,
+                    markers=markers,
+                )
+            )
+        self._profile.count("marker hits", markers.hits)
+        self._profile.count("marker misses", markers.misses)
+        for dependency_package in walked:
             if not with_extras:
                 dependency_package = dependency_package.without_features()
 
@@ -64,64 +105,395 @@ class Exporter:
                 )
                 continue
 
-            deps = [buck.TargetName(dep.name) for dep in package.all_requires]
-
-            alias: buck.Alias
-            platform_actual = {}
-            for plat in self._config.platforms:
-                env = to_env(plat)
-                c = self._executor._chooser
-                chooser = Chooser(c._pool, env, c._config)
-                try:
-                    link = chooser.choose_for(package)
-                except:
-                    link = None
-                if link is not None and link.filename.endswith(".whl"):
-                    target = buck.WheelDownload(package=package, link=link)
-                    BUCK.push(target)
-                    built = buck.WheelBuild(
-                        rule=self._config.buck.prebuilt_python_library,
-                        package=package,
-                        binary_src=target.target_name(),
-                        deps=deps,
-                    )
-                    BUCK.push(built)
+            by_name.setdefault(package.name, []).append(package)
+        return by_name
+
+    def check(self, output_path: Path) -> int:
+        """
+        Compare the fingerprints in an existing output file with the lock,
+        without resolving anything. Returns 1 if the output is stale.
+
+        The lock is only walked, to list what changed, when the output was
+        written from a different lock or different settings.
+        """
+        previous = self._read_previous(output_path)
+        if previous is None:
+            self._io.write_error_line(
+                f"<warning>{output_path} does not exist</warning>"
+            )
+            return 1
+        with self._profile.phase("lock fingerprint"):
+            config_fingerprint = manifest.config_fingerprint(self._config)
+            lock_fingerprint = self._lock_fingerprint()
+        if previous.config == config_fingerprint and previous.lock == lock_fingerprint:
+            self._io.write_line(f"<info>{output_path} is up to date</info>")
+            return 0
+        by_name = self._locked_packages()
+        with self._profile.phase("fingerprint"):
+            stale = manifest.staleness(
+                previous,
+                config_fingerprint,
+                {
+                    name: manifest.package_fingerprint(packages)
+                    for name, packages in by_name.items()
+                },
+            )
+        if not stale:
+            self._io.write_line(f"<info>{output_path} is up to date</info>")
+            return 0
+        self._io.write_error_line(f"<warning>{output_path} is stale</warning>")
+        if stale.config_changed:
+            self._io.write_error_line("  elk.toml settings changed")
+        for label, names in (
+            ("added", stale.added),
+            ("removed", stale.removed),
+            ("changed", stale.changed),
+        ):
+            for name in names:
+                self._io.write_error_line(f"  {label}: {name}")
+        return 1
+
+    def run(self, output_path: Path) -> int:
+        by_name = self._locked_packages()
+
+        # Sections of the previous output whose fingerprint still matches are
+        # reused as-is; only the rest are resolved.
+        with self._profile.phase("fingerprint"):
+            config_fingerprint = manifest.config_fingerprint(self._config)
+            lock_fingerprint = self._lock_fingerprint()
+            previous = self._read_previous(output_path)
+            if previous is None or previous.config != config_fingerprint:
+                previous = manifest.Manifest(config=None, sections={})
+            sections: dict[str, manifest.Section] = {}
+            to_resolve: dict[str, tuple[str, list[Package]]] = {}
+            for name, packages in by_name.items():
+                fingerprint = manifest.package_fingerprint(packages)
+                old = previous.sections.get(name)
+                if old is not None and old.fingerprint == fingerprint:
+                    sections[name] = old
                 else:
-                    # target = buck.SourceArchive(package=package, link=link)
-                    # BUCK.push(target)
-                    # built = buck.SourceBuild(
-                    #     package=package, source=target.target_name(), deps=deps
-                    # )
-                    # BUCK.push(built)
-                    self._io.write_error_line(
-                        f"<error>Could not choose a wheel for package {package}, for config {plat}</error>"
-                    )
-                    self._io.write_error_line(f"<error>Available wheels:</error>")
-                    for link in chooser._get_links(package):
-                        self._io.write_error_line(
-                            "<error>    "
-                            + link.filename
-                            + (" " + str(Wheel(link.filename).tags))
-                            if link.is_wheel
-                            else "" + "</error>"
-                        )
-                    self._io.write_error_line(f"<error>Platform tags:</error>")
-                    for tag in env.supported_tags:
-                        self._io.write_error_line("<error>    " + str(tag) + "</error>")
-                    return 1
-                platform_actual[plat.name] = built.target_name()
-
-            alias = buck.Alias(
-                rule=self._config.buck.alias, name=package.name, actual=platform_actual
+                    to_resolve[name] = (fingerprint, packages)
+
+        # Links are the only part of choosing that does I/O, so fetch them all
+        # up front (concurrently, if configured) and choose in lock order
+        # afterwards; the output is the same either way.
+        c = self._executor._chooser
+        cache = None
+        if self._config.cache.enabled:
+            cache = LinkCache(
+                cache_directory(self._poetry, self._config),
+                self._config.cache.max_bytes,
             )
-            BUCK.push(alias)
+        links = LinkTable(cache, self._profile)
+        with self._profile.phase("fetch links"):
+            links.fetch(
+                c,
+                (
+                    package
+                    for _, packages in to_resolve.values()
+                    for package in packages
+                ),
+                self._config.resolve.concurrency,
+            )
+        if cache is not None:
+            self._profile.count("link cache hits", cache.hits)
+            self._profile.count("link cache misses", cache.misses)
 
-        # only open the file (& truncate it) when we get this far
-        with open(output_path, "w+") as output:
-            output.write(self._config.buck.generated_file_header)
-            output.write("\n")
-            output.write(self._config.buck.buckfile_imports)
-            output.write("\n")
-            BUCK.dump(output)
+        # Tag lists are the same for every package, so build each platform's
+        # env and tag ranks once, and score every package's links against
+        # all platforms in one pass.
+        with self._profile.phase("tags"):
+            envs = [(plat, to_env(plat)) for plat in self._config.platforms]
+            chooser = MultiPlatformChooser(
+                PrefetchedChooser(c._pool, envs[0][1], c._config, links),
+                [PlatformTags.of(plat.name, env) for plat, env in envs],
+            )
+
+        resolved: dict[str, tuple[str, buck.BUCK]] = {}
+        with self._profile.phase("choose"):
+            for name, (fingerprint, packages) in to_resolve.items():
+                BUCK = buck.BUCK()
+                for package in packages:
+                    with self._profile.package(f"{package.name} {package.version}"):
+                        if not self._push_package(BUCK, package, chooser, links):
+                            return 1
+                resolved[name] = (fingerprint, BUCK)
+
+        names = sorted(sections.keys() | resolved.keys())
+
+        # Only replace the file (keeping its mtime otherwise) once everything
+        # has resolved and the contents actually changed, so buck2 doesn't
+        # re-parse an identical file.
+        with self._profile.phase("write"):
+            if self._config.buck.shards:
+                changed = self._write_shards(
+                    output_path,
+                    names,
+                    sections,
+                    resolved,
+                    config_fingerprint,
+                    lock_fingerprint,
+                )
+            else:
+                changed = buck.write_if_changed(
+                    output_path,
+                    lambda output: self._write_sections(
+                        output,
+                        names,
+                        sections,
+                        resolved,
+                        config_fingerprint,
+                        lock_fingerprint,
+                    ),
+                )
+        if not changed:
+            self._io.write_error_line(f"<comment>{output_path} is unchanged</comment>")
+
+        self._io.write_error_line(
+            f"<comment>Resolved {len(resolved)} packages,"
+            f" reused {len(sections)}</comment>"
+        )
+        if cache is not None:
+            self._io.write_error_line(
+                f"<comment>Link cache: {cache.hits} hits, {cache.misses} misses"
+                f" ({cache.directory})</comment>"
+            )
 
         return 0
+
+    def _write_header(
+        self,
+        output: TextIO,
+        config_fingerprint: str,
+        lock_fingerprint: Optional[str],
+    ) -> None:
+        output.write(self._config.buck.generated_file_header)
+        output.write("\n")
+        output.write(self._config.buck.buckfile_imports)
+        output.write("\n")
+        output.write(manifest.CONFIG_PREFIX + config_fingerprint + "\n")
+        if lock_fingerprint is not None:
+            output.write(manifest.LOCK_PREFIX + lock_fingerprint + "\n")
+        output.write("\n")
+
+    def _write_sections(
+        self,
+        output: TextIO,
+        names: list[str],
+        sections: dict[str, manifest.Section],
+        resolved: dict[str, tuple[str, buck.BUCK]],
+        config_fingerprint: str,
+        lock_fingerprint: Optional[str],
+    ) -> None:
+        self._write_header(output, config_fingerprint, lock_fingerprint)
+        for name in names:
+            if name in resolved:
+                fingerprint, BUCK = resolved[name]
+                output.write(f"{manifest.SECTION_PREFIX}{name} {fingerprint}\n")
+                BUCK.dump(output)
+            else:
+                section = sections[name]
+                output.write(f"{manifest.SECTION_PREFIX}{name} {section.fingerprint}\n")
+                output.write(section.text)
+
+    def _shard(self, name: str) -> str:
+        return buck.shard_of(name, self._config.buck.shards, self._config.buck.shard_by)
+
+    def _shard_root(self, output_path: Path) -> Path:
+        return output_path.parent / self._config.buck.shard_directory
+
+    def _shard_package(self, shard: str) -> str:
+        package = self._config.buck.package or "//"
+        if not package.endswith("/"):
+            package += "/"
+        return f"{package}{self._config.buck.shard_directory}/{shard}"
+
+    def _read_previous(self, output_path: Path) -> Optional[manifest.Manifest]:
+        """The sections of the previous output, across shards when sharding."""
+        if not self._config.buck.shards:
+            return manifest.Manifest.read(output_path)
+        shard_files = sorted(
+            self._shard_root(output_path).glob(f"*/{self._config.buck.file_name}")
+        )
+        aliases = manifest.Manifest.read(output_path)
+        if not shard_files or aliases is None:
+            return None
+        configs = set()
+        sections: dict[str, manifest.Section] = {}
+        for path in shard_files:
+            shard = manifest.Manifest.read(path)
+            if shard is not None:
+                configs.add(shard.config)
+                sections.update(shard.sections)
+        # shards written with different settings can't be reused
+        config = configs.pop() if len(configs) == 1 else None
+        return manifest.Manifest(config=config, sections=sections, lock=aliases.lock)
+
+    def _write_shards(
+        self,
+        output_path: Path,
+        names: list[str],
+        sections: dict[str, manifest.Section],
+        resolved: dict[str, tuple[str, buck.BUCK]],
+        config_fingerprint: str,
+        lock_fingerprint: str,
+    ) -> bool:
+        """
+        Write each shard's sections to its own subpackage, and aliases to
+        every package into output_path so labels don't depend on the shard.
+        Shard files whose contents are unchanged are left alone, so buck2
+        only re-parses the shards a lock change touched; the lock fingerprint
+        is only written to output_path for the same reason. Returns True if
+        any file changed.
+        """
+        by_shard: dict[str, list[str]] = {}
+        for name in names:
+            by_shard.setdefault(self._shard(name), []).append(name)
+
+        changed = False
+        shard_root = self._shard_root(output_path)
+        for shard, shard_names in sorted(by_shard.items()):
+            path = shard_root / shard / self._config.buck.file_name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            changed |= buck.write_if_changed(
+                path,
+                lambda output, shard_names=shard_names: self._write_sections(
+                    output, shard_names, sections, resolved, config_fingerprint, None
+                ),
+            )
+        # shards left over from a different shard count
+        for path in shard_root.glob(f"*/{self._config.buck.file_name}"):
+            if path.parent.name not in by_shard:
+                path.unlink()
+                changed = True
+
+        aliases = buck.BUCK()
+        for name in names:
+            aliases.push(
+                buck.Target(
+                    self._config.buck.alias,
+                    ["actual"],
+                    name=name,
+                    actual=buck.Label(self._shard_package(self._shard(name)), name),
+                    visibility=["PUBLIC"],
+                )
+            )
+
+        def write(output: TextIO) -> None:
+            self._write_header(output, config_fingerprint, lock_fingerprint)
+            aliases.dump(output)
+
+        changed |= buck.write_if_changed(output_path, write)
+        return changed
+
+    def _dep(self, name: str, shard: Optional[str]) -> buck.TargetName | buck.Label:
+        """A dep on a package, by label when it lives in another shard."""
+        if shard is None or self._shard(name) == shard:
+            return buck.TargetName(name)
+        return buck.Label(self._shard_package(self._shard(name)), name)
+
+    def _push_package(
+        self,
+        BUCK: buck.BUCK,
+        package: Package,
+        chooser: MultiPlatformChooser,
+        links: LinkTable,
+    ) -> bool:
+        shard = self._shard(package.name) if self._config.buck.shards else None
+        deps = [self._dep(dep.name, shard) for dep in package.all_requires]
+
+        alias: buck.Alias
+        platform_actual = {}
+        chosen = chooser.choose(package)
+        self._profile.count("choose calls")
+        self._profile.count("platform choices", len(chooser.platforms))
+        for plat in chooser.platforms:
+            link = chosen[plat.name]
+            if link is not None and link.filename.endswith(".whl"):
+                target = buck.WheelDownload(package=package, link=link)
+                BUCK.push(target)
+                built = buck.WheelBuild(
+                    rule=self._config.buck.prebuilt_python_library,
+                    package=package,
+                    binary_src=target.target_name(),
+                    deps=deps,
+                )
+                BUCK.push(built)
+            elif (
+                link is not None
+                and not link.is_wheel
+                and self._config.resolve.build_sdists
+            ):
+                archive = buck.SourceArchive(package=package, link=link)
+                BUCK.push(archive)
+                wheel = buck.SourceBuild(
+                    rule=self._config.buck.sdist_wheel,
+                    package=package,
+                    source=archive.target_name(),
+                    sha256=archive.sha256,
+                    platform=plat.name,
+                    python=self._config.python.interpreter,
+                )
+                BUCK.push(wheel)
+                built = buck.WheelBuild(
+                    rule=self._config.buck.prebuilt_python_library,
+                    package=package,
+                    binary_src=wheel.target_name(),
+                    deps=deps,
+                )
+                BUCK.push(built)
+            else:
+                self._report_no_wheel(package, plat, links)
+                return False
+            platform_actual[plat.name] = built.target_name()
+
+        alias = buck.Alias(
+            rule=self._config.buck.alias, name=package.name, actual=platform_actual
+        )
+        BUCK.push(alias)
+        return True
+
+    def _report_no_wheel(
+        self, package: Package, plat: PlatformTags, table: LinkTable
+    ) -> None:
+        self._io.write_error_line(
+            f"<error>Could not choose a wheel for package {package}, for platform {plat.name}</error>"
+        )
+        self._io.write_error_line(f"<error>Available files:</error>")
+        # the links the choice was made from, rather than fetching them again
+        links = table.get(package) or []
+        if isinstance(links, Exception):
+            self._io.write_error_line(
+                f"<error>    (could not get links: {links})</error>"
+            )
+            links = []
+        for link in links:
+            self._io.write_error_line(
+                "<error>    "
+                + link.filename
+                + (
+                    (" " + ", ".join(sorted(str(t) for t in Wheel(link.filename).tags)))
+                    if link.is_wheel
+                    else ""
+                )
+                + "</error>"
+            )
+        if not self._config.resolve.build_sdists and any(
+            not link.is_wheel for link in links
+        ):
+            self._io.write_error_line(
+                "<error>Set build_sdists = true under [resolve] in elk.toml"
+                " to build it from its sdist instead.</error>"
+            )
+        # The full list runs to thousands of tags; the best few are enough to
+        # see which interpreter, ABI and platforms were being matched.
+        tags = plat.env.supported_tags
+        self._io.write_error_line(
+            f"<error>Platform tags ({len(tags)}, best first):</error>"
+        )
+        for tag in tags[:_SHOWN_TAGS]:
+            self._io.write_error_line("<error>    " + str(tag) + "</error>")
+        if len(tags) > _SHOWN_TAGS:
+            self._io.write_error_line(
+                f"<error>    ... and {len(tags) - _SHOWN_TAGS} more</error>"
+            )
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable, NamedTuple, Optional
+
+from poetry.core.packages.package import Package
+from poetry.installation.executor import Chooser, Link
+from poetry.repositories.repository_pool import RepositoryPool
+from poetry.utils.env import Env
+from poetry.config.config import Config
+
+from poetry_plugin_elk.profiling import NullProfile, Profile
+
+if TYPE_CHECKING:
+    from poetry_plugin_elk.cache import LinkCache
+
+
+class LinkKey(NamedTuple):
+    """
+    Identifies the links of a locked package. Features (extras) don't change
+    which files a release has, so they are not part of the key.
+    """
+
+    name: str
+    version: str
+    source_url: Optional[str]
+
+    @classmethod
+    def of(cls, package: Package) -> "LinkKey":
+        return cls(package.name, package.version.text, package.source_url)
+
+
+class LinkTable:
+    """
+    Links (or the error raised while fetching them) for a set of packages,
+    fetched ahead of time so that choosing wheels does no I/O. With a
+    LinkCache, only packages missing from the cache go to the pool. Each
+    fetch from the pool is timed into the Profile, under the package's name.
+    """
+
+    _links: dict[LinkKey, list[Link] | Exception]
+    _cache: Optional["LinkCache"]
+    _profile: Profile
+
+    def __init__(
+        self, cache: Optional["LinkCache"] = None, profile: Optional[Profile] = None
+    ) -> None:
+        self._links = {}
+        self._cache = cache
+        self._profile = profile if profile is not None else NullProfile()
+
+    def fetch(
+        self, chooser: Chooser, packages: Iterable[Package], concurrency: int
+    ) -> None:
+        """
+        Fetch links for every package through the chooser's pool, with up to
+        ``concurrency`` requests in flight.
+        """
+
+        def fetch_one(package: Package) -> list[Link] | Exception:
+            with self._profile.fetch(f"{package.name} {package.version}"):
+                try:
+                    return chooser._get_links(package)
+                except Exception as e:
+                    return e
+
+        unique: dict[LinkKey, Package] = {}
+        for package in packages:
+            key = LinkKey.of(package)
+            if key in self._links or key in unique:
+                continue
+            cached = self._cache.get(key) if self._cache is not None else None
+            if cached is not None:
+                self._links[key] = cached
+            else:
+                unique[key] = package
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            # map() yields in submission order, so the table is filled
+            # deterministically regardless of which request finishes first.
+            for key, links in zip(unique, pool.map(fetch_one, unique.values())):
+                self._links[key] = links
+                # errors are not cached, so they are retried next time
+                if self._cache is not None and not isinstance(links, Exception):
+                    self._cache.put(key, links)
+
+        if self._cache is not None:
+            self._cache.evict()
+
+    def get(self, package: Package) -> list[Link] | Exception | None:
+        return self._links.get(LinkKey.of(package))
+
+
+class PrefetchedChooser(Chooser):
+    """
+    A Chooser that takes links from a LinkTable, falling back to the pool for
+    packages that were not prefetched.
+    """
+
+    def __init__(
+        self, pool: RepositoryPool, env: Env, config: Config, table: LinkTable
+    ) -> None:
+        super().__init__(pool, env, config)
+        self._table = table
+
+    def _get_links(self, package: Package) -> list[Link]:
+        links = self._table.get(package)
+        if links is None:
+            return super()._get_links(package)
+        if isinstance(links, Exception):
+            raise links
+        return links
@@ -0,0 +1,152 @@
+"""
+Fingerprints embedded in the generated BUCK file.
+
+The generated file records a fingerprint of the elk.toml settings that
+affect its output and one of the lock and requested groups and extras, and
+each package's targets are written as a section headed by that package's
+fingerprint:
+
+    # elk-config: <sha256>
+    # elk-lock: <sha256>
+
+    # elk-package: numpy <sha256>
+    remote_file(...)
+    ...
+
+On the next run, sections whose fingerprint still matches are copied over
+verbatim instead of being resolved again. ``--check`` compares the config and
+lock fingerprints first, and only walks the lock to find what changed when
+they differ.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from poetry.core.packages.package import Package
+
+from poetry_plugin_elk.config import ElkConfig
+
+CONFIG_PREFIX = "# elk-config: "
+LOCK_PREFIX = "# elk-lock: "
+SECTION_PREFIX = "# elk-package: "
+
+
+def _digest(data) -> str:
+    return hashlib.sha256(
+        json.dumps(data, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def config_fingerprint(config: ElkConfig) -> str:
+    # other resolve settings and the cache don't change the output, so
+    # they're left out
+    return _digest(
+        [config.python, config.platforms, config.buck, config.resolve.build_sdists]
+    )
+
+
+def lock_fingerprint(
+    lock_path: Path, requires: Iterable[str], extras: Iterable[str]
+) -> str:
+    """
+    The lock file's contents and what is asked of it. If this matches, so
+    does every package fingerprint, without walking the lock.
+    """
+    with open(lock_path, "rb") as f:
+        lock = hashlib.sha256(f.read()).hexdigest()
+    return _digest([lock, sorted(requires), sorted(extras)])
+
+
+def package_fingerprint(packages: Iterable[Package]) -> str:
+    """
+    Everything about the locked package(s) of one name that ends up in the
+    generated targets: version, source, file hashes and deps.
+    """
+    return _digest(
+        [
+            [
+                package.version.text,
+                package.source_type,
+                package.source_url,
+                package.source_reference,
+                sorted((f["file"], f["hash"]) for f in package.files),
+                [dep.name for dep in package.all_requires],
+            ]
+            for package in packages
+        ]
+    )
+
+
+class Section(NamedTuple):
+    fingerprint: str
+    text: str
+
+
+class Manifest(NamedTuple):
+    config: Optional[str]
+    sections: dict[str, Section]
+    lock: Optional[str] = None
+
+    @classmethod
+    def read(cls, path: Path) -> Optional["Manifest"]:
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return None
+
+        config = None
+        lock = None
+        sections: dict[str, Section] = {}
+        current: Optional[tuple[str, str]] = None
+        body: list[str] = []
+
+        def finish():
+            if current is not None:
+                sections[current[0]] = Section(current[1], "".join(body))
+
+        for line in lines:
+            if line.startswith(CONFIG_PREFIX):
+                config = line[len(CONFIG_PREFIX) :].strip()
+            elif line.startswith(LOCK_PREFIX):
+                lock = line[len(LOCK_PREFIX) :].strip()
+            elif line.startswith(SECTION_PREFIX):
+                finish()
+                name, _, fingerprint = (
+                    line[len(SECTION_PREFIX) :].strip().partition(" ")
+                )
+                current = (name, fingerprint)
+                body = []
+            elif current is not None:
+                body.append(line)
+        finish()
+        return cls(config=config, sections=sections, lock=lock)
+
+    def fingerprints(self) -> dict[str, str]:
+        return {name: s.fingerprint for name, s in self.sections.items()}
+
+
+class Staleness(NamedTuple):
+    config_changed: bool
+    added: list[str]
+    removed: list[str]
+    changed: list[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.config_changed or self.added or self.removed or self.changed)
+
+
+def staleness(
+    previous: Manifest, config: str, fingerprints: dict[str, str]
+) -> Staleness:
+    old = previous.fingerprints()
+    return Staleness(
+        config_changed=previous.config != config,
+        added=sorted(fingerprints.keys() - old.keys()),
+        removed=sorted(old.keys() - fingerprints.keys()),
+        changed=sorted(
+            name for name, fp in fingerprints.items() if name in old and old[name] != fp
+        ),
+    )
@@ -1,6 +1,6 @@
 from pathlib import Path
 from typing import Iterable
-from cleo.helpers import option
+from cleo.helpers import argument, option
 from poetry.plugins.application_plugin import ApplicationPlugin
 from poetry.console.application import Application
 from poetry.console.commands.installer_command import InstallerCommand
@@ -8,8 +8,16 @@ from poetry.console.commands.command import Command
 
 from packaging.utils import NormalizedName, canonicalize_name
 
+from poetry_plugin_elk.cache import LinkCache, cache_directory
 from poetry_plugin_elk.exporter import Exporter
-from poetry_plugin_elk.config import parse_toml
+from poetry_plugin_elk.config import ElkConfig, parse_toml
+from poetry_plugin_elk.profiling import Profile
+
+
+def load_config(command: Command) -> ElkConfig:
+    config_path = command.poetry.pyproject_path.parent / Path("elk.toml")
+    with open(config_path, "rb") as config_file:
+        return parse_toml(config_file)
 
 
 class CustomCommand(InstallerCommand):
@@ -24,19 +32,36 @@ class CustomCommand(InstallerCommand):
             multiple=True,
         ),
         option("all-extras", None, "Include all sets of extra dependencies."),
+        option(
+            "check",
+            None,
+            "Report whether the generated file is stale, from fingerprints"
+            " alone, and exit 1 if it is.",
+        ),
+        option(
+            "profile",
+            None,
+            "Print the time spent in each phase and on each package, and"
+            " counters such as cache hit rates.",
+        ),
+        option(
+            "profile-trace",
+            None,
+            "Also write the profile to this file as Chrome trace events.",
+            flag=False,
+        ),
     ]
 
     def handle(self) -> int:
         # self.installer.lock(update=False)
         # self.installer.dry_run(dry_run=True)
-        config_path = self.poetry.pyproject_path.parent / Path("elk.toml")
-        with open(config_path, "rb") as config_file:
-            config = parse_toml(config_file)
-            output_path = self.poetry.pyproject_path.parent / Path(
-                config.buck.file_name
-            )
+        config = load_config(self)
+        output_path = self.poetry.pyproject_path.parent / Path(config.buck.file_name)
 
         locker = self.poetry.locker
+        if self.option("check") and not locker.is_locked():
+            self.line_error("<error>The lock file does not exist.</error>")
+            return 1
         if not locker.is_locked():
             self.line_error("<comment>The lock file does not exist. Locking.</comment>")
             options = []
@@ -64,13 +89,52 @@ class CustomCommand(InstallerCommand):
                     f"Extra [{', '.join(sorted(invalid_extras))}] is not specified."
                 )
         exporter = Exporter(self.poetry, self.io, self.installer.executor, config)
-        return exporter.with_extras(extras).run(output_path)
+        exporter.with_extras(extras)
+        profile = None
+        if self.option("profile") or self.option("profile-trace"):
+            profile = Profile()
+            exporter.with_profile(profile)
+        if self.option("check"):
+            result = exporter.check(output_path)
+        else:
+            result = exporter.run(output_path)
+
+        if profile is not None:
+            for line in profile.summary():
+                self.line_error(line)
+            trace_path = self.option("profile-trace")
+            if trace_path:
+                profile.write_trace(Path(trace_path))
+                self.line_error(f"<comment>Wrote trace to {trace_path}</comment>")
+        return result
+
+
+class ClearCacheCommand(Command):
+    name = "elk-clear-cache"
+    description = "Remove cached package links used by <c1>poetry elk</c1>."
+
+    arguments = [
+        argument(
+            "packages",
+            "Only remove entries for these packages.",
+            optional=True,
+            multiple=True,
+        ),
+    ]
+
+    def handle(self) -> int:
+        config = load_config(self)
+        cache = LinkCache(cache_directory(self.poetry, config), config.cache.max_bytes)
+        names = [canonicalize_name(name) for name in self.argument("packages")]
+        removed = cache.clear(names or None)
+        self.line(f"Removed {removed} entries from {cache.directory}")
+        return 0
 
 
 class Elk(ApplicationPlugin):
     @property
     def commands(self) -> list[type[Command]]:
-        return [CustomCommand]
+        return [CustomCommand, ClearCacheCommand]
 
     def activate(self, application: Application):
         super().activate(application=application)
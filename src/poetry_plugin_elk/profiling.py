@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+# packages listed by name in the summary, slowest first
+_SLOWEST = 10
+
+
+class Span(NamedTuple):
+    name: str
+    # seconds since the profile started
+    start: float
+    seconds: float
+    # threading.get_ident() of the thread it ran on
+    thread: int = 0
+
+
+class Profile:
+    """
+    Wall time of each phase of ``poetry elk`` and of resolving each package,
+    plus counters, for ``--profile``. A package's time is its link fetch
+    (on a fetch thread) plus choosing its wheels. ``summary`` formats them as
+    a table and ``write_trace`` as a Chrome trace-event file
+    (chrome://tracing, Perfetto).
+    """
+
+    phases: list[Span]
+    packages: list[Span]
+    fetches: list[Span]
+    counters: dict[str, int]
+
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self.phases = []
+        self.packages = []
+        self.fetches = []
+        self.counters = {}
+
+    @contextmanager
+    def _span(self, spans: list[Span], name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            # list.append is atomic, so fetch threads can share a list
+            spans.append(
+                Span(name, start - self._start, end - start, threading.get_ident())
+            )
+
+    def phase(self, name: str):
+        return self._span(self.phases, name)
+
+    def package(self, name: str):
+        """Choosing wheels for the package ``name``, e.g. ``"numpy 2.1.3"``."""
+        return self._span(self.packages, name)
+
+    def fetch(self, name: str):
+        """Fetching the links of the package ``name``, from any thread."""
+        return self._span(self.fetches, name)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> list[str]:
+        lines = ["Phase                      seconds"]
+        for span in self.phases:
+            lines.append(f"  {span.name:<24} {span.seconds:8.3f}")
+
+        packages = self.package_seconds()
+        if packages:
+            seconds = sorted(fetch + choose for fetch, choose in packages.values())
+            n = len(seconds)
+            lines.append(
+                f"Packages: {n} resolved, {sum(seconds):.3f}s total,"
+                f" p50 {seconds[n // 2] * 1000:.2f}ms,"
+                f" p95 {seconds[min(n - 1, n * 95 // 100)] * 1000:.2f}ms,"
+                f" max {seconds[-1] * 1000:.2f}ms"
+            )
+            slowest = sorted(packages.items(), key=lambda item: -sum(item[1]))
+            for name, (fetch, choose) in slowest[:_SLOWEST]:
+                lines.append(
+                    f"  {name:<40} {(fetch + choose) * 1000:8.2f}ms"
+                    f"  (fetch {fetch * 1000:.2f}ms, choose {choose * 1000:.2f}ms)"
+                )
+
+        if self.counters:
+            lines.append("Counters")
+            for name, value in self.counters.items():
+                lines.append(f"  {name:<24} {value:8d}")
+        for prefix in sorted(
+            {name[: -len(" hits")] for name in self.counters if name.endswith(" hits")}
+        ):
+            hits = self.counters.get(prefix + " hits", 0)
+            total = hits + self.counters.get(prefix + " misses", 0)
+            if total:
+                lines.append(f"  {prefix + ' hit rate':<24} {hits / total:8.1%}")
+        return lines
+
+    def package_seconds(self) -> dict[str, tuple[float, float]]:
+        """Package name -> (seconds fetching its links, seconds choosing)."""
+        seconds: dict[str, tuple[float, float]] = {}
+        for span in self.fetches:
+            fetch, choose = seconds.get(span.name, (0.0, 0.0))
+            seconds[span.name] = (fetch + span.seconds, choose)
+        for span in self.packages:
+            fetch, choose = seconds.get(span.name, (0.0, 0.0))
+            seconds[span.name] = (fetch, choose + span.seconds)
+        return seconds
+
+    def trace(self) -> dict:
+        """
+        The profile as Chrome trace events: phases on one row, choosing
+        packages on another and each fetch thread on its own.
+        """
+        rows = [("phases", self.phases), ("packages", self.packages)]
+        fetch_threads: dict[int, list[Span]] = {}
+        for span in self.fetches:
+            fetch_threads.setdefault(span.thread, []).append(span)
+        for i, spans in enumerate(fetch_threads.values()):
+            rows.append((f"fetch {i + 1}", spans))
+
+        events = []
+        for tid, (name, spans) in enumerate(rows, 1):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+            )
+            for span in spans:
+                events.append(
+                    {
+                        "name": span.name,
+                        "ph": "X",
+                        "pid": 1,
+                        "tid": tid,
+                        "ts": round(span.start * 1e6),
+                        "dur": round(span.seconds * 1e6),
+                    }
+                )
+        end = max((span.start + span.seconds for span in self.phases), default=0)
+        for name, value in self.counters.items():
+            events.append(
+                {
+                    "name": name,
+                    "ph": "C",
+                    "pid": 1,
+                    "ts": round(end * 1e6),
+                    "args": {"value": value},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path: Path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+
+class NullProfile(Profile):
+    """A Profile that records nothing, used without ``--profile``."""
+
+    @contextmanager
+    def _span(self, spans: list[Span], name: str) -> Iterator[None]:
+        yield
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
@@ -2,6 +2,7 @@
 #
 from __future__ import annotations
 
+from collections import deque
 from typing import TYPE_CHECKING
 
 from packaging.utils import canonicalize_name
@@ -57,6 +58,7 @@ def get_project_dependency_packages(
     root_package_name: NormalizedName,
     project_python_marker: BaseMarker | None = None,
     extras: Collection[NormalizedName] = (),
+    markers: MarkerCache | None = None,
 ) -> Iterator[DependencyPackage]:
     # Apply the project python marker to all requirements.
     if project_python_marker is not None:
@@ -100,6 +102,7 @@ def get_project_dependency_packages(
         project_requires=selected,
         locked_packages=repository.packages,
         root_package_name=root_package_name,
+        markers=markers,
     ):
         yield DependencyPackage(dependency=dependency, package=package)
 
@@ -108,6 +111,7 @@ def get_project_dependencies(
     project_requires: list[Dependency],
     locked_packages: list[Package],
     root_package_name: NormalizedName,
+    markers: MarkerCache | None = None,
 ) -> Iterable[tuple[Package, Dependency]]:
     # group packages entries by name, this is required because requirement might use
     # different constraints.
@@ -128,21 +132,82 @@ def get_project_dependencies(
         dependencies=project_requires,
         packages_by_name=packages_by_name,
         root_package_name=root_package_name,
+        markers=markers,
     )
 
     return nested_dependencies.items()
 
 
+class MarkerCache:
+    """
+    Memoizes marker algebra for a single walk. The same requirement markers
+    are intersected with the same region markers over and over, and poetry
+    markers are immutable and hashable, so results can be shared.
+
+    ``hits`` and ``misses`` count the operations answered from the cache and
+    computed, for ``poetry elk --profile``.
+    """
+
+    hits: int
+    misses: int
+
+    def __init__(self) -> None:
+        self._intersections: dict[tuple[BaseMarker, BaseMarker], BaseMarker] = {}
+        self._empty: dict[BaseMarker, bool] = {}
+        self._without_extras: dict[BaseMarker, BaseMarker] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def intersect(self, a: BaseMarker, b: BaseMarker) -> BaseMarker:
+        key = (a, b)
+        result = self._intersections.get(key)
+        if result is None:
+            self.misses += 1
+            result = a.intersect(b)
+            self._intersections[key] = result
+        else:
+            self.hits += 1
+        return result
+
+    def is_empty(self, marker: BaseMarker) -> bool:
+        result = self._empty.get(marker)
+        if result is None:
+            self.misses += 1
+            result = marker.is_empty()
+            self._empty[marker] = result
+        else:
+            self.hits += 1
+        return result
+
+    def without_extras(self, marker: BaseMarker) -> BaseMarker:
+        result = self._without_extras.get(marker)
+        if result is None:
+            self.misses += 1
+            result = marker.without_extras()
+            self._without_extras[marker] = result
+        else:
+            self.hits += 1
+        return result
+
+
 def walk_dependencies(
     dependencies: list[Dependency],
     packages_by_name: dict[str, list[Package]],
     root_package_name: NormalizedName,
+    markers: MarkerCache | None = None,
 ) -> dict[Package, Dependency]:
     nested_dependencies: dict[Package, Dependency] = {}
-
+    # nested_dependencies' keys, by name, so that get_locked_package only
+    # looks at decisions for the package it is choosing
+    decided_by_name: dict[str, list[Package]] = {}
+    # the python version regions of a name only depend on its candidates
+    region_markers_by_name: dict[str, list[BaseMarker]] = {}
+    markers = markers or MarkerCache()
+
+    queue = deque(dependencies)
     visited: set[tuple[Dependency, BaseMarker]] = set()
-    while dependencies:
-        requirement = dependencies.pop(0)
+    while queue:
+        requirement = queue.popleft()
         if (requirement, requirement.marker) in visited:
             continue
         if requirement.name == root_package_name:
@@ -150,7 +215,11 @@ def walk_dependencies(
         visited.add((requirement, requirement.marker))
 
         locked_package = get_locked_package(
-            requirement, packages_by_name, nested_dependencies
+            requirement,
+            packages_by_name,
+            nested_dependencies,
+            decided_by_name,
+            markers,
         )
 
         if not locked_package:
@@ -164,7 +233,7 @@ def walk_dependencies(
         constraint = requirement.constraint
         marker = requirement.marker
         requirement = locked_package.to_dependency()
-        requirement.marker = requirement.marker.intersect(marker)
+        requirement.marker = markers.intersect(requirement.marker, marker)
 
         requirement.constraint = constraint
 
@@ -174,27 +243,37 @@ def walk_dependencies(
             if require.is_optional() and require not in extra_requires:
                 continue
 
-            base_marker = require.marker.intersect(requirement.marker).without_extras()
+            base_marker = markers.without_extras(
+                markers.intersect(require.marker, requirement.marker)
+            )
 
-            if not base_marker.is_empty():
+            if not markers.is_empty(base_marker):
                 # So as to give ourselves enough flexibility in choosing a solution,
                 # we need to split the world up into the python version ranges that
                 # this package might care about.
                 #
                 # We create a marker for all of the possible regions, and add a
                 # requirement for each separately.
-                candidates = packages_by_name.get(require.name, [])
-                region_markers = get_python_version_region_markers(candidates)
+                region_markers = region_markers_by_name.get(require.name)
+                if region_markers is None:
+                    candidates = packages_by_name.get(require.name, [])
+                    region_markers = get_python_version_region_markers(candidates)
+                    region_markers_by_name[require.name] = region_markers
                 for region_marker in region_markers:
-                    marker = region_marker.intersect(base_marker)
-                    if not marker.is_empty():
+                    marker = markers.intersect(region_marker, base_marker)
+                    if not markers.is_empty(marker):
                         require2 = require.clone()
                         require2.marker = marker
-                        dependencies.append(require2)
+                        queue.append(require2)
 
         key = locked_package
         if key not in nested_dependencies:
             nested_dependencies[key] = requirement
+            # get_locked_package looks decisions up by candidate, so packages
+            # with features (which compare unequal to the plain candidate)
+            # never count as decided
+            if key in packages_by_name.get(key.name, ()):
+                decided_by_name.setdefault(key.name, []).append(key)
         else:
             nested_dependencies[key].marker = nested_dependencies[key].marker.union(
                 requirement.marker
@@ -235,24 +314,34 @@ def get_locked_package(
     dependency: Dependency,
     packages_by_name: dict[str, list[Package]],
     decided: dict[Package, Dependency] | None = None,
+    decided_by_name: dict[str, list[Package]] | None = None,
+    markers: MarkerCache | None = None,
 ) -> Package | None:
     """
     Internal helper to identify corresponding locked package using dependency
     version constraints.
+
+    ``decided_by_name`` indexes the keys of ``decided`` by package name; when
+    given, only earlier decisions for this name are consulted.
     """
     decided = decided or {}
+    markers = markers or MarkerCache()
 
     candidates = packages_by_name.get(dependency.name, [])
 
+    if decided_by_name is not None:
+        decided_packages = decided_by_name.get(dependency.name, [])
+    else:
+        decided_packages = [package for package in candidates if package in decided]
+
     # If we've previously chosen a version of this package that is compatible with
     # the current requirement, we are forced to stick with it.  (Else we end up with
     # different versions of the same package at the same time.)
     overlapping_candidates = set()
-    for package in candidates:
-        old_decision = decided.get(package)
-        if (
-            old_decision is not None
-            and not old_decision.marker.intersect(dependency.marker).is_empty()
+    for package in decided_packages:
+        old_decision = decided[package]
+        if not markers.is_empty(
+            markers.intersect(old_decision.marker, dependency.marker)
         ):
             overlapping_candidates.add(package)
 
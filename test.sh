@@ -7,6 +7,33 @@ cd "$(dirname "$0")"
 buck2 run elk//tools:save_tags example/poetry/linux-x86_64.tags.json
 buck2 run elk//tools:save_tags example/uv/linux-x86_64.tags.json
 buck2 run elk//tools:save_tags example/uv_workspace/linux-x86_64.tags.json
+buck2 run elk//tools:save_tags example/uv_forks/linux-x86_64.tags.json
+buck2 run elk//tools:prune_tags example/uv_forks/uv.lock example/uv_forks/linux-x86_64.tags.json example/uv_forks/linux-x86_64.pruned.tags.json
+
+# The test digest depends on this machine's tags, so regenerate it too
+buck2 run elk//tools:lock_digest -- example/uv_forks/uv.lock tests/digest/elk.digest.json --tags linux-x86_64=example/uv_forks/linux-x86_64.pruned.tags.json
+
+# Load-time tests of elk.bzl; loading fails if one does
+buck2 targets //tests:
+
+# Python tests of the poetry plugin and tools
+poetry install --with dev
+poetry run pytest tests
+
+# Mirrors: serve a wheelhouse from a temp dir and check packaging's wheel is
+# downloaded from it rather than from upstream
+wheelhouse="$(mktemp -d)"
+buck2 run elk//tools:prefetch -- tools/uv.lock "$wheelhouse/wheels" --tags tests/mirror/py3.tags.json
+port="$(python3 -c 'import socket; s = socket.socket(); s.bind(("127.0.0.1", 0)); print(s.getsockname()[1])')"
+python3 -m http.server "$port" --bind 127.0.0.1 --directory "$wheelhouse/wheels" 2> "$wheelhouse/log" &
+server=$!
+trap 'kill $server; rm -rf "$wheelhouse"' EXIT
+sleep 1
+buck2 build -c elk_test.mirror="http://127.0.0.1:$port" //tests/mirror:packaging
+grep -q 'GET /[0-9a-f]*/packaging-26.0-py3-none-any.whl HTTP/1.1" 200' "$wheelhouse/log"
+
+# A digest made from the lock passes its check, and builds
+buck2 build //tests/digest:elk_digest_check //tests/digest:cowsay
 
 # Check the example builds
 buck2 run //example/poetry:main
@@ -14,4 +41,5 @@ buck2 run //example/poetry:other
 buck2 run //example/uv:main
 buck2 run //example/uv:other
 buck2 run //example/custom_platforms:main
+buck2 run //example/uv_forks:main
 buck2 run //example/uv_workspace/packages/app-cli:main
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+root = Path(__file__).parent.parent
+# bench/ and tools/ are scripts rather than packages
+sys.path[:0] = [str(root / "bench"), str(root / "tools")]
+
+
+@pytest.fixture
+def poetry_elk():
+    """Run ``poetry elk`` with this plugin in a project directory."""
+
+    def run(project: Path, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-m", "poetry", "elk", *args],
+            cwd=project,
+            # use the current environment rather than creating one per project
+            env={**os.environ, "POETRY_VIRTUALENVS_CREATE": "false"},
+            capture_output=True,
+            text=True,
+        )
+
+    return run
@@ -0,0 +1,134 @@
+"""Load-time tests for elk.bzl's marker environment and marker evaluator."""
+
+load("@elk//:elk.bzl", "evaluate_marker", "marker_environment")
+
+_LINUX_313 = {
+    "implementation_name": "cpython",
+    "os_name": "posix",
+    "platform_machine": "x86_64",
+    "platform_python_implementation": "CPython",
+    "platform_system": "Linux",
+    "python_version": "3.13",
+    "sys_platform": "linux",
+}
+
+_LINUX = {
+    "os_name": "posix",
+    "platform_machine": "x86_64",
+    "platform_system": "Linux",
+    "sys_platform": "linux",
+}
+
+# (tags, expected environment)
+_ENVIRONMENTS = [
+    # save_tags' factored form
+    (
+        {"groups": [
+            {"interpreters": ["cp313"], "abis": ["cp313", "abi3", "none"], "platforms": ["manylinux_2_35_x86_64", "linux_x86_64"]},
+            {"interpreters": ["cp312", "cp311"], "abis": ["abi3"], "platforms": ["manylinux_2_35_x86_64"]},
+            {"interpreters": ["py313", "py3"], "abis": ["none"], "platforms": ["any"]},
+        ]},
+        _LINUX_313,
+    ),
+    # prune_tags output keeps the interpreter's own tag first
+    (["cp313-cp313-manylinux_2_35_x86_64", "cp310-abi3-manylinux_2_17_x86_64", "py3-none-any"], _LINUX_313),
+    # an abi3 or pure tag doesn't say which python runs
+    (["cp310-abi3-manylinux_2_17_x86_64", "py3-none-any"], _LINUX),
+    (["py3-none-any"], {}),
+    (
+        {"groups": [{"interpreters": ["cp312", "cp311"], "abis": ["abi3"], "platforms": ["manylinux_2_17_x86_64"]}]},
+        _LINUX,
+    ),
+    (["cp313-cp313t-manylinux_2_17_aarch64"], {
+        "implementation_name": "cpython",
+        "os_name": "posix",
+        "platform_machine": "aarch64",
+        "platform_python_implementation": "CPython",
+        "platform_system": "Linux",
+        "python_version": "3.13",
+        "sys_platform": "linux",
+    }),
+    (["cp312-cp312-macosx_14_0_arm64", "cp312-abi3-macosx_11_0_arm64"], {
+        "implementation_name": "cpython",
+        "os_name": "posix",
+        "platform_machine": "arm64",
+        "platform_python_implementation": "CPython",
+        "platform_system": "Darwin",
+        "python_version": "3.12",
+        "sys_platform": "darwin",
+    }),
+    (["cp311-cp311-win_amd64"], {
+        "implementation_name": "cpython",
+        "os_name": "nt",
+        "platform_machine": "AMD64",
+        "platform_python_implementation": "CPython",
+        "platform_system": "Windows",
+        "python_version": "3.11",
+        "sys_platform": "win32",
+    }),
+    (["pp310-pypy310_pp73-manylinux_2_17_x86_64"], {
+        "implementation_name": "pypy",
+        "os_name": "posix",
+        "platform_machine": "x86_64",
+        "platform_python_implementation": "PyPy",
+        "platform_system": "Linux",
+        "python_version": "3.10",
+        "sys_platform": "linux",
+    }),
+]
+
+# (marker, environment, expected: True, False or None for undecided)
+_MARKERS = [
+    ("sys_platform == 'win32'", _LINUX_313, False),
+    ('sys_platform == "linux"', _LINUX_313, True),
+    ("sys_platform != 'win32'", _LINUX_313, True),
+    ("os_name == 'nt'", _LINUX_313, False),
+    ("python_version >= '3.11'", _LINUX_313, True),
+    ("python_version>='3.11'", _LINUX_313, True),
+    ("python_version < '3.10'", _LINUX_313, False),
+    ("python_version < '3.9'", _LINUX_313, False),
+    # versions compare numerically, not as strings
+    ("python_version > '3.9'", _LINUX_313, True),
+    ("python_version == '3.*'", _LINUX_313, True),
+    ("python_version != '3.13.*'", _LINUX_313, False),
+    ("python_version ~= '3.12'", _LINUX_313, True),
+    ("'3.13' <= python_version", _LINUX_313, True),
+    ("'linux' in sys_platform", _LINUX_313, True),
+    ("sys_platform not in 'win32 cygwin'", _LINUX_313, True),
+    ("implementation_name == 'cpython' and platform_python_implementation != 'PyPy'", _LINUX_313, True),
+    ("platform_machine == 'x86_64' and (sys_platform == 'linux' or sys_platform == 'darwin')", _LINUX_313, True),
+    ("(platform_machine == 'arm64' or platform_machine == 'aarch64') and sys_platform == 'linux'", _LINUX_313, False),
+    ("((python_version < '3.12'))", _LINUX_313, False),
+    # and binds tighter than or
+    ("sys_platform == 'linux' or sys_platform == 'win32' and python_version < '3'", _LINUX_313, True),
+    ("sys_platform == 'win32' or sys_platform == 'linux' and python_version < '3'", _LINUX_313, False),
+    ("(sys_platform == 'win32' or sys_platform == 'linux') and python_version >= '3'", _LINUX_313, True),
+    # no extras are requested
+    ("extra == 'socks'", _LINUX_313, False),
+    ("python_version >= '3.8' and extra == 'socks'", _LINUX_313, False),
+    # tags only give the minor version
+    ("python_full_version < '3.14'", _LINUX_313, True),
+    ("python_full_version >= '3.13.0'", _LINUX_313, True),
+    ("python_full_version >= '3.13.1'", _LINUX_313, None),
+    ("python_full_version >= '3.13.1'", dict(_LINUX_313, python_full_version = "3.13.2"), True),
+    # unknown variables leave a marker undecided unless the rest decides it
+    ("platform_release >= '5'", _LINUX_313, None),
+    ("python_version >= '3.11' and platform_release == 'x'", _LINUX_313, None),
+    ("sys_platform == 'win32' and platform_release == 'x'", _LINUX_313, False),
+    ("sys_platform == 'linux' or platform_release == 'x'", _LINUX_313, True),
+    ("python_version >= '3.11'", _LINUX, None),
+    ("python_version >= '3.11' and sys_platform == 'win32'", _LINUX, False),
+]
+
+def marker_tests():
+    failures = []
+    for tags, want in _ENVIRONMENTS:
+        got = marker_environment(tags)
+        if got != want:
+            failures.append("marker_environment({}) = {}, want {}".format(tags, got, want))
+    for marker, env, want in _MARKERS:
+        got = evaluate_marker(marker, env)
+        if got != want:
+            failures.append("evaluate_marker({}) = {}, want {}".format(repr(marker), got, want))
+    if failures:
+        fail("{} marker tests failed:\n  {}".format(len(failures), "\n  ".join(failures)))
@@ -0,0 +1,68 @@
+"""Load-time tests for poetry_packages' group and extra selection."""
+
+load("@elk//:elk.bzl", "poetry_packages")
+
+def _lock(groups_key):
+    """A small poetry.lock; *groups_key* is how each package records its group."""
+
+    def group(name):
+        if groups_key == "groups":
+            return {"groups": [name]}
+        if groups_key == "category":
+            return {"category": name}
+        return {}
+
+    def package(name, optional = False, group_name = "main", dependencies = {}, extras = {}):
+        pkg = {"name": name, "version": "1.0", "optional": optional, "files": [], "dependencies": dependencies, "extras": extras}
+        pkg.update(group(group_name))
+        return pkg
+
+    return {
+        "package": [
+            package("app-thing", dependencies = {"requests": {"version": ">=2", "extras": ["socks"]}}),
+            package("requests", dependencies = {"idna": ">=2", "PySocks": {"version": ">=1", "optional": True}}, extras = {"socks": ["PySocks (>=1.5.6,!=1.5.7)"]}),
+            package("idna"),
+            package("pysocks"),
+            package("polars", optional = True, dependencies = {"pyarrow": {"version": ">=7", "optional": True}}, extras = {"pyarrow": ["pyarrow (>=7.0.0)"]}),
+            package("pyarrow", optional = True),
+            package("pytest", group_name = "dev", dependencies = {"iniconfig": "*"}),
+            package("iniconfig", group_name = "dev"),
+        ],
+        "extras": {"df": ["polars[pyarrow]"]},
+        "metadata": {},
+    }
+
+def _names(packages):
+    return sorted([pkg.name for pkg in packages])
+
+def poetry_tests(example_lock: dict):
+    """*example_lock* is example/poetry's poetry.lock, from Poetry 1.8."""
+    failures = []
+
+    def check(what, got, want):
+        if got != want:
+            failures.append("{} = {}, want {}".format(what, got, want))
+
+    everything = ["app-thing", "idna", "iniconfig", "polars", "pyarrow", "pysocks", "pytest", "requests"]
+    for key in ("groups", "category"):
+        lock = _lock(key)
+        check(key + ": no selection", _names(poetry_packages(lock)), everything)
+        check(key + ": main", _names(poetry_packages(lock, groups = ["main"])), ["app-thing", "idna", "pysocks", "requests"])
+        check(key + ": dev", _names(poetry_packages(lock, groups = ["dev"])), ["iniconfig", "pytest"])
+        check(key + ": extras", _names(poetry_packages(lock, extras = ["df"])), ["app-thing", "idna", "polars", "pyarrow", "pysocks", "requests"])
+        check(key + ": roots", _names(poetry_packages(lock, roots = ["requests"], groups = [])), ["idna", "requests"])
+
+    # Poetry 1.5 to 1.8 record no groups: extras add to everything that isn't
+    # optional, and groups = [...] fails loading.
+    lock = _lock(None)
+    check("no groups: extras", _names(poetry_packages(lock, extras = ["df"])), everything)
+    check("no groups: roots", _names(poetry_packages(lock, roots = ["app-thing"], extras = [])), ["app-thing", "idna", "pysocks", "requests"])
+
+    example = _names(poetry_packages(example_lock))
+    check("example: extras", _names(poetry_packages(example_lock, extras = [])), example)
+    for pkg in example_lock["package"]:
+        if "groups" in pkg or "category" in pkg:
+            failures.append("example poetry.lock records groups for {}; it's meant to be a Poetry 1.8 lock".format(pkg["name"]))
+
+    if failures:
+        fail("{} poetry tests failed:\n  {}".format(len(failures), "\n  ".join(failures)))
@@ -0,0 +1,63 @@
+"""Load-time tests for pruning a lock to the closure of some roots."""
+
+load("@elk//:elk.bzl", "uv_packages")
+
+def _package(name, deps = [], version = "1.0"):
+    return {
+        "name": name,
+        "version": version,
+        "source": {"registry": "https://pypi.org/simple"},
+        "dependencies": [{"name": d} for d in deps],
+        "wheels": [],
+    }
+
+# a -> b -> c -> a is a cycle; f names its dep unnormalised
+_LOCK = {
+    "version": 1,
+    "package": [
+        _package("a", ["b"]),
+        _package("b", ["c"]),
+        _package("c", ["a", "d"]),
+        _package("d"),
+        _package("e", ["d"]),
+        _package("f", ["E"]),
+        _package("g", version = "1.0"),
+        _package("g", version = "2.0"),
+    ],
+}
+
+# (roots, expected target names)
+_ROOTS = [
+    (["a"], ["a", "b", "c", "d"]),
+    (["c"], ["a", "b", "c", "d"]),
+    (["d"], ["d"]),
+    (["F"], ["d", "e", "f"]),
+    (["D", "b"], ["a", "b", "c", "d"]),
+    (["g"], ["g-1.0", "g-2.0"]),
+    (["g-2.0"], ["g-2.0"]),
+    ([], []),
+]
+
+def _aliases(packages):
+    return sorted([pkg.alias for pkg in packages])
+
+def roots_tests(uv_lock: dict, forks_lock: dict):
+    """*uv_lock* and *forks_lock* are example/uv's and example/uv_forks' uv.lock."""
+    failures = []
+
+    def check(what, got, want):
+        if got != want:
+            failures.append("{} = {}, want {}".format(what, got, want))
+
+    for roots, want in _ROOTS:
+        check("roots = {}".format(roots), _aliases(uv_packages(_LOCK, roots = roots)), want)
+
+    everything = _aliases(uv_packages(uv_lock))
+    check("example: the project", _aliases(uv_packages(uv_lock, roots = ["example"])), everything)
+    check("example: polars", _aliases(uv_packages(uv_lock, roots = ["polars"])), ["polars", "polars-runtime-32"])
+    check("forks: click", _aliases(uv_packages(forks_lock, roots = ["click"])), ["click", "colorama"])
+    check("forks: cowsay", _aliases(uv_packages(forks_lock, roots = ["cowsay"])), ["cowsay-6.0", "cowsay-6.1"])
+    check("forks: cowsay-6.1", _aliases(uv_packages(forks_lock, roots = ["cowsay-6.1"])), ["cowsay-6.1"])
+
+    if failures:
+        fail("{} roots tests failed:\n  {}".format(len(failures), "\n  ".join(failures)))
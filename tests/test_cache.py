@@ -0,0 +1,67 @@
+"""The on-disk link cache's eviction and clearing."""
+
+import os
+
+from poetry.installation.executor import Link
+
+from poetry_plugin_elk.cache import LinkCache
+from poetry_plugin_elk.links import LinkKey
+
+
+def key(name: str) -> LinkKey:
+    return LinkKey(name, "1.0", None)
+
+
+def links(name: str) -> list[Link]:
+    url = f"https://example.com/{name}-1.0-py3-none-any.whl#sha256={'0' * 64}"
+    return [Link(url, requires_python=">=3.8")]
+
+
+def entry_size(tmp_path) -> int:
+    cache = LinkCache(tmp_path / "size", 0)
+    cache.put(key("a"), links("a"))
+    return sum(p.stat().st_size for p in (tmp_path / "size").glob("*/*.json"))
+
+
+def test_round_trip(tmp_path):
+    cache = LinkCache(tmp_path, 1 << 20)
+    assert cache.get(key("a")) is None
+    cache.put(key("a"), links("a"))
+    [link] = cache.get(key("a"))
+    assert link.url == links("a")[0].url
+    assert link.requires_python == ">=3.8"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_evict_removes_least_recently_used_first(tmp_path):
+    size = entry_size(tmp_path)
+    cache = LinkCache(tmp_path / "cache", 2 * size)
+    for i, name in enumerate("abcd"):
+        cache.put(key(name), links(name))
+        # mtimes a second apart, oldest first
+        os.utime(cache._path(list(key(name))), (1000 + i, 1000 + i))
+    # reading a refreshes it, so b and c are now the oldest
+    assert cache.get(key("a")) is not None
+
+    assert cache.evict() == 2
+    assert cache.get(key("b")) is None
+    assert cache.get(key("c")) is None
+    assert cache.get(key("a")) is not None
+    assert cache.get(key("d")) is not None
+
+    # under max_bytes, nothing goes
+    assert cache.evict() == 0
+
+
+def test_clear(tmp_path):
+    cache = LinkCache(tmp_path, 1 << 20)
+    for name in "abc":
+        cache.put(key(name), links(name))
+
+    assert cache.clear(["b"]) == 1
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) is not None
+
+    assert cache.clear() == 2
+    assert list(tmp_path.glob("*/*.json")) == []
+    assert LinkCache(tmp_path / "missing", 0).clear() == 0
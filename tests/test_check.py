@@ -0,0 +1,31 @@
+"""``poetry elk --check`` reports staleness from fingerprints."""
+
+from synthetic import IndexServer, synthetic_packages, write_poetry_project
+
+
+def test_check_walks_the_lock_only_when_it_changed(tmp_path, poetry_elk):
+    packages = synthetic_packages(20, 4)
+    with IndexServer(packages) as index:
+        write_poetry_project(tmp_path, packages, index.url, 2)
+        assert poetry_elk(tmp_path).returncode == 0
+
+    # nothing changed: the recorded lock fingerprint matches, so no walk
+    result = poetry_elk(tmp_path, "--check", "--profile")
+    assert result.returncode == 0, result.stderr
+    assert "up to date" in result.stdout
+    assert "walk" not in result.stderr
+
+    # the lock changed but no package did: walk, and still up to date
+    lock = tmp_path / "poetry.lock"
+    lock.write_text(lock.read_text() + "\n")
+    result = poetry_elk(tmp_path, "--check", "--profile")
+    assert result.returncode == 0, result.stderr
+    assert "walk" in result.stderr
+
+    # a package's files changed
+    text = lock.read_text()
+    old = packages[3].hash(packages[3].files[0])
+    lock.write_text(text.replace(old, "sha256:" + "0" * 64))
+    result = poetry_elk(tmp_path, "--check")
+    assert result.returncode == 1
+    assert f"changed: {packages[3].name}" in result.stderr
@@ -0,0 +1,18 @@
+"""``[resolve] concurrency`` must not change what ``poetry elk`` writes."""
+
+from synthetic import IndexServer, synthetic_packages, write_poetry_project
+
+
+def test_concurrent_links_write_the_same_buck(tmp_path, poetry_elk):
+    packages = synthetic_packages(60, 6)
+    # the delay lets requests finish out of order
+    with IndexServer(packages, delay=0.01) as index:
+        outputs = {}
+        for concurrency in (1, 8):
+            project = tmp_path / f"concurrency-{concurrency}"
+            write_poetry_project(project, packages, index.url, 2, concurrency)
+            before = index.requests
+            assert poetry_elk(project).returncode == 0
+            outputs[concurrency] = (project / "BUCK").read_text()
+            assert index.requests - before == len(packages)
+    assert outputs[8] == outputs[1]
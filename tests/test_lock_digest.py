@@ -0,0 +1,33 @@
+"""lock_digest's checks that a digest still matches its lock."""
+
+import json
+import shutil
+from pathlib import Path
+
+from lock_digest import build_digest, check, dump, verify_lock
+
+tests = Path(__file__).parent
+forks = tests.parent / "example" / "uv_forks"
+
+
+def test_digest_goes_stale_with_its_lock(tmp_path):
+    lock = tmp_path / "uv.lock"
+    shutil.copy(forks / "uv.lock", lock)
+    tags = {"linux-x86_64": forks / "linux-x86_64.pruned.tags.json"}
+    path = tmp_path / "elk.digest.json"
+    digest = build_digest(lock, tags)
+    with open(path, "w") as f:
+        dump(digest, f)
+
+    assert check(build_digest(lock, tags), path) == []
+    assert verify_lock(lock, digest["lock_sha256"]) is None
+
+    lock.write_text(lock.read_text() + "\n")
+    assert check(build_digest(lock, tags), path) == ["the lock changed"]
+    reason = verify_lock(lock, digest["lock_sha256"])
+    assert reason.endswith("but the digest was made from " + digest["lock_sha256"])
+
+
+def test_checked_in_digest_matches_its_lock():
+    digest = json.loads((tests / "digest" / "elk.digest.json").read_text())
+    assert verify_lock(forks / "uv.lock", digest["lock_sha256"]) is None
@@ -0,0 +1,48 @@
+"""Reusing the previous output's sections for packages that didn't change."""
+
+from synthetic import IndexServer, synthetic_packages, write_poetry_project
+
+from poetry_plugin_elk.manifest import Manifest
+
+
+def test_only_the_changed_package_is_resolved_again(tmp_path, poetry_elk):
+    packages = synthetic_packages(20, 4)
+    output = tmp_path / "BUCK"
+    with IndexServer(packages) as index:
+        write_poetry_project(tmp_path, packages, index.url, 2)
+        assert poetry_elk(tmp_path).returncode == 0
+        first = output.read_bytes()
+        before = Manifest.read(output)
+        assert len(before.sections) == len(packages)
+
+        # the same lock again: every section is reused and nothing fetched
+        requests = index.requests
+        result = poetry_elk(tmp_path)
+        assert result.returncode == 0, result.stderr
+        assert "is unchanged" in result.stderr
+        assert f"Resolved 0 packages, reused {len(packages)}" in result.stderr
+        assert index.requests == requests
+        assert output.read_bytes() == first
+
+        changed = packages[3]
+        lock = tmp_path / "poetry.lock"
+        old = changed.hash(changed.files[0])
+        lock.write_text(lock.read_text().replace(old, "sha256:" + "0" * 64))
+        requests = index.requests
+        result = poetry_elk(tmp_path, "--profile")
+        assert result.returncode == 0, result.stderr
+        assert f"Resolved 1 packages, reused {len(packages) - 1}" in result.stderr
+        assert "Packages: 1 resolved" in result.stderr
+        assert f"{changed.name} {changed.version}" in result.stderr
+        assert index.requests - requests == 1
+
+    after = Manifest.read(output)
+    assert after.config == before.config
+    assert after.lock != before.lock
+    assert [n for n in before.sections if before.sections[n] != after.sections[n]] == [
+        changed.name
+    ]
+    assert (
+        after.sections[changed.name].fingerprint
+        != before.sections[changed.name].fingerprint
+    )
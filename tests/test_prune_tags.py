@@ -0,0 +1,51 @@
+"""prune_tags keeps the tags that pick each package's wheel, and no more."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from prune_tags import prune, verify
+from wheel_selection import load_lock, load_tags
+
+root = Path(__file__).parent.parent
+forks = root / "example" / "uv_forks"
+
+
+def test_pruned_tags_pick_the_same_wheels(tmp_path):
+    packages = load_lock(forks / "uv.lock")
+    tags = load_tags(forks / "linux-x86_64.tags.json")
+    pruned = prune(packages, tags)
+
+    assert pruned == load_tags(forks / "linux-x86_64.pruned.tags.json")
+    assert verify(packages, tags, pruned) == []
+
+    # without the pure-python tag, every py3-none-any wheel goes unmatched
+    needed = [t for t in pruned if t != "py3-none-any"]
+    mismatches = verify(packages, tags, needed)
+    assert mismatches
+    for _name, _version, want, got in mismatches:
+        assert "py3-none-any" in want
+        assert got is None
+
+    # the CLI fails the same way, so CI catches it
+    lock, full = forks / "uv.lock", forks / "linux-x86_64.tags.json"
+    dest = tmp_path / "linux-x86_64.pruned.tags.json"
+    run = [
+        sys.executable,
+        str(root / "tools" / "prune_tags.py"),
+        str(lock),
+        str(full),
+        str(dest),
+    ]
+    subprocess.run(run, check=True, capture_output=True)
+    assert load_tags(dest) == pruned
+    ok = subprocess.run([*run, "--verify"], capture_output=True, text=True)
+    assert ok.returncode == 0, ok.stderr
+
+    dest.write_text(json.dumps(needed))
+    stale = subprocess.run([*run, "--verify"], capture_output=True, text=True)
+    assert stale.returncode == 1
+    name, version, want, _got = mismatches[0]
+    assert f"{name} {version}: expected {want}, got None" in stale.stderr
+    assert "no longer matches" in stale.stderr
@@ -0,0 +1,94 @@
+"""Building wheels from sdists: ``poetry elk``'s targets and ``build_wheel``."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from synthetic import (
+    IndexServer,
+    SyntheticPackage,
+    synthetic_packages,
+    write_poetry_project,
+)
+
+tools = Path(__file__).parent.parent / "tools"
+
+
+def test_sdist_only_package_needs_build_sdists(tmp_path, poetry_elk):
+    packages = synthetic_packages(3, 4)
+    packages.append(SyntheticPackage("sdistonly", "2.0", ["sdistonly-2.0.tar.gz"]))
+    with IndexServer(packages) as index:
+        write_poetry_project(tmp_path, packages, index.url, 2, cache=True)
+
+        for requests in (len(packages), 0):
+            before = index.requests
+            result = poetry_elk(tmp_path)
+            assert result.returncode == 1
+            assert "Could not choose a wheel for package sdistonly" in result.stderr
+            assert "    sdistonly-2.0.tar.gz" in result.stderr
+            assert "Set build_sdists = true" in result.stderr
+            # the report lists the links the choice was made from, so once
+            # they're cached it doesn't go to the index either
+            assert index.requests - before == requests
+
+        elk = tmp_path / "elk.toml"
+        elk.write_text(elk.read_text() + "\n[resolve]\nbuild_sdists = true\n")
+        result = poetry_elk(tmp_path)
+        assert result.returncode == 0, result.stderr
+
+    buck = (tmp_path / "BUCK").read_text()
+    sha256 = packages[-1].hash("sdistonly-2.0.tar.gz").removeprefix("sha256:")
+    assert buck.count('http_archive(\n    name = "sdistonly-2.0.tar.gz"') == 1
+    for platform in ("linux-x86_64", "macos-arm64"):
+        assert (
+            "elk_sdist_wheel(\n"
+            f'    name = "sdistonly-2.0.tar.gz-{platform}.whl",\n'
+            '    src = ":sdistonly-2.0.tar.gz",\n'
+            f'    sha256 = "{sha256}",\n'
+            f'    platform = "{platform}",\n'
+            '    python = "cp312",\n'
+            ")\n"
+        ) in buck
+        assert f'"{platform}": ":sdistonly-2.0.tar.gz-{platform}.whl-built"' in buck
+
+
+def build_wheel(src: Path, out: Path, cache: Path) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(tools / "build_wheel.py"), "--key", "k-linux-cp312"]
+        + ["--out", str(out), str(src)],
+        env={**os.environ, "ELK_WHEEL_CACHE": str(cache)},
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_build_wheel_builds_once_per_key(tmp_path):
+    # an unpacked sdist has the project in a single top-level directory
+    project = tmp_path / "sdist" / "hello-1.0"
+    project.mkdir(parents=True)
+    (project / "pyproject.toml").write_text(
+        "[build-system]\n"
+        'requires = ["setuptools"]\n'
+        'build-backend = "setuptools.build_meta"\n'
+        "\n"
+        "[project]\n"
+        'name = "hello"\n'
+        'version = "1.0"\n'
+    )
+    (project / "hello.py").write_text("GREETING = 'hi'\n")
+    cache = tmp_path / "cache"
+
+    result = build_wheel(tmp_path / "sdist", tmp_path / "a.whl", cache)
+    assert result.returncode == 0, result.stderr
+    assert "Built hello-1.0-py3-none-any.whl" in result.stderr
+    assert [p.name for p in (cache / "k-linux-cp312").iterdir()] == [
+        "hello-1.0-py3-none-any.whl"
+    ]
+
+    # the second build of the key comes from the cache, not the source
+    (project / "pyproject.toml").unlink()
+    result = build_wheel(tmp_path / "sdist", tmp_path / "b.whl", cache)
+    assert result.returncode == 0, result.stderr
+    assert "Built" not in result.stderr
+    assert (tmp_path / "b.whl").read_bytes() == (tmp_path / "a.whl").read_bytes()
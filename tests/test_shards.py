@@ -0,0 +1,84 @@
+"""Sharding the generated BUCK file, and only rewriting what changed."""
+
+import os
+import subprocess
+import sys
+
+from synthetic import IndexServer, synthetic_packages, write_poetry_project
+
+from poetry_plugin_elk.buck import shard_of, write_if_changed
+
+
+def test_shard_of_is_stable():
+    # pinned: a different assignment on another run or machine would move
+    # every package between subpackages
+    assert [shard_of(n, 16, "hash") for n in ("numpy", "requests", "pkg00000")] == [
+        "15",
+        "13",
+        "01",
+    ]
+    assert shard_of("numpy", 4, "hash") == "3"
+    assert shard_of("numpy", 100, "hash") == "87"
+    assert shard_of("numpy", 4, "initial") == "n"
+
+    # not python's per-process hash()
+    script = "from poetry_plugin_elk.buck import shard_of; print(shard_of('numpy', 16, 'hash'))"
+    for seed in ("1", "2"):
+        out = subprocess.run(
+            [sys.executable, "-c", script],
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert out.stdout.strip() == "15"
+
+
+def test_write_if_changed(tmp_path):
+    path = tmp_path / "BUCK"
+    assert write_if_changed(path, lambda f: f.write("a\n"))
+    before = path.stat()
+
+    assert not write_if_changed(path, lambda f: f.write("a\n"))
+    after = path.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+    assert write_if_changed(path, lambda f: f.write("b\n"))
+    assert path.read_text() == "b\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["BUCK"]
+
+
+def test_lock_change_only_rewrites_its_shard(tmp_path, poetry_elk):
+    packages = synthetic_packages(40, 3)
+    with IndexServer(packages) as index:
+        write_poetry_project(tmp_path, packages, index.url, 2)
+        elk = tmp_path / "elk.toml"
+        elk.write_text(
+            elk.read_text() + '\n[buck]\nshards = 8\npackage = "//third-party"\n'
+        )
+        assert poetry_elk(tmp_path).returncode == 0
+
+        def snapshot():
+            return {
+                p.relative_to(tmp_path).as_posix(): p.stat().st_mtime_ns
+                for p in tmp_path.glob("elk/*/BUCK")
+            }
+
+        first = snapshot()
+        assert len(first) == 8
+
+        # the same lock again: nothing is rewritten
+        result = poetry_elk(tmp_path)
+        assert result.returncode == 0
+        assert "is unchanged" in result.stderr
+        assert snapshot() == first
+
+        changed = packages[5]
+        lock = tmp_path / "poetry.lock"
+        old = changed.hash(changed.files[0])
+        lock.write_text(lock.read_text().replace(old, "sha256:" + "0" * 64))
+        assert poetry_elk(tmp_path).returncode == 0
+
+    second = snapshot()
+    shard = f"elk/{shard_of(changed.name, 8, 'hash')}/BUCK"
+    assert [p for p in first if first[p] != second[p]] == [shard]
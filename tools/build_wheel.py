@@ -0,0 +1,108 @@
+"""Build a wheel from an unpacked sdist, through a content-addressed cache.
+
+Usage (normally from the genrule `elk_sdist_wheel` creates):
+    build_wheel --key <sdist sha256>-<platform>-<python> --out foo.whl path/to/sdist
+
+Built wheels are kept in `$ELK_WHEEL_CACHE` (default `~/.cache/elk/wheels`)
+as `<key>/<wheel filename>`, so an sdist is only built once per platform and
+python, even when buck2's own caches are cold. A cache entry is only written
+once the build has succeeded, via a rename, so concurrent builds of the same
+key at worst both build.
+
+Requires `pip` in the interpreter, which also needs whatever build backend
+the sdist uses.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+def cache_root():
+    root = os.environ.get("ELK_WHEEL_CACHE")
+    if root:
+        return root
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "elk", "wheels")
+
+
+def source_dir(path):
+    """The project directory in an unpacked sdist, which has one top-level dir."""
+    if any(
+        os.path.exists(os.path.join(path, f)) for f in ("pyproject.toml", "setup.py")
+    ):
+        return path
+    entries = [e for e in os.listdir(path) if not e.startswith(".")]
+    if len(entries) == 1 and os.path.isdir(os.path.join(path, entries[0])):
+        return os.path.join(path, entries[0])
+    raise SystemExit("No pyproject.toml or setup.py in {}".format(path))
+
+
+def cached_wheel(directory):
+    try:
+        wheels = [f for f in os.listdir(directory) if f.endswith(".whl")]
+    except FileNotFoundError:
+        return None
+    return os.path.join(directory, wheels[0]) if len(wheels) == 1 else None
+
+
+def build(src, dest_dir):
+    """Build *src* into *dest_dir* and return the wheel's path."""
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pip",
+            "wheel",
+            "--no-deps",
+            "--quiet",
+            "--wheel-dir",
+            dest_dir,
+            source_dir(src),
+        ],
+        check=True,
+    )
+    wheels = [f for f in os.listdir(dest_dir) if f.endswith(".whl")]
+    if len(wheels) != 1:
+        raise SystemExit("Expected one wheel from {}, got {}".format(src, wheels))
+    return os.path.join(dest_dir, wheels[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="build_wheel")
+    parser.add_argument("src", help="unpacked sdist directory")
+    parser.add_argument(
+        "--key",
+        required=True,
+        help="cache key, e.g. <sdist sha256>-<platform>-<python>",
+    )
+    parser.add_argument("--out", required=True, help="where to copy the wheel")
+    args = parser.parse_args()
+
+    entry = os.path.join(cache_root(), args.key)
+    wheel = cached_wheel(entry)
+    if wheel is None:
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix=".build-")
+        try:
+            build(args.src, staging)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # another build of the same key got there first
+                if cached_wheel(entry) is None:
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        wheel = cached_wheel(entry)
+        print("Built {}".format(os.path.basename(wheel)), file=sys.stderr)
+    shutil.copyfile(wheel, args.out)
+
+
+if __name__ == "__main__":
+    main()
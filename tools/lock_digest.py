@@ -0,0 +1,208 @@
+"""Precompute elk's wheel selection for a lock into a small JSON digest.
+
+Usage:
+    buck2 run elk//tools:lock_digest -- uv.lock elk.digest.json \\
+        --tags linux-x86_64=linux-x86_64.tags.json --tags macos-arm64=macos-arm64.tags.json
+    buck2 run elk//tools:lock_digest -- --check uv.lock elk.digest.json \\
+        --tags linux-x86_64=linux-x86_64.tags.json --tags macos-arm64=macos-arm64.tags.json
+    buck2 run elk//tools:lock_digest -- --verify-lock <sha256> uv.lock
+
+The digest holds, for each package with a wheel on some platform, its target
+name, deps (with the markers of uv deps that only apply on some platforms),
+the marker variables of each platform and only the wheels chosen per
+platform. Load it in a BUCK file and
+pass it to `elk_packages_from_digest`, which then neither parses the lock nor
+matches tags:
+
+    load(":elk.digest.json", digest = "value")
+    elk_packages_from_digest(digest)
+
+The digest also records the sha256 of the lock and of each tags file. `--check`
+rebuilds the digest and exits 1 if it differs from the file, saying whether
+the lock or a tags file changed; run it in CI so a digest can't drift from
+its lock. `--verify-lock` only checks the lock's sha256 against one recorded
+in a digest; `elk_packages_from_digest(lock = ...)` runs it as a build
+target.
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+
+from wheel_selection import choose, load_lock, load_tags, marker_environment, tag_ranks
+
+FORMAT = 1
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_digest(lock_path, tags_paths):
+    """The digest for a lock and `{platform name: tags file}`."""
+    tags = {name: load_tags(path) for name, path in tags_paths.items()}
+    ranks = {name: tag_ranks(t) for name, t in tags.items()}
+    packages = []
+    for pkg in load_lock(lock_path):
+        files = []
+        platforms = {}
+        for name, r in ranks.items():
+            wheel, _ = choose(pkg.wheels, r)
+            if wheel is None:
+                continue
+            entry = {
+                "file": wheel.filename,
+                "url": wheel.url,
+                "hash": "sha256:" + wheel.sha256,
+            }
+            if wheel.size is not None:
+                entry["size"] = wheel.size
+            if entry not in files:
+                files.append(entry)
+            platforms[name] = files.index(entry)
+        if platforms:
+            entry = {
+                "name": pkg.name,
+                "version": pkg.version,
+                "alias": pkg.alias,
+                "deps": list(pkg.deps),
+                "files": files,
+                "platforms": platforms,
+            }
+            if pkg.dep_markers:
+                entry["dep_markers"] = pkg.dep_markers
+            if pkg.resolution_markers:
+                entry["resolution_markers"] = list(pkg.resolution_markers)
+            packages.append(entry)
+    return {
+        "format": FORMAT,
+        "lock_sha256": file_sha256(lock_path),
+        "tags_sha256": {name: file_sha256(path) for name, path in tags_paths.items()},
+        "environments": {name: marker_environment(t) for name, t in tags.items()},
+        "packages": packages,
+    }
+
+
+def dump(digest, f):
+    # one package per line: small to load, readable in diffs
+    f.write("{\n")
+    for key in ("format", "lock_sha256", "tags_sha256", "environments"):
+        f.write(
+            "    {}: {},\n".format(
+                json.dumps(key), json.dumps(digest[key], sort_keys=True)
+            )
+        )
+    f.write('    "packages": [\n')
+    for i, pkg in enumerate(digest["packages"]):
+        sep = "," if i + 1 < len(digest["packages"]) else ""
+        f.write("        {}{}\n".format(json.dumps(pkg), sep))
+    f.write("    ]\n}\n")
+
+
+def check(digest, path):
+    """Reasons the digest at *path* is stale, empty if it isn't."""
+    try:
+        with open(path) as f:
+            existing = json.load(f)
+    except FileNotFoundError:
+        return ["{} does not exist".format(path)]
+    if existing == digest:
+        return []
+    reasons = []
+    if existing.get("lock_sha256") != digest["lock_sha256"]:
+        reasons.append("the lock changed")
+    old_tags = existing.get("tags_sha256", {})
+    for name in sorted(digest["tags_sha256"].keys() | old_tags.keys()):
+        if old_tags.get(name) != digest["tags_sha256"].get(name):
+            reasons.append("tags for {} changed".format(name))
+    return reasons or ["its contents differ from a fresh digest"]
+
+
+def verify_lock(lock_path, sha256):
+    """Why the lock no longer matches a digest recording *sha256*, or None."""
+    actual = file_sha256(lock_path)
+    if actual == sha256:
+        return None
+    return "{} has sha256 {}, but the digest was made from {}".format(
+        lock_path, actual, sha256
+    )
+
+
+def parse_tags(values):
+    tags = {}
+    for value in values:
+        name, sep, path = value.partition("=")
+        if not sep:
+            raise SystemExit(
+                "--tags expects <platform>=<tags file>, got {}".format(value)
+            )
+        tags[name] = path
+    return tags
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="lock_digest")
+    parser.add_argument("lock", help="uv.lock or poetry.lock")
+    parser.add_argument(
+        "dest",
+        nargs="?",
+        help="digest file to write (- for stdout), or check with --check",
+    )
+    parser.add_argument(
+        "--tags",
+        action="append",
+        default=[],
+        metavar="PLATFORM=FILE",
+        help="platform name and its tags file from save_tags, repeat for each platform",
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="exit 1 if dest is out of date"
+    )
+    parser.add_argument(
+        "--verify-lock",
+        metavar="SHA256",
+        help="only check that the lock's sha256 is this (a digest's lock_sha256), exiting 1 if not",
+    )
+    args = parser.parse_args()
+
+    if args.verify_lock:
+        reason = verify_lock(args.lock, args.verify_lock)
+        if reason:
+            print("The digest is stale: {}".format(reason), file=sys.stderr)
+            print("Regenerate it with lock_digest", file=sys.stderr)
+            sys.exit(1)
+        return
+    if args.dest is None or not args.tags:
+        parser.error("dest and at least one --tags are required")
+
+    digest = build_digest(args.lock, parse_tags(args.tags))
+
+    if args.check:
+        reasons = check(digest, args.dest)
+        if reasons:
+            print(
+                "{} is stale: {}".format(args.dest, ", ".join(reasons)), file=sys.stderr
+            )
+            print("Regenerate it with lock_digest", file=sys.stderr)
+            sys.exit(1)
+        print("{} is up to date".format(args.dest), file=sys.stderr)
+        return
+
+    if args.dest == "-":
+        dump(digest, sys.stdout)
+    else:
+        with open(args.dest, "w+") as f:
+            dump(digest, f)
+        print(
+            "Saved {} packages to {}".format(len(digest["packages"]), args.dest),
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Download every wheel elk would choose into a content-addressed wheelhouse.
+
+Usage:
+    buck2 run elk//tools:prefetch -- uv.lock wheelhouse --tags linux-x86_64.tags.json
+    buck2 run elk//tools:prefetch -- poetry.lock wheelhouse \\
+        --tags linux-x86_64.tags.json --tags macos-arm64.tags.json --jobs 16
+
+Wheels are picked with the same rules as `elk_packages`, once per tags file,
+and saved as `wheelhouse/<sha256>/<filename>`. Serve the directory over HTTP
+and point elk at it with `mirrors = ["http://host:port/{sha256}/{filename}"]`.
+
+Each download is hashed as it is written and only moved into place once the
+digest matches the lock. Wheels already in the wheelhouse are skipped, and an
+interrupted download is resumed from its `.part` file when the server
+supports range requests.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from wheel_selection import choose, load_lock, load_tags, tag_ranks
+
+_CHUNK = 1 << 20
+
+
+def chosen_wheels(packages, tags_files):
+    """Every wheel chosen for some tags file, deduplicated, in lock order."""
+    ranks = [tag_ranks(load_tags(path)) for path in tags_files]
+    wheels = {}
+    for pkg in packages:
+        for r in ranks:
+            wheel, _ = choose(pkg.wheels, r)
+            if wheel is not None:
+                wheels.setdefault((wheel.sha256, wheel.filename), wheel)
+    return list(wheels.values())
+
+
+def fetch(wheel, dest):
+    """Download *wheel* under *dest*. Returns "present" or "fetched"."""
+    directory = os.path.join(dest, wheel.sha256)
+    path = os.path.join(directory, wheel.filename)
+    if os.path.exists(path):
+        return "present"
+    os.makedirs(directory, exist_ok=True)
+
+    part = path + ".part"
+    digest = hashlib.sha256()
+    offset = 0
+    if os.path.exists(part):
+        with open(part, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b""):
+                digest.update(chunk)
+                offset += len(chunk)
+
+    request = urllib.request.Request(wheel.url)
+    if offset:
+        request.add_header("Range", "bytes={}-".format(offset))
+    try:
+        response = urllib.request.urlopen(request)
+    except urllib.error.HTTPError as e:
+        if e.code != 416:
+            raise
+        # the .part file is already complete
+        response = None
+
+    if response is not None:
+        with response:
+            if offset and response.status != 206:
+                # range not honoured, start over
+                digest = hashlib.sha256()
+                offset = 0
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in iter(lambda: response.read(_CHUNK), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+
+    if digest.hexdigest() != wheel.sha256:
+        os.unlink(part)
+        raise ValueError("sha256 mismatch, got " + digest.hexdigest())
+    os.replace(part, path)
+    return "fetched"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="prefetch")
+    parser.add_argument("lock", help="uv.lock or poetry.lock")
+    parser.add_argument("dest", help="wheelhouse directory")
+    parser.add_argument(
+        "--tags",
+        action="append",
+        required=True,
+        help="tags file from save_tags, repeat for each platform",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=8, help="parallel downloads (default: 8)"
+    )
+    args = parser.parse_args()
+
+    wheels = chosen_wheels(load_lock(args.lock), args.tags)
+    unhashed = [w.filename for w in wheels if not w.sha256]
+    if unhashed:
+        print("No sha256 in the lock for: " + ", ".join(unhashed), file=sys.stderr)
+        sys.exit(1)
+
+    def run(wheel):
+        try:
+            return fetch(wheel, args.dest), None
+        except (OSError, ValueError) as e:
+            return "failed", e
+
+    counts = {"present": 0, "fetched": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for wheel, (status, error) in zip(wheels, pool.map(run, wheels)):
+            counts[status] += 1
+            if error is not None:
+                print("{}: {}".format(wheel.filename, error), file=sys.stderr)
+            elif status == "fetched":
+                print("Fetched " + wheel.filename, file=sys.stderr)
+
+    print(
+        "{fetched} fetched, {present} already present, {failed} failed in {dest}".format(
+            dest=args.dest, **counts
+        ),
+        file=sys.stderr,
+    )
+    if counts["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
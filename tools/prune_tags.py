@@ -0,0 +1,117 @@
+"""Shrink a platform tags file to the tags a lock file can actually match.
+
+Usage:
+    buck2 run elk//tools:prune_tags -- uv.lock linux-x86_64.tags.json linux-x86_64.pruned.tags.json
+    buck2 run elk//tools:prune_tags -- poetry.lock linux-x86_64.tags.json -  # stdout
+    buck2 run elk//tools:prune_tags -- --verify uv.lock linux-x86_64.tags.json linux-x86_64.pruned.tags.json
+
+For every package in the lock, elk picks the wheel holding the earliest tag
+in the tags file. Keeping just those winning tags, in their original order,
+picks the same wheel for every package: no other wheel of the package can
+match a tag ranked before its winner, and packages with no match can't gain
+one from a subset. The result is a flat list, usually a few dozen tags.
+
+The first tag of the full file is always kept too. It names the interpreter
+(`cp312-cp312-...`), which elk reads `python_version` from to evaluate
+markers. It can't change any package's wheel: a wheel holding the best tag
+is already that package's pick.
+
+The pruned file is only valid for the lock it was made from. `--verify`
+checks a pruned file against the lock and the full tags file and exits 1,
+listing the packages, if any would get a different wheel or the marker
+variables differ; run it in CI so a lock update that needs new tags is
+caught.
+"""
+
+import argparse
+import json
+import sys
+
+from wheel_selection import choose, load_lock, load_tags, marker_environment, tag_ranks
+
+
+def prune(packages, tags):
+    ranks = tag_ranks(tags)
+    keep = set(tags[:1])
+    for pkg in packages:
+        _chosen, tag = choose(pkg.wheels, ranks)
+        if tag is not None:
+            keep.add(tag)
+    return sorted(keep, key=ranks.__getitem__)
+
+
+def verify(packages, tags, pruned):
+    """Packages whose chosen wheel differs between *tags* and *pruned*."""
+    full, small = tag_ranks(tags), tag_ranks(pruned)
+    mismatches = []
+    for pkg in packages:
+        want, _ = choose(pkg.wheels, full)
+        got, _ = choose(pkg.wheels, small)
+        if want != got:
+            mismatches.append(
+                (pkg.name, pkg.version, want and want.filename, got and got.filename)
+            )
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="prune_tags")
+    parser.add_argument("lock", help="uv.lock or poetry.lock")
+    parser.add_argument("tags", help="full tags file from save_tags")
+    parser.add_argument(
+        "dest", help="pruned tags file to write (- for stdout), or check with --verify"
+    )
+    parser.add_argument(
+        "--verify", action="store_true", help="check dest picks the same wheels as tags"
+    )
+    args = parser.parse_args()
+
+    packages = load_lock(args.lock)
+    tags = load_tags(args.tags)
+
+    if args.verify:
+        mismatches = verify(packages, tags, load_tags(args.dest))
+        for name, version, want, got in mismatches:
+            print(
+                "{} {}: expected {}, got {}".format(name, version, want, got),
+                file=sys.stderr,
+            )
+        full_env, pruned_env = (
+            marker_environment(tags),
+            marker_environment(load_tags(args.dest)),
+        )
+        if full_env != pruned_env:
+            print(
+                "marker variables: expected {}, got {}".format(full_env, pruned_env),
+                file=sys.stderr,
+            )
+        if mismatches or full_env != pruned_env:
+            print(
+                "{} no longer matches {}; regenerate it with prune_tags".format(
+                    args.dest, args.lock
+                ),
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        print(
+            "{} picks the same wheels for {} packages".format(args.dest, len(packages)),
+            file=sys.stderr,
+        )
+        return
+
+    pruned = prune(packages, tags)
+    if args.dest == "-":
+        json.dump(pruned, sys.stdout, indent=4)
+        print()
+    else:
+        with open(args.dest, "w+") as f:
+            json.dump(pruned, f, indent=4)
+            _ = f.write("\n")
+        print(
+            "Saved {} of {} tags to {}".format(len(pruned), len(tags), args.dest),
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,33 +3,100 @@
 Usage:
     buck2 run elk//tools:save_tags -- linux-x86_64.tags.json
     buck2 run elk//tools:save_tags -- -  # stdout
+    buck2 run elk//tools:save_tags -- --flat linux-x86_64.tags.json
+
+By default the tags are written factored: `sys_tags()` is a handful of
+interpreters x ABIs x platforms cross products laid end to end, so each one
+is stored as its three axes instead of every combination:
+
+    {"groups": [{"interpreters": [...], "abis": [...], "platforms": [...]}, ...]}
+
+Expanding each group (interpreters outermost, platforms innermost) in order
+gives back the full priority-ordered list. `--flat` writes that list instead.
 
 Requires the `packaging` package to be installed in the interpreter.
 """
 
+import argparse
 import json
 import sys
 
 from packaging.tags import sys_tags
 
 
+def factor_tags(tags):
+    """Factor priority-ordered `interp-abi-plat` tags into cross-product groups."""
+    # Runs of platforms sharing an interpreter and ABI...
+    runs = []
+    for tag in tags:
+        interp, abi, plat = tag.split("-")
+        if (
+            runs
+            and runs[-1][0] == interp
+            and runs[-1][1] == abi
+            and plat not in runs[-1][2]
+        ):
+            runs[-1][2].append(plat)
+        else:
+            runs.append((interp, abi, [plat]))
+
+    # ...then ABIs sharing an interpreter and platforms...
+    by_abi = []
+    for interp, abi, plats in runs:
+        last = by_abi[-1] if by_abi else None
+        if last and last[0] == interp and last[2] == plats and abi not in last[1]:
+            last[1].append(abi)
+        else:
+            by_abi.append((interp, [abi], plats))
+
+    # ...then interpreters sharing ABIs and platforms.
+    groups = []
+    for interp, abis, plats in by_abi:
+        last = groups[-1] if groups else None
+        if (
+            last
+            and last["abis"] == abis
+            and last["platforms"] == plats
+            and interp not in last["interpreters"]
+        ):
+            last["interpreters"].append(interp)
+        else:
+            groups.append({"interpreters": [interp], "abis": abis, "platforms": plats})
+    return {"groups": groups}
+
+
+def expand_tags(factored):
+    """Inverse of `factor_tags`."""
+    return [
+        "{}-{}-{}".format(interp, abi, plat)
+        for g in factored["groups"]
+        for interp in g["interpreters"]
+        for abi in g["abis"]
+        for plat in g["platforms"]
+    ]
+
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: save_tags <filename>", file=sys.stderr)
-        print("  Use - for stdout", file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(prog="save_tags")
+    parser.add_argument("dest", help="output filename, - for stdout")
+    parser.add_argument("--flat", action="store_true", help="write a flat list of tags")
+    args = parser.parse_args()
 
-    dest = sys.argv[1]
     tags = [str(t) for t in sys_tags()]
+    if args.flat:
+        data = tags
+    else:
+        data = factor_tags(tags)
+        assert expand_tags(data) == tags
 
-    if dest == "-":
-        json.dump(tags, sys.stdout, indent=4)
+    if args.dest == "-":
+        json.dump(data, sys.stdout, indent=4)
         print()
     else:
-        with open(dest, "w+") as f:
-            json.dump(tags, f, indent=4)
+        with open(args.dest, "w+") as f:
+            json.dump(data, f, indent=4)
             _ = f.write("\n")
-        print("Saved {} tags to {}".format(len(tags), dest), file=sys.stderr)
+        print("Saved {} tags to {}".format(len(tags), args.dest), file=sys.stderr)
 
 
 if __name__ == "__main__":
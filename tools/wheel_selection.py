@@ -0,0 +1,275 @@
+"""elk's wheel selection rules in plain Python, shared by the tools.
+
+These mirror `_choose_wheel` in elk.bzl: a wheel's rank is the position of
+its best tag in the platform's tags file, the lowest rank wins and ties go
+to the earlier file. Keep them in step with elk.bzl.
+"""
+
+import json
+import tomllib
+from typing import NamedTuple
+
+
+class LockedWheel(NamedTuple):
+    filename: str
+    url: str
+    # hex digest, "" if the lock has none
+    sha256: str
+    size: int | None = None
+
+
+class LockedPackage(NamedTuple):
+    name: str
+    version: str
+    wheels: list[LockedWheel]
+    # target names, as elk.bzl's uv_packages / poetry_packages name them
+    alias: str = ""
+    deps: tuple[str, ...] = ()
+    # dep target name -> PEP 508 marker, uv only
+    dep_markers: dict[str, str] = {}
+    # uv fork markers, for versions sharing a `{name}` alias
+    resolution_markers: tuple[str, ...] = ()
+
+
+def load_tags(path):
+    """Flat, priority-ordered tags from a flat or factored (`save_tags`) file."""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return [
+            "{}-{}-{}".format(interp, abi, plat)
+            for g in data["groups"]
+            for interp in g["interpreters"]
+            for abi in g["abis"]
+            for plat in g["platforms"]
+        ]
+    return data
+
+
+def _sha256(value):
+    return value[len("sha256:") :] if value.startswith("sha256:") else ""
+
+
+def pypi_url(filename):
+    """The files.pythonhosted.org redirect URL elk uses for poetry wheels."""
+    python = filename[:-4].split("-")[-3]
+    name = filename.split("-", 1)[0]
+    return "https://files.pythonhosted.org/packages/{}/{}/{}/{}".format(
+        python, name[0], name, filename
+    )
+
+
+def normalize(name):
+    """elk.bzl's `_normalize`."""
+    return name.lower().replace("_", "-").replace(".", "-")
+
+
+def _is_workspace_package(pkg):
+    source = pkg.get("source", {})
+    return isinstance(source, dict) and ("virtual" in source or "editable" in source)
+
+
+def _multi_version(names):
+    counts = {}
+    for n in names:
+        counts[n] = counts.get(n, 0) + 1
+    return {n for n, c in counts.items() if c > 1}
+
+
+def _dep_target(dep, multi_version, forked):
+    """elk.bzl's `_dep_target_name`."""
+    if normalize(dep["name"]) in forked:
+        return normalize(dep["name"])
+    return _versioned(dep["name"], dep.get("version"), multi_version)
+
+
+def _dep_markers(deps, multi_version, forked):
+    """uv_packages' `dep_markers`: a dep listed more than once applies wherever
+    any of its markers does, and everywhere if one has none."""
+    markers = {}
+    unconditional = set()
+    for d in deps:
+        name = _dep_target(d, multi_version, forked)
+        marker = d.get("marker")
+        if marker is None:
+            unconditional.add(name)
+        elif name in markers:
+            markers[name] = "({}) or ({})".format(markers[name], marker)
+        else:
+            markers[name] = marker
+    return {d: m for d, m in markers.items() if d not in unconditional}
+
+
+def _versioned(name, version, multi_version):
+    n = normalize(name)
+    return (
+        "{}-{}".format(n, version) if version is not None and n in multi_version else n
+    )
+
+
+def load_lock(path):
+    """Every package in a uv or poetry lock, with its wheels.
+
+    uv workspace members and the root project are left out, as in
+    `uv_packages`.
+    """
+    with open(path, "rb") as f:
+        lock = tomllib.load(f)
+    packages = []
+    if "content-hash" in lock.get("metadata", {}):
+        # poetry.lock
+        entries = lock.get("package", [])
+        multi_version = _multi_version(normalize(pkg["name"]) for pkg in entries)
+        for pkg in entries:
+            wheels = [
+                LockedWheel(f["file"], pypi_url(f["file"]), _sha256(f["hash"]))
+                for f in pkg.get("files", [])
+                if f["file"].endswith(".whl")
+            ]
+            packages.append(
+                LockedPackage(
+                    pkg["name"],
+                    pkg["version"],
+                    wheels,
+                    _versioned(pkg["name"], pkg["version"], multi_version),
+                    tuple(normalize(d) for d in pkg.get("dependencies", {})),
+                )
+            )
+    else:
+        # uv.lock
+        entries = [
+            pkg for pkg in lock.get("package", []) if not _is_workspace_package(pkg)
+        ]
+        multi_version = _multi_version(normalize(pkg["name"]) for pkg in entries)
+        forked = {
+            n
+            for n in multi_version
+            if all(
+                pkg.get("resolution-markers")
+                for pkg in entries
+                if normalize(pkg["name"]) == n
+            )
+        }
+        for pkg in entries:
+            wheels = [
+                LockedWheel(
+                    w["url"].rsplit("/", 1)[-1],
+                    w["url"],
+                    _sha256(w.get("hash", "")),
+                    w.get("size"),
+                )
+                for w in pkg.get("wheels", [])
+            ]
+            packages.append(
+                LockedPackage(
+                    pkg["name"],
+                    pkg.get("version", ""),
+                    wheels,
+                    _versioned(pkg["name"], pkg.get("version"), multi_version),
+                    tuple(
+                        dict.fromkeys(
+                            _dep_target(d, multi_version, forked)
+                            for d in pkg.get("dependencies", [])
+                        )
+                    ),
+                    _dep_markers(pkg.get("dependencies", []), multi_version, forked),
+                    tuple(pkg.get("resolution-markers", []))
+                    if normalize(pkg["name"]) in forked
+                    else (),
+                )
+            )
+    return packages
+
+
+# platform tag prefix -> (sys_platform, platform_system, os_name)
+_MARKER_SYSTEMS = [
+    ("manylinux", ("linux", "Linux", "posix")),
+    ("musllinux", ("linux", "Linux", "posix")),
+    ("linux", ("linux", "Linux", "posix")),
+    ("macosx", ("darwin", "Darwin", "posix")),
+    ("win", ("win32", "Windows", "nt")),
+]
+
+_MARKER_WINDOWS_MACHINES = {"win32": "x86", "win_amd64": "AMD64", "win_arm64": "ARM64"}
+
+
+def _interpreter_version(interp, abi):
+    """elk.bzl's `_interpreter_version`: `(python_version, implementation)` if
+    *abi* is *interp*'s own ABI, as in `cp312-cp312`, else None."""
+    if len(interp) < 4 or not interp[2:].isdigit():
+        return None
+    version = "{}.{}".format(interp[2], interp[3:])
+    if interp.startswith("cp") and abi.startswith(interp):
+        return version, ("cpython", "CPython")
+    if interp.startswith("pp") and abi.startswith("pypy{}_".format(interp[2:])):
+        return version, ("pypy", "PyPy")
+    return None
+
+
+def marker_environment(tags):
+    """elk.bzl's `marker_environment`: the python version from the first tag
+    naming the interpreter's own ABI, the platform from the first that isn't
+    `any`."""
+    env = {}
+    for tag in tags:
+        interp, abi, plat = tag.split("-")
+        found = _interpreter_version(interp, abi)
+        if "python_version" not in env and found is not None:
+            env["python_version"] = found[0]
+            env["implementation_name"], env["platform_python_implementation"] = found[1]
+        if "sys_platform" not in env and plat != "any":
+            for prefix, system in _MARKER_SYSTEMS:
+                if not plat.startswith(prefix):
+                    continue
+                env["sys_platform"], env["platform_system"], env["os_name"] = system
+                if prefix == "win":
+                    machine = _MARKER_WINDOWS_MACHINES.get(plat)
+                elif prefix == "macosx":
+                    machine = plat.split("_", 3)[-1]
+                else:
+                    parts = plat.split("_")
+                    i = next(
+                        (i for i in range(1, len(parts)) if not parts[i].isdigit()),
+                        None,
+                    )
+                    machine = "_".join(parts[i:]) if i is not None else None
+                if machine:
+                    env["platform_machine"] = machine
+                break
+        if "python_version" in env and "sys_platform" in env:
+            break
+    return env
+
+
+def wheel_tags(filename):
+    """Every `interp-abi-plat` tag a wheel filename supports, or [] for non-wheels."""
+    if not filename.endswith(".whl"):
+        return []
+    parts = filename[:-4].split("-")
+    if len(parts) not in (5, 6):
+        return []
+    python, abi, plat = parts[-3:]
+    return [
+        "{}-{}-{}".format(i, a, p)
+        for i in python.split(".")
+        for a in abi.split(".")
+        for p in plat.split(".")
+    ]
+
+
+def tag_ranks(tags):
+    ranks = {}
+    for i, tag in enumerate(tags):
+        ranks.setdefault(tag, i)
+    return ranks
+
+
+def choose(wheels, ranks):
+    """`(wheel, tag)` of the wheel elk would pick, or `(None, None)`."""
+    best, best_tag, best_rank = None, None, None
+    for wheel in wheels:
+        for tag in wheel_tags(wheel.filename):
+            rank = ranks.get(tag)
+            if rank is not None and (best_rank is None or rank < best_rank):
+                best, best_tag, best_rank = wheel, tag, rank
+    return best, best_tag